@@ -0,0 +1,91 @@
+"""
+Admission control for the Porter: per-sender token buckets and in-flight caps.
+
+RateLimiter gives every sender a bucket of `burst` tokens refilled at
+`rate_per_second`; a message that finds the bucket empty is rejected. Buckets
+live in an LRU of at most `max_senders` entries, so one-time senders cannot grow
+it without bound (an evicted sender simply starts again with a full bucket).
+
+ConcurrencyGate caps how many expensive operations run at once. It never
+queues: `try_acquire` either takes a slot or returns False straight away, so the
+caller can answer "busy" instead of piling up work.
+
+Both publish admitted/rejected counters as localhive_admission_total.
+"""
+import time
+from collections import OrderedDict
+
+from instrumentation import metrics
+
+
+class RateLimiter:
+    """
+    Per-key token buckets with LRU-bounded state.
+    """
+
+    def __init__(self, name, rate_per_second, burst, max_senders=100000, clock=time.monotonic):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_senders = max_senders
+        self._clock = clock
+        self._buckets = OrderedDict() # key -> (tokens, updated_at), least recently seen first
+        self._admitted = metrics.counter("localhive_admission_total", path=name, decision="admitted")
+        self._rejected = metrics.counter("localhive_admission_total", path=name, decision="rejected")
+
+    def allow(self, key):
+        """
+        Takes one token from `key`'s bucket. Returns False if it was empty.
+        """
+        now = self._clock()
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_per_second)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_senders:
+            self._buckets.popitem(last=False)
+
+        (self._admitted if allowed else self._rejected).inc()
+        return allowed
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyGate:
+    """
+    Non-blocking cap on concurrent operations.
+
+    For operations that finish somewhere else (e.g. a lookup that stays in flight
+    while it sits in a pending table), pass `count`, a callable returning how many
+    are in flight; `try_acquire` then only checks it and `release` is not used.
+    """
+
+    def __init__(self, name, limit, count=None):
+        self.limit = limit
+        self._in_flight = 0
+        self._count = count
+        self._admitted = metrics.counter("localhive_admission_total", path=name, decision="admitted")
+        self._rejected = metrics.counter("localhive_admission_total", path=name, decision="rejected")
+        metrics.add_collector(lambda: metrics.gauge("localhive_admission_in_flight", path=name).set(self.in_flight))
+
+    @property
+    def in_flight(self):
+        return self._count() if self._count is not None else self._in_flight
+
+    def try_acquire(self):
+        if self.in_flight >= self.limit:
+            self._rejected.inc()
+            return False
+        if self._count is None:
+            self._in_flight += 1
+        self._admitted.inc()
+        return True
+
+    def release(self):
+        self._in_flight -= 1
@@ -0,0 +1,262 @@
+"""
+Monte Carlo budget simulation for the SponsorshipFinanceAgent.
+
+An event budget is uncertain in three ways: what each line item will really
+cost, how many people come, and which candidate sponsors actually pay. A
+BudgetScenario states those as ranges and probabilities:
+
+  - line items: (name, low, high) cost ranges, drawn from a triangular
+    distribution peaking at the midpoint (low == high is a fixed cost),
+  - attendance: a (low, high) range, drawn the same way and rounded,
+  - per-attendee costs (food, kits): a (low, high) range per head,
+  - ticket price: income per attendee,
+  - sponsors: (name, amount, probability) pledges, each paid or not.
+
+BudgetSimulator draws `scenarios` outcomes at once as NumPy arrays (one row per
+line item or sponsor, one column per scenario), so 100k scenarios take a few
+milliseconds. It reports percentiles of cost, income and net result, the
+chance and expected size of a shortfall, and the break-even ticket price: the
+price that covers the costs in a given share of scenarios.
+
+Results are memoized by the scenario's inputs. Each scenario is seeded from a
+hash of its inputs, so identical inputs give identical numbers even after a
+restart.
+"""
+import hashlib
+import re
+
+import numpy as np
+
+from ttl_cache import TTLCache
+
+PERCENTILES = (5, 25, 50, 75, 95)
+# Chance that a candidate sponsor pays when the request doesn't say
+DEFAULT_SPONSOR_PROBABILITY = 0.5
+
+_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "l": 1e5, "lac": 1e5, "lakh": 1e5, "lakhs": 1e5}
+_AMOUNT = r"(₹|\brs\.?|\binr)?\s*(\d+(?:,\d{2,3})*(?:\.\d+)?)\s*(k|thousand|lakhs?|lac|l)?\b"
+_AMOUNT_RANGE = re.compile(_AMOUNT + r"(?:\s*(?:-|–|to)\s*" + _AMOUNT + r")?")
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+_CLAUSE_SPLIT = re.compile(r"[;\n]|,\s+")
+_SPONSOR = re.compile(r"\b(?:sponsor|sponsors|sponsorship|pledge|pledges|donor|donation)\b")
+_ATTENDANCE = re.compile(r"\b(?:attendance|attendees|people|guests|visitors|participants|footfall)\b")
+_TICKET = re.compile(r"\b(?:ticket|tickets|entry|admission)\b")
+_PER_HEAD = re.compile(r"\b(?:per|a|each)\s+(?:person|head|attendee|guest|plate)\b")
+_FILLER = re.compile(r"\b(?:budget|costs?|expenses?|at|about|around|of|for|is|are|will|be|from|with|chance|likely|probability|maybe)\b|[:()₹%]")
+
+
+class BudgetScenario:
+    """
+    The uncertain inputs of one event budget. All amounts are in the same currency.
+    """
+
+    __slots__ = ("line_items", "attendance", "per_attendee_cost", "ticket_price", "sponsors")
+
+    def __init__(self, line_items=(), attendance=(0, 0), per_attendee_cost=(0.0, 0.0), ticket_price=0.0, sponsors=()):
+        self.line_items = tuple((name, float(low), float(max(low, high))) for name, low, high in line_items)
+        self.attendance = (float(attendance[0]), float(max(attendance)))
+        self.per_attendee_cost = (float(per_attendee_cost[0]), float(max(per_attendee_cost)))
+        self.ticket_price = float(ticket_price)
+        self.sponsors = tuple((name, float(amount), min(1.0, max(0.0, float(probability)))) for name, amount, probability in sponsors)
+
+    def key(self):
+        """
+        Canonical text of the inputs, for memoization and seeding.
+        """
+        return repr((self.line_items, self.attendance, self.per_attendee_cost, self.ticket_price, self.sponsors))
+
+    def __repr__(self):
+        return (f"BudgetScenario({len(self.line_items)} items, attendance={self.attendance}, "
+                f"ticket={self.ticket_price}, {len(self.sponsors)} sponsors)")
+
+
+class BudgetResult:
+    """
+    Summary of a simulation. Percentile dicts map each of PERCENTILES to a value.
+    """
+
+    __slots__ = ("scenarios", "cost", "income", "net", "shortfall_probability", "expected_shortfall",
+                 "break_even_price", "median_break_even_price", "break_even_confidence")
+
+    def __init__(self, scenarios, cost, income, net, shortfall_probability, expected_shortfall,
+                 break_even_price, median_break_even_price, break_even_confidence):
+        self.scenarios = scenarios
+        self.cost = cost
+        self.income = income
+        self.net = net
+        self.shortfall_probability = shortfall_probability
+        self.expected_shortfall = expected_shortfall
+        self.break_even_price = break_even_price
+        self.median_break_even_price = median_break_even_price
+        self.break_even_confidence = break_even_confidence
+
+    def __repr__(self):
+        return (f"BudgetResult(net p50={self.net[50]:.0f}, shortfall={self.shortfall_probability:.1%}, "
+                f"break-even={self.break_even_price:.0f})")
+
+
+def _amount(number, multiplier):
+    return float(number.replace(",", "")) * _MULTIPLIERS.get(multiplier or "", 1.0)
+
+
+def _is_explicit(match):
+    """
+    Whether an amount reads as money rather than a stray number: a range, a currency or a k/lakh marker.
+    """
+    low_currency, _, low_multiplier, high_currency, high_number, high_multiplier = match.groups()
+    return bool(high_number or low_currency or low_multiplier or high_currency or high_multiplier)
+
+
+def _amount_range(text):
+    """
+    Returns ((low, high), text without the amount, explicit) for the amount or range in
+    `text`, or (None, text, False). The first explicit amount wins over bare numbers
+    before it ("2 day stage hire 15k" costs 15k).
+    """
+    matches = list(_AMOUNT_RANGE.finditer(text))
+    if not matches:
+        return None, text, False
+    match = next((m for m in matches if _is_explicit(m)), matches[0])
+    _, low_number, low_multiplier, _, high_number, high_multiplier = match.groups()
+    if high_number is None:
+        low = high = _amount(low_number, low_multiplier)
+    else:
+        # "5-8k" means 5k to 8k
+        high = _amount(high_number, high_multiplier)
+        low = _amount(low_number, low_multiplier or high_multiplier)
+    return (min(low, high), max(low, high)), text[:match.start()] + " " + text[match.end():], _is_explicit(match)
+
+
+def _label(text):
+    return " ".join(_FILLER.sub(" ", text).split())
+
+
+def parse_budget_request(text, default_sponsor_probability=DEFAULT_SPONSOR_PROBABILITY):
+    """
+    Reads a BudgetScenario from text like "venue 5000-8000, food 200-300 per person,
+    sound 3k; 80-150 people; ticket 100; sponsor Sharma Traders 10000 at 70%".
+    Clauses are separated by commas, semicolons or new lines.
+
+    Returns None unless the costs clearly are a budget: two or more labelled cost
+    clauses, or a cost given as a range or with a currency or k/lakh marker. Stray
+    numbers ("a budget for a 2 day festival", "budget for 3 events") are not costs.
+    """
+    line_items = []
+    attendance = (0, 0)
+    per_head = [0.0, 0.0]
+    ticket_price = 0.0
+    sponsors = []
+    labelled_costs = 0
+    explicit_cost = False
+    for clause in _CLAUSE_SPLIT.split(text.lower()):
+        percent = _PERCENT.search(clause)
+        if percent is not None:
+            clause = clause[:percent.start()] + " " + clause[percent.end():]
+        amounts, rest, explicit = _amount_range(clause)
+        if amounts is None:
+            continue
+        if _SPONSOR.search(clause):
+            name = _label(_SPONSOR.sub(" ", rest)) or f"sponsor {len(sponsors) + 1}"
+            probability = float(percent.group(1)) / 100 if percent is not None else default_sponsor_probability
+            sponsors.append((name, amounts[1], probability))
+        elif _ATTENDANCE.search(clause):
+            attendance = amounts
+        elif _TICKET.search(clause):
+            ticket_price = amounts[0]
+        else:
+            label = _label(_PER_HEAD.sub(" ", rest))
+            labelled_costs += bool(label)
+            explicit_cost = explicit_cost or explicit
+            if _PER_HEAD.search(clause):
+                per_head[0] += amounts[0]
+                per_head[1] += amounts[1]
+            else:
+                line_items.append((label or f"item {len(line_items) + 1}", *amounts))
+    if not line_items and not per_head[1]:
+        return None
+    if labelled_costs < 2 and not explicit_cost:
+        return None
+    return BudgetScenario(line_items, attendance, tuple(per_head), ticket_price, sponsors)
+
+
+def _triangular_units(rng, rows, size):
+    """
+    (rows, size) draws from the triangular distribution on [0, 1] peaking at 0.5,
+    as the mean of two uniforms (cheaper than inverting the CDF).
+    """
+    units = rng.random((rows, size))
+    units += rng.random((rows, size))
+    units *= 0.5
+    return units
+
+
+class BudgetSimulator:
+    """
+    Vectorized Monte Carlo over BudgetScenarios, memoized by scenario.
+    """
+
+    def __init__(self, scenarios=100000, break_even_confidence=0.9, cache_entries=256, cache_ttl_seconds=3600.0):
+        self.scenarios = scenarios
+        self.break_even_confidence = break_even_confidence
+        self._cache = TTLCache(max_entries=cache_entries, ttl_seconds=cache_ttl_seconds, name="budget_simulations")
+
+    def simulate(self, scenario):
+        """
+        Returns the BudgetResult for `scenario`, from the cache if it was simulated before.
+        """
+        key = f"{self.scenarios}\0{self.break_even_confidence}\0{scenario.key()}"
+        result = self._cache.get(key)
+        if result is None:
+            seed = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+            result = self._run(scenario, np.random.default_rng(seed))
+            self._cache.set(key, result)
+        return result
+
+    def _run(self, scenario, rng):
+        n = self.scenarios
+        # Line items only matter through their total: sum of lows plus the spans weighted by the draws
+        cost = np.full(n, sum(low for _, low, _ in scenario.line_items))
+        spans = np.array([high - low for _, low, high in scenario.line_items if high > low])
+        if spans.size:
+            cost += spans @ _triangular_units(rng, spans.size, n)
+
+        low, high = scenario.attendance
+        attendance = np.rint(low + (high - low) * _triangular_units(rng, 1, n)[0])
+        low, high = scenario.per_attendee_cost
+        cost += attendance * (low + (high - low) * _triangular_units(rng, 1, n)[0])
+
+        sponsorship = np.zeros(n)
+        if scenario.sponsors:
+            amounts = np.array([amount for _, amount, _ in scenario.sponsors])
+            probabilities = np.array([probability for _, _, probability in scenario.sponsors])
+            paid = rng.random((len(scenario.sponsors), n)) < probabilities[:, None]
+            sponsorship = amounts @ paid
+
+        income = sponsorship + attendance * scenario.ticket_price
+        net = income - cost
+        shortfall = net < 0
+        shortfall_probability = float(shortfall.mean())
+        expected_shortfall = float(-net[shortfall].mean()) if shortfall.any() else 0.0
+
+        # Ticket price at which each scenario breaks even; nobody attending means no price can help
+        uncovered = cost - sponsorship
+        with np.errstate(divide="ignore", invalid="ignore"):
+            required = np.where(attendance > 0, uncovered / attendance, np.where(uncovered > 0, np.inf, 0.0))
+            required = np.maximum(required, 0.0)
+            break_even_price, median_break_even_price = np.quantile(required, [self.break_even_confidence, 0.5])
+
+        return BudgetResult(
+            scenarios=n,
+            cost=_percentiles(cost),
+            income=_percentiles(income),
+            net=_percentiles(net),
+            shortfall_probability=shortfall_probability,
+            expected_shortfall=expected_shortfall,
+            break_even_price=float(break_even_price),
+            median_break_even_price=float(median_break_even_price),
+            break_even_confidence=self.break_even_confidence,
+        )
+
+
+def _percentiles(values):
+    return dict(zip(PERCENTILES, (float(value) for value in np.percentile(values, PERCENTILES))))
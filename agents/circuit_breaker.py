@@ -0,0 +1,129 @@
+"""
+Health tracking and circuit breaking for the destinations the Porter depends on.
+
+Each CircuitBreaker keeps the outcome and latency of the last `window` calls to
+one destination (a specialist agent or the LLM backend). A call fails if it
+errored, timed out or took longer than `slow_call_seconds`.
+
+States:
+  closed     calls go through. Once at least `min_calls` are in the window and
+             `failure_rate` of them failed, the breaker opens.
+  open       `allow()` returns False, so the caller answers from a local fallback
+             straight away instead of waiting on a destination that is down.
+  half_open  after `open_seconds` one probe call is let through. Success closes
+             the breaker with a fresh window; failure opens it again. A probe
+             with no outcome after another `open_seconds` is presumed lost and
+             a new one is allowed.
+
+State, rolling error rate and latency are exported as localhive_circuit_* metrics.
+"""
+import time
+from collections import deque
+
+from instrumentation import metrics
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+metrics.describe("localhive_circuit_state", "Circuit breaker state per destination: 0 closed, 1 half-open, 2 open.")
+metrics.describe("localhive_circuit_error_rate", "Share of failed calls in the breaker's rolling window.")
+metrics.describe("localhive_circuit_latency_seconds", "Rolling call latency per destination.")
+metrics.describe("localhive_circuit_rejected_total", "Calls failed fast because the breaker was open.")
+metrics.describe("localhive_circuit_transitions_total", "Breaker state changes.")
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for one destination.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, slow_call_seconds=10.0, open_seconds=30.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._clock = clock
+        self._calls = deque(maxlen=window) # (failed, latency_seconds)
+        self._opened_at = 0.0
+        self._probe_started_at = None
+        self._rejected = metrics.counter("localhive_circuit_rejected_total", destination=name)
+        metrics.add_collector(self._collect)
+
+    def available(self):
+        """
+        True if a call would be allowed right now. Unlike `allow`, never takes the probe.
+        """
+        if self.state == CLOSED:
+            return True
+        now = self._clock()
+        if self.state == OPEN:
+            return now - self._opened_at >= self.open_seconds
+        return self._probe_started_at is None or now - self._probe_started_at >= self.open_seconds
+
+    def allow(self):
+        """
+        Returns True if the caller may call the destination now; callers that get
+        True must report the outcome with `record`.
+        """
+        if self.state == CLOSED:
+            return True
+        if not self.available():
+            self._rejected.inc()
+            return False
+        if self.state == OPEN:
+            self._transition(HALF_OPEN)
+        self._probe_started_at = self._clock()
+        return True
+
+    def record(self, success, latency=0.0):
+        """
+        Reports the outcome of an allowed call.
+        """
+        failed = not success or latency > self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            self._probe_started_at = None
+            if failed:
+                self._open()
+            else:
+                self._calls.clear()
+                self._transition(CLOSED)
+            return
+        self._calls.append((failed, latency))
+        if self.state == CLOSED and len(self._calls) >= self.min_calls and self.error_rate() >= self.failure_rate:
+            self._open()
+
+    def error_rate(self):
+        if not self._calls:
+            return 0.0
+        return sum(1 for failed, _ in self._calls if failed) / len(self._calls)
+
+    def latency_quantile(self, q):
+        if not self._calls:
+            return 0.0
+        latencies = sorted(latency for _, latency in self._calls)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def _open(self):
+        self._opened_at = self._clock()
+        self._transition(OPEN)
+
+    def _transition(self, state):
+        if state != self.state:
+            self.state = state
+            metrics.counter("localhive_circuit_transitions_total", destination=self.name, to=state).inc()
+
+    def _collect(self):
+        metrics.gauge("localhive_circuit_state", destination=self.name).set(STATE_VALUES[self.state])
+        metrics.gauge("localhive_circuit_error_rate", destination=self.name).set(self.error_rate())
+        for q in (0.5, 0.95):
+            metrics.gauge("localhive_circuit_latency_seconds", destination=self.name, quantile=str(q)).set(
+                self.latency_quantile(q)
+            )
+
+    def __repr__(self):
+        return f"CircuitBreaker({self.name!r}, state={self.state}, error_rate={self.error_rate():.2f})"
@@ -0,0 +1,149 @@
+"""
+In-memory transport between LocalHive agents running in the same process.
+
+Normally a delegation from the Porter to a specialist is a signed envelope,
+serialized to JSON and POSTed to the specialist's endpoint (or, inside a Bureau,
+serialized, queued and parsed again). When every agent lives in one process none
+of that is needed: LocalBus hands the message object itself to the destination
+handler on the same event loop.
+
+Handler code does not change. `install(bus)` wraps `ctx.send` so that a message
+from one of the bus's agents to a registered (address, model) pair is delivered
+through the bus, and everything else (users, the geolocation agent, unknown
+models) still goes out over the normal uAgents path. Agents that are not on an
+installed bus, e.g. in another Bureau in the same process, are never affected,
+and `uninstall(bus)` restores the original `send` once no bus is left. Because
+the same object is shared between sender and receiver, handlers must treat
+received messages as read-only.
+
+Like a real agent, each destination handles one locally delivered message at a
+time, in arrival order.
+"""
+import asyncio
+import time
+
+from uagents import Model
+from uagents.context import InternalContext
+
+try:
+    from uagents_core.types import DeliveryStatus, MsgStatus
+except ImportError: # uagents releases before the split into uagents_core
+    from uagents.types import DeliveryStatus, MsgStatus
+
+from instrumentation import metrics
+
+
+class LocalBus:
+    """
+    Registry of in-process handlers keyed by destination address and model schema.
+    """
+
+    def __init__(self):
+        self._agents = {} # address -> Agent
+        self._routes = {} # (address, schema digest) -> handler
+        self._digests = {} # model class -> schema digest
+        self._locks = {} # address -> asyncio.Lock, created lazily on the running loop
+        self._tasks = set()
+        self._delivered = metrics.counter("localhive_local_bus_messages_total")
+        self._latency = metrics.histogram("localhive_local_bus_delivery_seconds")
+
+    def register(self, agent, model, handler):
+        """
+        Routes `model` messages sent to `agent` straight to `handler(ctx, sender, msg)`.
+        """
+        self._agents[agent.address] = agent
+        self._routes[(agent.address, self._digest(model))] = handler
+
+    def owns(self, address):
+        return address in self._agents
+
+    def route_for(self, destination, message):
+        if destination not in self._agents:
+            return None
+        return self._routes.get((destination, self._digest(type(message))))
+
+    def deliver(self, sender, destination, message, session, handler):
+        """
+        Schedules `handler` for `message` on the running loop and returns immediately,
+        like a network send would.
+        """
+        task = asyncio.get_running_loop().create_task(
+            self._run(sender, destination, message, session, handler, time.perf_counter())
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, sender, destination, message, session, handler, sent_at):
+        agent = self._agents[destination]
+        lock = self._locks.get(destination)
+        if lock is None:
+            lock = self._locks[destination] = asyncio.Lock()
+        async with lock:
+            # uAgents has no public way to build a context outside its own dispatch loop
+            ctx = agent._build_context()
+            ctx._session = session # Replies stay on the sender's session, as over the network
+            self._latency.observe(time.perf_counter() - sent_at)
+            self._delivered.inc()
+            try:
+                await handler(ctx, sender, message)
+            except Exception as e:
+                ctx.logger.exception("Local handler %s failed: %s", handler.__name__, e)
+
+    def _digest(self, model):
+        # Schema digests are what uAgents matches messages by; computing one is
+        # expensive, so it is done once per class. Two classes with the same name
+        # and fields (e.g. the Porter's and the DataManager's UserProfileData)
+        # share a digest, exactly as they would across processes.
+        digest = self._digests.get(model)
+        if digest is None:
+            digest = self._digests[model] = Model.build_schema_digest(model)
+        return digest
+
+    def __len__(self):
+        return len(self._routes)
+
+
+_installed_buses = []
+_network_send = None
+
+
+def install(bus):
+    """
+    Makes the contexts of `bus`'s agents send through it where it has a route.
+    """
+    global _network_send
+    if bus not in _installed_buses:
+        _installed_buses.append(bus)
+    if _network_send is not None:
+        return
+    # uAgents builds a fresh context for every handler call, so the class is the only place to hook send
+    _network_send = network_send = InternalContext.send
+
+    async def send(self, destination, message, *args, **kwargs):
+        sender = self.agent.address
+        bus = next((bus for bus in _installed_buses if bus.owns(sender)), None)
+        handler = bus.route_for(destination, message) if bus is not None else None
+        if handler is None:
+            return await network_send(self, destination, message, *args, **kwargs)
+        bus.deliver(sender, destination, message, self.session, handler)
+        return MsgStatus(
+            status=DeliveryStatus.DELIVERED,
+            detail="Message dispatched in-process",
+            destination=destination,
+            endpoint="",
+            session=self.session,
+        )
+
+    InternalContext.send = send
+
+
+def uninstall(bus):
+    """
+    Sends `bus`'s agents back over the network; restores uAgents' own send once no bus is installed.
+    """
+    global _network_send
+    if bus in _installed_buses:
+        _installed_buses.remove(bus)
+    if not _installed_buses and _network_send is not None:
+        InternalContext.send = _network_send
+        _network_send = None
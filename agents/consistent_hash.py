@@ -0,0 +1,64 @@
+"""
+Consistent hash ring for spreading users over Porter shards.
+
+Each node is placed on the ring at `vnodes` pseudo-random points; a key belongs
+to the first node point at or after the key's own hash. Adding a node only moves
+the keys that land on its new points (about 1/N of them), which keeps
+rebalancing cheap, and virtual nodes keep the split between nodes even.
+"""
+import bisect
+import hashlib
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Maps string keys to nodes; lookups are a binary search over the ring.
+    """
+
+    def __init__(self, nodes=(), vnodes=128):
+        self.vnodes = vnodes
+        self._points = [] # sorted hashes
+        self._owners = [] # node owning the point at the same index
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return list(self._nodes)
+
+    def add(self, node):
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        keep = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in keep]
+        self._owners = [owner for _, owner in keep]
+
+    def node_for(self, key):
+        if not self._points:
+            raise LookupError("the hash ring has no nodes")
+        index = bisect.bisect_right(self._points, _hash(key))
+        if index == len(self._points):
+            index = 0 # Wrap around to the first point
+        return self._owners[index]
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node):
+        return node in self._nodes
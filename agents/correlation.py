@@ -0,0 +1,113 @@
+"""
+Bounded, TTL-expiring correlation tables.
+
+The Porter talks to other agents asynchronously: it sends a request, returns
+from the handler, and the answer arrives later in a different handler. A
+CorrelationTable remembers who is waiting for which reply, keyed by a
+request/correlation id, so the answer can be matched back in O(1) instead of
+scanning every user in storage.
+"""
+import time
+from collections import OrderedDict
+
+
+class CorrelationTable:
+    """
+    Maps correlation ids to the party waiting on them.
+
+    Entries expire after `ttl_seconds` and the table never holds more than
+    `max_size` entries (the oldest pending entry is evicted first), so a
+    destination that never answers cannot make the table grow without bound.
+    `on_drop(key, value)`, if given, is called for every entry that expires or is
+    evicted before being popped.
+    """
+
+    def __init__(self, ttl_seconds=120.0, max_size=10000, clock=time.monotonic, on_drop=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._on_drop = on_drop
+        # key -> (expires_at, value). All entries share one TTL, so insertion
+        # order is also expiry order and purging only ever looks at the head.
+        self._entries = OrderedDict()
+        # Keys that expired or were evicted recently, so a late reply can be told
+        # apart from one we never asked for. Bounded like the table itself.
+        self._recently_dropped = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    def add(self, key, value):
+        """
+        Registers `value` as waiting on `key`, replacing any previous entry.
+        """
+        now = self._clock()
+        self.purge(now)
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl_seconds, value)
+        while len(self._entries) > self.max_size:
+            evicted_key, (_, evicted_value) = self._entries.popitem(last=False)
+            self._remember_dropped(evicted_key, evicted_value)
+            self.evicted += 1
+
+    def get(self, key, default=None):
+        """
+        Returns the live value for `key` without removing it.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= self._clock():
+            del self._entries[key]
+            self._remember_dropped(key, entry[1])
+            self.expired += 1
+            return default
+        return entry[1]
+
+    def pop(self, key, default=None):
+        """
+        Removes and returns the live value for `key`.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        if entry[0] <= self._clock():
+            self._remember_dropped(key, entry[1])
+            self.expired += 1
+            return default
+        return entry[1]
+
+    def purge(self, now=None):
+        """
+        Drops expired entries and returns how many were removed.
+        """
+        if now is None:
+            now = self._clock()
+        removed = 0
+        while self._entries:
+            key, (expires_at, value) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self._remember_dropped(key, value)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def was_dropped(self, key):
+        """
+        True if `key` was pending recently but expired or was evicted before being popped.
+        """
+        return key in self._recently_dropped
+
+    def _remember_dropped(self, key, value):
+        if self._on_drop is not None:
+            self._on_drop(key, value)
+        self._recently_dropped[key] = None
+        while len(self._recently_dropped) > self.max_size:
+            self._recently_dropped.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from uuid import uuid4
 
 from uagents import Agent, Context, Protocol, Model
@@ -8,6 +9,10 @@ from uagents_core.contrib.protocols.chat import (
     TextContent,
 )
 
+from instrumentation import export_metrics, instrumented
+from spatial_index import GeoGridIndex
+from write_behind import WriteBehindStore
+
 # Define a custom model for user profile data (must match Porter's UserProfileData)
 class UserProfileData(ChatMessage):
     user_name: str
@@ -15,17 +20,108 @@ class UserProfileData(ChatMessage):
     latitude: float
     longitude: float
 
+# Query for stored users near a point: everyone within `radius_km`, the `k` nearest, or
+# (if both are given) the `k` nearest within `radius_km`.
+class NearbyUsersRequest(Model):
+    latitude: float
+    longitude: float
+    radius_km: Optional[float] = None
+    k: Optional[int] = None
+
+class NearbyUser(Model):
+    key: str
+    name: str
+    locality: str
+    distance_km: float
+
+class NearbyUsersResponse(Model):
+    users: List[NearbyUser]
+
+# --- CONFIGURATION ---
+# Grid cell size of the spatial index; ~5.5 km, close to a typical "near me" radius
+SPATIAL_INDEX_CELL_DEGREES = 0.05
+# Profiles are persisted write-behind: batched appends to a log, flushed once this many
+# profiles are dirty or this many seconds have passed, whichever comes first.
+PROFILE_STORE_PATH = "data_manager_profiles"
+PROFILE_FLUSH_BATCH_SIZE = 500
+PROFILE_FLUSH_INTERVAL_SECONDS = 2.0
+
 # --- AGENT SETUP ---
 data_manager_agent = Agent(name="DataManagerAgent", seed="data_manager_recovery_phrase")
+export_metrics(data_manager_agent)
+
+# Profile store (read-your-writes in memory, batched crash-safe persistence on disk)
+profile_store = WriteBehindStore(
+    PROFILE_STORE_PATH,
+    flush_batch_size=PROFILE_FLUSH_BATCH_SIZE,
+    flush_interval_seconds=PROFILE_FLUSH_INTERVAL_SECONDS,
+)
+
+# In-memory spatial index over stored profiles, kept current on every profile write
+profile_index = GeoGridIndex(cell_degrees=SPATIAL_INDEX_CELL_DEGREES)
 
 # Define a protocol for handling UserProfileData and acknowledgements
 data_protocol = Protocol()
 data_protocol.add_message(UserProfileData, replies=ChatAcknowledgement)
+data_protocol.add_message(NearbyUsersRequest, replies=NearbyUsersResponse)
 data_protocol.add_message(ChatAcknowledgement)
 
+def _migrate_legacy_profiles(ctx: Context):
+    """
+    Moves profiles still kept in ctx.storage (from before the profile store) into the
+    profile store. Returns how many were migrated.
+    """
+    # KeyValueStore has no public way to list its keys
+    legacy_entries = dict(getattr(ctx.storage, "_data", {}))
+    migrated = [
+        user_key for user_key, user_data in legacy_entries.items()
+        if isinstance(user_data, dict) and "latitude" in user_data and "longitude" in user_data
+    ]
+    for user_key in migrated:
+        if user_key not in profile_store:
+            profile_store.set(user_key, legacy_entries[user_key])
+    if not migrated:
+        return 0
+    profile_store.flush()
+    # Every removal rewrites the storage file, so drop everything at once when we can
+    if len(migrated) == len(legacy_entries):
+        ctx.storage.clear()
+    else:
+        for user_key in migrated:
+            ctx.storage.remove(user_key)
+    return len(migrated)
+
+@data_manager_agent.on_event("startup")
+async def rebuild_profile_index(ctx: Context):
+    """
+    Migrates legacy ctx.storage profiles into the profile store, then rebuilds the
+    spatial index from the profiles in the profile store.
+    """
+    migrated = _migrate_legacy_profiles(ctx)
+    if migrated:
+        ctx.logger.info("Migrated %s legacy profiles into the profile store.", migrated)
+    for user_key, user_data in profile_store.items():
+        profile_index.insert(user_key, user_data["latitude"], user_data["longitude"])
+    ctx.logger.info("Spatial index rebuilt with %s profiles.", len(profile_index))
+
+@data_manager_agent.on_interval(period=PROFILE_FLUSH_INTERVAL_SECONDS)
+async def flush_profile_store(ctx: Context):
+    """
+    Flushes profiles written since the last batch, so quiet periods don't delay persistence.
+    """
+    if profile_store.dirty_count:
+        count = profile_store.dirty_count
+        profile_store.flush()
+        ctx.logger.info("Flushed %s profile writes to disk.", count)
+
+@data_manager_agent.on_event("shutdown")
+async def close_profile_store(ctx: Context):
+    profile_store.close()
+
 # --- MESSAGE HANDLERS ---
 
 @data_protocol.on_message(UserProfileData)
+@instrumented("DataManagerAgent")
 async def handle_user_profile_data(ctx: Context, sender: str, msg: UserProfileData):
     """
     Receives user profile data from the PorterAgent and stores it.
@@ -40,20 +136,52 @@ async def handle_user_profile_data(ctx: Context, sender: str, msg: UserProfileDa
         "last_updated": datetime.now().isoformat()
     }
 
-    ctx.storage.set(user_key, user_data_to_store)
-    ctx.logger.info(f"Stored user data for '{msg.user_name}' ({msg.locality}) under key '{user_key}'.")
-    ctx.logger.info(f"Full stored data: {ctx.storage.get(user_key)}")
+    profile_store.set(user_key, user_data_to_store)
+    profile_store.maybe_flush()
+    profile_index.insert(user_key, msg.latitude, msg.longitude)
+    ctx.logger.info("Stored user data for '%s' (%s) under key '%s'.", msg.user_name, msg.locality, user_key)
+    ctx.logger.debug("Full stored data: %s", profile_store.get(user_key))
 
     await ctx.send(
         sender,
         ChatAcknowledgement(timestamp=datetime.now(), acknowledged_msg_id=msg.msg_id),
     )
 
+@data_protocol.on_message(NearbyUsersRequest)
+@instrumented("DataManagerAgent")
+async def handle_nearby_users_request(ctx: Context, sender: str, msg: NearbyUsersRequest):
+    """
+    Answers "users near me" queries from the spatial index.
+    """
+    if msg.k is not None:
+        matches = profile_index.nearest(msg.latitude, msg.longitude, msg.k)
+        if msg.radius_km is not None:
+            matches = [(distance, key) for distance, key in matches if distance <= msg.radius_km]
+    elif msg.radius_km is not None:
+        matches = profile_index.within_radius(msg.latitude, msg.longitude, msg.radius_km)
+    else:
+        matches = []
+
+    users = []
+    for distance, user_key in matches:
+        user_data = profile_store.get(user_key)
+        if user_data:
+            users.append(NearbyUser(
+                key=user_key,
+                name=user_data["name"],
+                locality=user_data["locality"],
+                distance_km=round(distance, 3),
+            ))
+
+    ctx.logger.info("Found %s users near (%s, %s) for %s.", len(users), msg.latitude, msg.longitude, sender)
+    await ctx.send(sender, NearbyUsersResponse(users=users))
+
 @data_protocol.on_message(ChatAcknowledgement)
+@instrumented("DataManagerAgent")
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
     """
     Handles acknowledgements from other agents.
     """
-    ctx.logger.info(f"Received acknowledgement from {sender} for message ID: {msg.acknowledged_msg_id}")
+    ctx.logger.info("Received acknowledgement from %s for message ID: %s", sender, msg.acknowledged_msg_id)
 
 data_manager_agent.include(data_protocol, publish_manifest=True)
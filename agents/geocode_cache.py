@@ -0,0 +1,32 @@
+"""
+Persistent geocoding cache keyed by normalized locality.
+
+Most users name the same few localities ("Bhopal, India", "Arera Colony, Bhopal"),
+so coordinates are cached under a normalized form of the locality string and
+reused instead of asking the geolocation agent again.
+"""
+import re
+
+from ttl_cache import TTLCache
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_locality(locality):
+    """
+    "Arera Colony,  Bhopal." -> "arera colony bhopal"
+    """
+    return _NON_WORD.sub(" ", locality.lower()).strip()
+
+
+class GeocodeCache(TTLCache):
+    """
+    TTLCache of locality -> (latitude, longitude).
+    """
+
+    def get_coordinates(self, locality):
+        coordinates = self.get(normalize_locality(locality))
+        return tuple(coordinates) if coordinates is not None else None
+
+    def set_coordinates(self, locality, latitude, longitude):
+        self.set(normalize_locality(locality), [latitude, longitude])
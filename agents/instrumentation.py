@@ -0,0 +1,318 @@
+"""
+Shared metrics for LocalHive agents: handler latency histograms, message and
+error counts, LLM call durations and storage op timings.
+
+Everything is recorded in one process-wide registry (`metrics`). Handlers are
+instrumented with a decorator placed under the protocol's `on_message`:
+
+    @chat_proto.on_message(ChatMessage)
+    @instrumented("PorterAgent")
+    async def handle_user_message(ctx: Context, sender: str, msg: ChatMessage):
+        ...
+
+and other code times itself with `metrics.timer(...)`. Metric objects are
+looked up once, when the decorator or timer is created, so recording a sample
+on the hot path is two clock reads, a bisect and a few additions.
+
+`export_metrics(agent)` starts whichever exporters the environment asks for:
+  LOCALHIVE_METRICS_PORT              serve Prometheus text format on http://127.0.0.1:PORT/metrics
+  LOCALHIVE_METRICS_SNAPSHOT          write a JSON snapshot to this path periodically
+  LOCALHIVE_METRICS_SNAPSHOT_SECONDS  how often to write the snapshot (default 15)
+  LOCALHIVE_METRICS_COLLECT_SECONDS   how often gauges mirroring agent state are refreshed (default 5)
+
+Collectors read state the agent's event loop owns, so they only ever run on that
+loop; /metrics is served from another thread and reports what they last set.
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; a final +Inf bucket catches everything slower
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; `counts[i]` holds samples <= `buckets[i]` (non-cumulative).
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th quantile (q in 0..1).
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    """
+    Context manager that observes its elapsed time into a histogram.
+    """
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Named metrics, each keyed by its sorted label pairs.
+    """
+
+    def __init__(self):
+        self._metrics = {} # (kind, name, labels) -> metric
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, kind, factory, name, labels):
+        key = (kind, name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(key, factory())
+        return metric
+
+    def counter(self, name, **labels):
+        return self._get("counter", Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get("gauge", Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self._get("histogram", Histogram, name, labels)
+
+    def timer(self, name, **labels):
+        """
+        Returns a context manager timing its block into histogram `name`.
+        Create it once and reuse it on hot paths; a shared timer must only wrap
+        blocks that don't await, since it holds a single start time.
+        """
+        return _Timer(self.histogram(name, **labels))
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def add_collector(self, collector):
+        """
+        Registers a callable that sets gauges mirroring state kept elsewhere (cache
+        stats, pending request tables). Collectors run on the agent's event loop,
+        never on the /metrics thread.
+        """
+        self._collectors.append(collector)
+
+    def collect(self):
+        """
+        Runs the collectors. Call only from the event loop that owns the state they read.
+        """
+        for collector in self._collectors:
+            collector()
+
+    # --- Export ---
+
+    def render_prometheus(self):
+        """
+        All metrics in the Prometheus text exposition format. Gauges set by collectors
+        hold the values from the last `collect`.
+        """
+        by_name = {}
+        for (kind, name, labels), metric in list(self._metrics.items()):
+            by_name.setdefault((name, kind), []).append((labels, metric))
+
+        lines = []
+        for (name, kind), series in sorted(by_name.items()):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float("inf"),), metric.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        JSON-friendly summary: counter/gauge values and histogram count, sum and p50/p95/p99.
+        Gauges set by collectors hold the values from the last `collect`.
+        """
+        result = {"timestamp": time.time(), "counters": [], "gauges": [], "histograms": []}
+        for (kind, name, labels), metric in list(self._metrics.items()):
+            entry = {"name": name, "labels": dict(labels)}
+            if kind == "histogram":
+                entry.update(
+                    count=metric.count,
+                    sum=metric.sum,
+                    p50=metric.quantile(0.50),
+                    p95=metric.quantile(0.95),
+                    p99=metric.quantile(0.99),
+                )
+                result["histograms"].append(entry)
+            else:
+                entry["value"] = metric.value
+                result[kind + "s"].append(entry)
+        return result
+
+    def write_snapshot(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("localhive_handler_latency_seconds", "Time spent in a message handler.")
+metrics.describe("localhive_handler_messages_total", "Messages handled.")
+metrics.describe("localhive_handler_errors_total", "Messages whose handler raised.")
+metrics.describe("localhive_llm_call_seconds", "Duration of LLM calls, including time waiting for a slot.")
+metrics.describe("localhive_llm_calls_total", "LLM calls by outcome.")
+metrics.describe("localhive_storage_op_seconds", "Duration of storage operations.")
+
+
+def instrumented(agent_name):
+    """
+    Decorator recording latency, message count and error count for an async handler.
+    """
+    def decorator(handler):
+        labels = {"agent": agent_name, "handler": handler.__name__}
+        latency = metrics.histogram("localhive_handler_latency_seconds", **labels)
+        messages = metrics.counter("localhive_handler_messages_total", **labels)
+        errors = metrics.counter("localhive_handler_errors_total", **labels)
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await handler(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+                messages.inc()
+
+        return wrapper
+    return decorator
+
+
+# --- Exporters ---
+
+_server = None
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Keep scrapes out of the agent's log
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serves /metrics from a daemon thread. Only one server runs per process, so
+    agents sharing a process (e.g. in a Bureau) share one endpoint.
+    """
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="localhive-metrics", daemon=True).start()
+    return _server
+
+
+def export_metrics(agent):
+    """
+    Starts the exporters configured through the environment (see module docstring).
+    """
+    port = os.getenv("LOCALHIVE_METRICS_PORT")
+    if port:
+        start_metrics_server(int(port))
+
+        @agent.on_interval(period=float(os.getenv("LOCALHIVE_METRICS_COLLECT_SECONDS", "5")))
+        async def collect_metrics(ctx):
+            metrics.collect()
+
+    snapshot_path = os.getenv("LOCALHIVE_METRICS_SNAPSHOT")
+    if snapshot_path:
+        period = float(os.getenv("LOCALHIVE_METRICS_SNAPSHOT_SECONDS", "15"))
+
+        @agent.on_interval(period=period)
+        async def write_metrics_snapshot(ctx):
+            metrics.collect()
+            metrics.write_snapshot(snapshot_path)
@@ -0,0 +1,232 @@
+"""
+Embedding-based intent classifier, used when the keyword router finds no intent.
+
+Keyword routing misses paraphrases ("get money for our fair" has no finance
+keyword), and those queries then fall through to a slow LLM call. The
+classifier embeds the query and compares it with one centroid per intent, built
+from a handful of labelled example phrases.
+
+The default embedder is a hashed bag of words and character n-grams, which runs
+fully offline with no model download. Any object with `embed(texts) -> (n, d)
+array` and a `fingerprint` string can replace it, e.g. a small local
+sentence-embedding model.
+
+Rows are L2-normalized, so scoring every intent is one matrix-vector product
+(or one matrix product for a batch). Centroids are cached in an .npz file keyed
+by a fingerprint of the examples and the embedder, so they are only recomputed
+when either changes. A query is left unclassified when its best cosine
+similarity is below `threshold`, or when its best specialist intent does not
+beat the "general" intent by at least `margin`.
+"""
+import hashlib
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+
+GENERAL_INTENT = "general"
+WORD_CACHE_MAX_ENTRIES = 50000
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashedNgramEmbedder:
+    """
+    Signed feature hashing of words and character n-grams into `dim` dimensions.
+    """
+
+    def __init__(self, dim=4096, ngram_sizes=(3, 4), word_weight=2.0):
+        if dim & (dim - 1):
+            raise ValueError("dim must be a power of two")
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.word_weight = word_weight
+        self.fingerprint = f"hashed-ngrams:{dim}:{self.ngram_sizes}:{word_weight}"
+        self._word_cache = {}
+
+    def _word_features(self, word):
+        """
+        Returns [(index, signed weight)] for one word; cached, since queries reuse a small vocabulary.
+        """
+        features = self._word_cache.get(word)
+        if features is None:
+            padded = f" {word} "
+            grams = [("w:" + word, self.word_weight)] + [
+                (padded[i:i + n], 1.0) for n in self.ngram_sizes for i in range(len(padded) - n + 1)
+            ]
+            mask = self.dim - 1
+            features = []
+            for gram, weight in grams:
+                h = zlib.crc32(gram.encode())
+                features.append((h & mask, weight if h & 0x80000000 else -weight))
+            if len(self._word_cache) >= WORD_CACHE_MAX_ENTRIES:
+                self._word_cache.clear()
+            self._word_cache[word] = features
+        return features
+
+    def embed(self, texts):
+        rows, columns, weights = [], [], []
+        for row, text in enumerate(texts):
+            for word in _WORD_RE.findall(text.lower()):
+                for index, weight in self._word_features(word):
+                    rows.append(row)
+                    columns.append(index)
+                    weights.append(weight)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (rows, columns), weights) # Scatter-add, so colliding features sum up
+        return vectors
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IntentClassifier:
+    """
+    Nearest-centroid intent classifier over normalized embeddings.
+
+    `examples` maps an intent name to a list of example phrases. Include a
+    GENERAL_INTENT entry with off-topic phrases so they are told apart from the
+    specialist intents instead of being forced onto the closest one.
+    """
+
+    def __init__(self, examples, embedder=None, threshold=0.2, margin=0.1, cache_path=None):
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.threshold = threshold
+        self.margin = margin
+        self.intents = list(examples)
+        self.cache_hit = None # Whether the centroids came from cache_path
+        self.centroids = self._load_or_build(examples, cache_path)
+
+    def _load_or_build(self, examples, cache_path):
+        fingerprint = hashlib.blake2b(
+            json.dumps([self.embedder.fingerprint, examples], sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+        if cache_path and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                if str(cached["fingerprint"]) == fingerprint and list(cached["intents"]) == self.intents:
+                    self.cache_hit = True
+                    return cached["centroids"]
+
+        self.cache_hit = False
+        centroids = np.stack([
+            _normalize(_normalize(self.embedder.embed(examples[intent])).mean(axis=0))
+            for intent in self.intents
+        ]).astype(np.float32)
+        if cache_path:
+            tmp_path = cache_path + ".tmp.npz"
+            np.savez(tmp_path, fingerprint=fingerprint, intents=np.array(self.intents), centroids=centroids)
+            os.replace(tmp_path, cache_path)
+        return centroids
+
+    def scores(self, text):
+        """
+        Returns {intent: cosine similarity} for `text`.
+        """
+        similarities = self.centroids @ _normalize(self.embedder.embed([text])[0])
+        return dict(zip(self.intents, similarities.tolist()))
+
+    def classify(self, text):
+        """
+        Returns (intent, confidence). The intent is None below the threshold, for general
+        queries, and when the best intent is within `margin` of the general intent.
+        """
+        return self.classify_many([text])[0]
+
+    def classify_many(self, texts):
+        """
+        Classifies a batch of texts with a single matrix product.
+        """
+        similarities = _normalize(self.embedder.embed(texts)) @ self.centroids.T
+        best = similarities.argmax(axis=1)
+        general = self.intents.index(GENERAL_INTENT) if GENERAL_INTENT in self.intents else None
+        results = []
+        for row, index in enumerate(best.tolist()):
+            confidence = float(similarities[row, index])
+            intent = self.intents[index]
+            if confidence < self.threshold or intent == GENERAL_INTENT:
+                intent = None
+            elif general is not None and confidence - similarities[row, general] < self.margin:
+                intent = None
+            results.append((intent, confidence))
+        return results
+
+
+# --- EXAMPLE PHRASES ---
+# intent -> example phrases, using the same intent names as PORTER_INTENTS in intent_router.py
+
+PORTER_INTENT_EXAMPLES = {
+    "event": [
+        "plan a community event",
+        "organize a picnic in the park",
+        "help me arrange a neighbourhood get-together",
+        "we want to host a festival",
+        "set up a cleanup drive this weekend",
+        "put together a party for the colony",
+        "hold a meetup for residents",
+        "celebrate diwali together with neighbours",
+        "schedule a fair for the kids",
+        "run a marathon for charity",
+    ],
+    "finance": [
+        "find sponsors for our festival",
+        "get money for the fair",
+        "raise funds for the cleanup drive",
+        "how much will the event cost",
+        "help with the budget",
+        "who can fund our community event",
+        "collect donations from local shops",
+        "pay for the stage and lights",
+        "need financial support for the picnic",
+        "crowdfunding for the neighbourhood festival",
+    ],
+    "venue": [
+        "where can we hold the event",
+        "find a hall near me",
+        "a ground big enough for 200 people",
+        "book a park for sunday",
+        "which place is good for a picnic",
+        "rent a community hall",
+        "open space near arera colony",
+        "location for the meetup",
+        "is the lake garden available",
+        "show me places on the map",
+    ],
+    "service": [
+        "i need a gardener",
+        "looking for a plumber",
+        "find me an electrician",
+        "i can offer tutoring",
+        "hire a photographer for the wedding",
+        "someone to fix my fridge",
+        "who can teach my kid maths",
+        "i offer cooking classes",
+        "need a carpenter for the shelves",
+        "looking for a babysitter this evening",
+    ],
+    GENERAL_INTENT: [
+        "hello",
+        "what can you do",
+        "who are you",
+        "tell me about bhopal",
+        "what is the weather today",
+        "thank you",
+        "how does localhive work",
+        "what time is it",
+        "tell me a joke",
+        "good morning",
+        "hi",
+        "how are you",
+        "nice to meet you",
+        "thanks",
+        "thanks for the help",
+        "ok",
+        "okay great",
+        "cool, that's all",
+        "bye",
+        "goodbye, see you later",
+    ],
+}
@@ -0,0 +1,146 @@
+"""
+Single-pass keyword intent router shared by the Porter, the demo and the specialist agents.
+
+All keywords of an intent table are compiled into one Aho-Corasick automaton, so
+routing a message is a single scan over its characters no matter how many
+keywords there are. Matches must sit on word boundaries ("plan" does not match
+"planet"); a keyword ending in "*" only needs a boundary at its start, so
+"sponsor*" matches "sponsor", "sponsors" and "sponsorship".
+
+Each intent has a priority and each keyword an optional weight (default 1.0).
+The intent with the highest total weight wins and ties go to the higher
+priority, so generic words like "help" can be down-weighted instead of relying
+on the order of an if/elif chain.
+"""
+from collections import deque
+
+
+class IntentRouter:
+    """
+    Compiled keyword router.
+
+    `intents` maps an intent name to `(priority, keywords)`, where each keyword is
+    either a string or a `(string, weight)` pair.
+    """
+
+    def __init__(self, intents):
+        self.intents = list(intents)
+        self.priorities = {name: priority for name, (priority, _) in intents.items()}
+        self._goto = [{}]  # node -> {char: node}
+        self._fail = [0]
+        self._outputs = [[]]  # node -> [(intent, length, weight, is_prefix)]
+
+        for name, (_, keywords) in intents.items():
+            for keyword in keywords:
+                weight = 1.0
+                if isinstance(keyword, tuple):
+                    keyword, weight = keyword
+                keyword = keyword.lower()
+                is_prefix = keyword.endswith("*")
+                if is_prefix:
+                    keyword = keyword[:-1]
+                if keyword:
+                    self._add_keyword(keyword, (name, len(keyword), weight, is_prefix))
+        self._build_fail_links()
+
+    def _add_keyword(self, keyword, output):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append(output)
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # Inherit the fail node's matches so every match is reported without walking the chain
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def scores(self, text):
+        """
+        Returns {intent: total keyword weight} for every intent matched in `text`.
+        """
+        text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        last = len(text) - 1
+        scores = {}
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for intent, length, weight, is_prefix in outputs[node]:
+                start = i - length + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if not is_prefix and i < last and text[i + 1].isalnum():
+                    continue
+                scores[intent] = scores.get(intent, 0.0) + weight
+        return scores
+
+    def best(self, scores):
+        """
+        Picks the winning intent from `scores` (highest weight, then priority), or None.
+        """
+        if not scores:
+            return None
+        return max(scores, key=lambda intent: (scores[intent], self.priorities[intent]))
+
+    def route(self, text):
+        """
+        Returns the best matching intent for `text`, or None if nothing matched.
+        """
+        return self.best(self.scores(text))
+
+
+# --- INTENT TABLES ---
+# intent -> (priority, keywords). Higher priority wins ties.
+
+PORTER_INTENTS = {
+    "event": (40, ["event", "events", "organiz*", "organis*", "plan", "plans", "planning", "planned"]),
+    "finance": (30, ["budget*", "sponsor*", "financ*"]),
+    "venue": (20, ["location", "locations", "venue", "venues", "map", "maps"]),
+    # "help" and "find" show up in almost any request, so they only count for half
+    "service": (10, ["service", "services", ("help", 0.5), ("find", 0.5)]),
+}
+
+EVENT_PLANNER_INTENTS = {
+    "picnic": (30, ["picnic*"]),
+    "cleanup": (20, ["cleanup*", "clean-up*", "clean up"]),
+    "festival": (10, ["festival*"]),
+}
+
+LOCAL_RESOURCE_INTENTS = {
+    "venue": (30, ["park", "parks", "venue", "venues"]),
+    "equipment": (20, ["equipment", "sound system*"]),
+    "catering": (10, ["catering", "caterer*", "food"]),
+}
+
+SPONSORSHIP_FINANCE_INTENTS = {
+    "sponsorship": (30, ["sponsor*"]),
+    "budget": (20, ["budget*", "cost", "costs"]),
+    "fundraising": (10, ["fundrais*"]),
+}
+
+# "offer" and "service" only mean something together, so they get the lowest priority
+# and the agent checks for both.
+LOCAL_SERVICE_EXCHANGE_INTENTS = {
+    "photography": (40, ["photographer*", "photos", "photography"]),
+    "gardening": (30, ["gardener*", "gardening"]),
+    "tutoring": (20, ["tutor*", "teaching", "teacher*"]),
+    "offer": (0, ["offer*"]),
+    "service": (0, ["service", "services"]),
+}
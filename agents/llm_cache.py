@@ -0,0 +1,51 @@
+"""
+Response cache for LLM fallback answers.
+
+Users ask the same general questions over and over ("what can you do?", "How do I
+use LocalHive"). Answers are cached under the normalized query plus the system
+prompt that produced them, so a repeated question is served from memory (or the
+optional on-disk tier) instead of paying for another model round trip.
+"""
+import hashlib
+import re
+
+from ttl_cache import TTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """
+    Lowercases `query`, drops punctuation and collapses whitespace.
+    """
+    query = _PUNCTUATION.sub(" ", query.lower())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class LLMResponseCache(TTLCache):
+    """
+    TTLCache keyed by (system prompt, normalized query).
+
+    Pass the *template* of a system prompt rather than a rendered prompt with
+    timestamps in it, otherwise every call gets a fresh key.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=3600.0, path=None, name="llm_cache", max_disk_entries=None,
+                 commit_batch_size=64):
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds, path=path, name=name,
+                         max_disk_entries=max_disk_entries, commit_batch_size=commit_batch_size)
+
+    @staticmethod
+    def make_key(system_prompt, query):
+        digest = hashlib.sha256()
+        digest.update(system_prompt.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalize_query(query).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_response(self, system_prompt, query):
+        return self.get(self.make_key(system_prompt, query))
+
+    def set_response(self, system_prompt, query, response):
+        self.set(self.make_key(system_prompt, query), response)
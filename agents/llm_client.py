@@ -0,0 +1,183 @@
+"""
+Async LLM client used by the Porter's general-query fallback.
+
+uAgents handlers run on a single event loop, so a blocking LLM call stalls every
+other user's messages, acks and geolocation responses until it returns. The
+AsyncLLMClient awaits the model instead, shares one keep-alive connection pool
+between calls, caps the number of requests in flight and gives each request a
+deadline.
+
+Backends are pluggable: anything with an async `complete(messages, max_tokens)`
+method works. OpenAICompatibleBackend talks to ASI:One (or any OpenAI-compatible
+server, e.g. a local stub on http://127.0.0.1:PORT/v1), and StubLLMBackend
+answers in-process for tests and benchmarks. Backends with `supports_batch` set
+also have `complete_batch(conversations, max_tokens)`, which answers several
+conversations in one request (see micro_batcher.py).
+"""
+import asyncio
+import time
+
+import httpx
+from openai import AsyncOpenAI
+
+from instrumentation import metrics
+
+
+class OpenAICompatibleBackend:
+    """
+    Chat-completions backend over a pooled, keep-alive HTTP client.
+
+    With `batch_completions=True`, `complete_batch` sends several conversations as
+    one legacy /completions request with a list of prompts. Only enable it for
+    servers that accept prompt lists (vLLM, llama.cpp and the stub do; ASI:One's
+    chat-only API may not).
+    """
+
+    def __init__(self, base_url, api_key, model, max_connections=20, max_keepalive_connections=10, timeout=30.0,
+                 batch_completions=False):
+        self.model = model
+        self.supports_batch = batch_completions
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            timeout=timeout,
+        )
+        self._client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=self._http_client,
+            max_retries=0, # The caller's deadline decides how long we wait, not retries
+        )
+
+    async def complete(self, messages, max_tokens):
+        r = await self._client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+        )
+        return str(r.choices[0].message.content)
+
+    async def complete_batch(self, conversations, max_tokens):
+        r = await self._client.completions.create(
+            model=self.model,
+            prompt=[_render_prompt(messages) for messages in conversations],
+            max_tokens=max_tokens,
+        )
+        # Place answers by choice index, so a dropped choice leaves a gap (None) instead of shifting the rest
+        answers = [None] * len(conversations)
+        for choice in r.choices:
+            if 0 <= choice.index < len(answers):
+                answers[choice.index] = choice.text.strip()
+        return answers
+
+    async def aclose(self):
+        await self._http_client.aclose()
+
+
+def _render_prompt(messages):
+    """
+    Flattens chat messages into a plain completion prompt.
+    """
+    lines = [f"{message['role'].capitalize()}: {message['content'].strip()}" for message in messages]
+    return "\n\n".join(lines) + "\n\nAssistant:"
+
+
+class StubLLMBackend:
+    """
+    In-process backend that answers after a fixed delay, for tests and benchmarks.
+    A batch costs the same delay as a single call.
+    """
+
+    supports_batch = True
+
+    def __init__(self, reply="This is a stub answer from the LocalHive test LLM.", delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(self, messages, max_tokens):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.reply
+
+    async def complete_batch(self, conversations, max_tokens):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return [self.reply] * len(conversations)
+
+    async def aclose(self):
+        pass
+
+
+class AsyncLLMClient:
+    """
+    Non-blocking front for an LLM backend with an in-flight limit and per-request timeouts.
+
+    At most `max_in_flight` requests reach the backend at once; the rest wait their
+    turn. `timeout` bounds the whole call, including time spent waiting for a slot,
+    and raises asyncio.TimeoutError when it runs out. Cancelling the awaiting task
+    cancels the underlying request and frees its slot.
+    """
+
+    def __init__(self, backend, max_in_flight=8, timeout=20.0):
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.in_flight = 0
+        self._semaphore = None # Created lazily so it binds to the running event loop
+        backend_name = type(backend).__name__
+        self._call_seconds = metrics.histogram("localhive_llm_call_seconds", backend=backend_name)
+        self._outcomes = {
+            outcome: metrics.counter("localhive_llm_calls_total", backend=backend_name, outcome=outcome)
+            for outcome in ("ok", "timeout", "error")
+        }
+
+    @property
+    def supports_batch(self):
+        return getattr(self.backend, "supports_batch", False)
+
+    async def complete(self, messages, max_tokens=200, timeout=None):
+        """
+        Returns the backend's answer for `messages`.
+        """
+        return await self._call(self.backend.complete, messages, max_tokens, timeout)
+
+    async def complete_batch(self, conversations, max_tokens=200, timeout=None):
+        """
+        Returns one answer per conversation from a single backend request. Needs `supports_batch`.
+        """
+        return await self._call(self.backend.complete_batch, conversations, max_tokens, timeout)
+
+    async def _call(self, method, payload, max_tokens, timeout):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            answer = await asyncio.wait_for(
+                self._limited(method, payload, max_tokens),
+                timeout=self.timeout if timeout is None else timeout,
+            )
+            outcome = "ok"
+            return answer
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            self._call_seconds.observe(time.perf_counter() - started)
+            self._outcomes[outcome].inc()
+
+    async def _limited(self, method, payload, max_tokens):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                return await method(payload, max_tokens)
+            finally:
+                self.in_flight -= 1
+
+    async def aclose(self):
+        await self.backend.aclose()
@@ -1,3 +1,4 @@
+import os
 from datetime import datetime
 from uuid import uuid4
 
@@ -5,50 +6,135 @@ from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
+    MetadataContent,
     TextContent,
     chat_protocol_spec,
 )
 
+from instrumentation import export_metrics, instrumented
+from intent_router import LOCAL_RESOURCE_INTENTS, IntentRouter
+from resource_catalog import ResourceCatalog, parse_time_slot
+
+# --- CONFIGURATION ---
+# Venues and vendors; edits to the file are picked up every CATALOG_RELOAD_SECONDS
+RESOURCE_CATALOG_PATH = os.getenv(
+    "RESOURCE_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource_catalog.jsonl")
+)
+CATALOG_RELOAD_SECONDS = 30
+# "Near me" / "near <locality>" means within this distance
+NEARBY_RADIUS_KM = 10.0
+RESULTS_PER_REPLY = 3
+
+CATEGORY_LABELS = {"venue": "venues", "equipment": "equipment rentals", "catering": "caterers"}
+CATEGORY_NOTES = {
+    "venue": "Always check local regulations for events.",
+    "equipment": "Local community centers might also offer basic equipment rentals.",
+    "catering": "Small local restaurants can also cater for specific needs.",
+}
+
 # --- AGENT SETUP ---
 local_resource_agent = Agent(name="LocalResourceAgent", seed="local_resource_recovery_phrase")
+export_metrics(local_resource_agent)
 chat_protocol = Protocol(spec=chat_protocol_spec)
+resource_router = IntentRouter(LOCAL_RESOURCE_INTENTS)
+resource_catalog = ResourceCatalog(RESOURCE_CATALOG_PATH, default_radius_km=NEARBY_RADIUS_KM)
+
+@local_resource_agent.on_event("startup")
+async def load_resource_catalog(ctx: Context):
+    resource_catalog.reload()
+    ctx.logger.info("Resource catalog loaded with %s resources.", len(resource_catalog))
+
+@local_resource_agent.on_interval(period=CATALOG_RELOAD_SECONDS)
+async def reload_resource_catalog(ctx: Context):
+    """
+    Applies edits to the catalog file; a no-op unless the file changed.
+    """
+    try:
+        changes = resource_catalog.reload()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        ctx.logger.error("Could not reload the resource catalog: %s", e)
+        return
+    if changes:
+        ctx.logger.info("Resource catalog reloaded: %s added, %s updated, %s removed.", *changes)
 
 # --- MESSAGE HANDLERS ---
 
 @chat_protocol.on_message(ChatMessage)
+@instrumented("LocalResourceAgent")
 async def handle_resource_request(ctx: Context, sender: str, msg: ChatMessage):
     """
-    Handles local resource requests and provides hardcoded information.
+    Handles local resource requests by searching the catalog, by place and time slot.
     """
-    ctx.logger.info(f"LocalResourceAgent received request from {sender}: {msg.content}")
+    ctx.logger.info("LocalResourceAgent received request from %s: %s", sender, msg.content)
 
     user_query = ''
+    metadata = {}
     for item in msg.content:
         if isinstance(item, TextContent):
             user_query += item.text.lower()
+        elif isinstance(item, MetadataContent):
+            metadata.update(item.metadata)
 
-    # Hardcoded responses based on simple keyword matching
-    if "park" in user_query or "venue" in user_query:
-        response = "For parks in Bhopal, consider: 1. Van Vihar National Park (Large, serene). 2. Shahpura Lake Park (Good for picnics, boating). 3. Ekant Park (Playground, open space). Always check local regulations for events."
-    elif "equipment" in user_query or "sound system" in user_query:
-        response = "For event equipment in Bhopal, look for: 1. 'Event Solutions Bhopal' (sound, lighting). 2. 'Sharma Tent House' (tents, chairs). Local community centers might also offer basic equipment rentals."
-    elif "catering" in user_query or "food" in user_query:
-        response = "For catering services in Bhopal: 1. 'Bhopali Zaika Catering' (local cuisine). 2. 'Celebrations Caterers' (multi-cuisine options). 3. Small local restaurants for specific needs."
+    intent = resource_router.route(user_query)
+    if intent in CATEGORY_LABELS:
+        response = _search_catalog(intent, user_query, metadata)
     else:
-        response = "I can help with local resource suggestions. Please specify what kind of resource you're looking for (e.g., 'a venue', 'catering', 'equipment')."
+        response = "I can help with local resource suggestions. Please specify what kind of resource you're looking for (e.g., 'a venue', 'catering', 'equipment'), and optionally where and when (e.g., 'a park near MP Nagar free Saturday 4-8pm')."
 
     await ctx.send(
         sender,
         ChatMessage(
             timestamp=datetime.utcnow(),
             msg_id=uuid4(),
-            content=[TextContent(type="text", text=response)]
+            content=[
+                TextContent(type="text", text=response),
+                # Lets the Porter route this answer back to the user who asked
+                MetadataContent(type="metadata", metadata={"in_reply_to": str(msg.msg_id)}),
+            ]
         )
     )
-    ctx.logger.info(f"LocalResourceAgent sent response to {sender}.")
+    ctx.logger.info("LocalResourceAgent sent response to %s.", sender)
 
 @chat_protocol.on_message(ChatAcknowledgement)
+@instrumented("LocalResourceAgent")
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
-    ctx.logger.info(f"Received acknowledgement from {sender} for message ID: {msg.acknowledged_msg_id}")
+    ctx.logger.info("Received acknowledgement from %s for message ID: %s", sender, msg.acknowledged_msg_id)
+
+# --- CATALOG SEARCH ---
+
+def _search_catalog(category: str, user_query: str, metadata: dict):
+    """
+    Searches `category` near the locality named in the query (else the user's own
+    location, if the Porter sent it) and free in the time slot named in the query.
+    """
+    slot = parse_time_slot(user_query)
+    place = resource_catalog.find_locality(user_query)
+    if place is not None:
+        near, latitude, longitude = f"near {place[0]}", place[1], place[2]
+    else:
+        try:
+            near, latitude, longitude = "near you", float(metadata["latitude"]), float(metadata["longitude"])
+        except (KeyError, ValueError):
+            near, latitude, longitude = "in Bhopal", None, None
+
+    results = resource_catalog.search(category, latitude, longitude, slot=slot, limit=RESULTS_PER_REPLY)
+    if latitude is not None and not results:
+        near = "in Bhopal" # Nothing close by; widen to the whole catalog
+        results = resource_catalog.search(category, slot=slot, limit=RESULTS_PER_REPLY)
+
+    label = CATEGORY_LABELS[category]
+    when = f" free {slot.label}" if slot is not None else ""
+    if not results:
+        return f"I couldn't find any {label}{when} {near}. Try another time, or ask without one to see every option."
+    lines = [f"For {label}{when} {near}, consider:"]
+    for i, (distance, resource) in enumerate(results, 1):
+        details = [resource.locality] if resource.locality else []
+        if distance is not None:
+            details.append(f"{distance:.1f} km")
+        if resource.capacity:
+            details.append(f"up to {resource.capacity} people")
+        lines.append(f"{i}. {resource.name} ({', '.join(details)}): {resource.description}.")
+    lines.append(CATEGORY_NOTES[category])
+    return "\n".join(lines)
 
 local_resource_agent.include(chat_protocol, publish_manifest=True)
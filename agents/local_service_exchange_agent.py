@@ -1,3 +1,5 @@
+import re
+import time
 from datetime import datetime
 from uuid import uuid4
 
@@ -5,52 +7,189 @@ from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
+    MetadataContent,
     TextContent,
     chat_protocol_spec,
 )
 
+from instrumentation import export_metrics, instrumented
+from intent_router import LOCAL_SERVICE_EXCHANGE_INTENTS, IntentRouter
+from service_exchange_engine import OFFER, REQUEST, Listing, ServiceExchange, extract_terms
+from write_behind import WriteBehindStore
+
+# --- CONFIGURATION ---
+# Offers and requests are matched up to MAX_MATCH_DISTANCE_KM away; the engine sizes its
+# geo cells from that distance
+MAX_MATCH_DISTANCE_KM = 25.0
+MATCHES_PER_REPLY = 5
+# Listings are dropped after this long; re-post to stay listed
+LISTING_TTL_SECONDS = 14 * 24 * 3600
+LISTING_STORE_PATH = "service_exchange_listings"
+LISTING_FLUSH_INTERVAL_SECONDS = 2.0
+LISTING_PURGE_INTERVAL_SECONDS = 600
+
+# Categories the exchange knows; other intents ("offer", "service") only shape the listing
+SERVICE_CATEGORIES = ("photography", "gardening", "tutoring")
+REQUEST_WORDS = re.compile(r"\b(need|needs|looking for|want|wanted|hire|find)\b")
+
+# Established providers, suggested while no community member has matched yet
+CATEGORY_SUGGESTIONS = {
+    "photography": "Meanwhile, check out 'Creative Lens Photography' or 'Pixel Perfect Studio'. You might also find local talent in community art groups.",
+    "gardening": "Meanwhile, 'Green Thumb Services' offers basic gardening. For community volunteers, try posting on local social media groups.",
+    "tutoring": "Meanwhile: 1. 'Success Tutorials' (various subjects). 2. Local college students often offer private tuition. Specify subject and level for best matches.",
+}
+
 # --- AGENT SETUP ---
 local_service_exchange_agent = Agent(name="LocalServiceExchangeAgent", seed="service_exchange_recovery_phrase")
+export_metrics(local_service_exchange_agent)
 chat_protocol = Protocol(spec=chat_protocol_spec)
+service_router = IntentRouter(LOCAL_SERVICE_EXCHANGE_INTENTS)
+
+# Live offers and requests, indexed for matching; persisted write-behind so a restart keeps them
+exchange = ServiceExchange(
+    top_k=MATCHES_PER_REPLY,
+    max_distance_km=MAX_MATCH_DISTANCE_KM,
+    ttl_seconds=LISTING_TTL_SECONDS,
+)
+listing_store = WriteBehindStore(LISTING_STORE_PATH, flush_interval_seconds=LISTING_FLUSH_INTERVAL_SECONDS)
+
+@local_service_exchange_agent.on_event("startup")
+async def rebuild_exchange(ctx: Context):
+    """
+    Re-indexes the stored listings, oldest first, and drops the ones that expired while down.
+    """
+    for data in sorted((data for _, data in listing_store.items()), key=lambda data: data["created_at"]):
+        exchange.restore(Listing.from_dict(data))
+    _purge_expired_listings()
+    ctx.logger.info("Service exchange rebuilt with %s listings.", len(exchange))
+
+@local_service_exchange_agent.on_interval(period=LISTING_FLUSH_INTERVAL_SECONDS)
+async def flush_listing_store(ctx: Context):
+    if listing_store.dirty_count:
+        listing_store.flush()
+
+@local_service_exchange_agent.on_interval(period=LISTING_PURGE_INTERVAL_SECONDS)
+async def purge_expired_listings(ctx: Context):
+    expired = _purge_expired_listings()
+    if expired:
+        ctx.logger.info("Dropped %s expired listings.", expired)
+
+@local_service_exchange_agent.on_event("shutdown")
+async def close_listing_store(ctx: Context):
+    listing_store.close()
+
+def _purge_expired_listings():
+    expired = exchange.purge_expired()
+    for listing in expired:
+        listing_store.remove(listing.listing_id)
+    return len(expired)
 
 # --- MESSAGE HANDLERS ---
 
 @chat_protocol.on_message(ChatMessage)
+@instrumented("LocalServiceExchangeAgent")
 async def handle_service_request(ctx: Context, sender: str, msg: ChatMessage):
     """
-    Handles local service exchange requests and provides hardcoded information.
+    Registers service offers and requests and answers with the best nearby matches.
     """
-    ctx.logger.info(f"LocalServiceExchangeAgent received request from {sender}: {msg.content}")
+    ctx.logger.info("LocalServiceExchangeAgent received request from %s: %s", sender, msg.content)
 
     user_query = ''
+    metadata = {}
     for item in msg.content:
         if isinstance(item, TextContent):
             user_query += item.text.lower()
+        elif isinstance(item, MetadataContent):
+            metadata.update(item.metadata)
+    # The Porter says which user is asking and where they are; direct callers are their own user
+    owner = metadata.get("user", sender)
+    latitude, longitude = _coordinates(metadata)
+
+    scores = service_router.scores(user_query)
+    categories = [intent for intent in SERVICE_CATEGORIES if intent in scores]
+    category = max(categories, key=lambda intent: (scores[intent], service_router.priorities[intent])) if categories else None
+    if "offer" in scores:
+        kind = OFFER
+    elif category or REQUEST_WORDS.search(user_query):
+        kind = REQUEST
+    else:
+        kind = None
 
-    # Hardcoded responses based on simple keyword matching
-    if "photographer" in user_query or "photos" in user_query:
-        response = "Looking for a photographer in Bhopal? Check out 'Creative Lens Photography' or 'Pixel Perfect Studio'. You might also find local talent in community art groups."
-    elif "gardener" in user_query or "gardening" in user_query:
-        response = "Need gardening help? 'Green Thumb Services' offers basic gardening. For community volunteers, try posting on local social media groups."
-    elif "tutor" in user_query or "teaching" in user_query:
-        response = "For tutoring services in Bhopal: 1. 'Success Tutorials' (various subjects). 2. Local college students often offer private tuition. Specify subject and level for best matches."
-    elif "offer" in user_query and "service" in user_query:
+    listing = None
+    if kind is not None and (category or extract_terms(user_query)):
+        listing, matches = exchange.add(kind, owner, user_query, category, latitude, longitude)
+        listing_store.set(listing.listing_id, listing.to_dict())
+        listing_store.maybe_flush()
+        response = _describe_matches(listing, matches)
+    elif "offer" in scores and "service" in scores:
         response = "Great! To offer a service, please tell me what you offer and your general availability. We'll connect you with community members who need your skills."
     else:
         response = "I can help you find or offer local services. Please tell me what service you need (e.g., 'I need a gardener') or what you want to offer (e.g., 'I offer tutoring services')."
 
+    notifications = [match for match in exchange.take_notifications(owner) if match is not listing]
+    if notifications:
+        response = _describe_notifications(notifications) + "\n\n" + response
+
     await ctx.send(
         sender,
         ChatMessage(
             timestamp=datetime.utcnow(),
             msg_id=uuid4(),
-            content=[TextContent(type="text", text=response)]
+            content=[
+                TextContent(type="text", text=response),
+                # Lets the Porter route this answer back to the user who asked
+                MetadataContent(type="metadata", metadata={"in_reply_to": str(msg.msg_id)}),
+            ]
         )
     )
-    ctx.logger.info(f"LocalServiceExchangeAgent sent response to {sender}.")
+    ctx.logger.info("LocalServiceExchangeAgent sent response to %s.", sender)
 
 @chat_protocol.on_message(ChatAcknowledgement)
+@instrumented("LocalServiceExchangeAgent")
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
-    ctx.logger.info(f"Received acknowledgement from {sender} for message ID: {msg.acknowledged_msg_id}")
+    ctx.logger.info("Received acknowledgement from %s for message ID: %s", sender, msg.acknowledged_msg_id)
+
+# --- REPLIES ---
+
+def _coordinates(metadata):
+    try:
+        return float(metadata["latitude"]), float(metadata["longitude"])
+    except (KeyError, ValueError):
+        return None, None
+
+def _describe_matches(listing, matches):
+    what = listing.category or "that"
+    if listing.kind == OFFER:
+        listed = f"Thanks! Your {listing.category + ' ' if listing.category else ''}offer is listed."
+        if not matches:
+            return f"{listed} We'll connect you as soon as someone nearby needs it."
+        lines = [f"{listed} These community members are looking for it:"]
+    else:
+        if not matches:
+            response = f"No one nearby is offering {what} yet. Your request is listed and we'll let you know as soon as someone does."
+            suggestion = CATEGORY_SUGGESTIONS.get(listing.category)
+            return f"{response} {suggestion}" if suggestion else response
+        lines = [f"Community members offering {what} near you:"]
+    lines.extend(f"{i}. {_describe_listing(match, distance)}" for i, (_, distance, match) in enumerate(matches, 1))
+    return "\n".join(lines)
+
+def _describe_notifications(notifications):
+    lines = ["New matches for your listings since we last spoke:"]
+    lines.extend(f"- {_describe_listing(match)}" for match in notifications)
+    return "\n".join(lines)
+
+def _describe_listing(listing, distance_km=None):
+    details = [f"posted {_format_age(time.time() - listing.created_at)}"]
+    if distance_km is not None:
+        details.insert(0, f"{distance_km:.1f} km away")
+    return f"\"{listing.text}\" ({', '.join(details)})"
+
+def _format_age(seconds):
+    if seconds < 3600:
+        return "just now" if seconds < 120 else f"{int(seconds // 60)} minutes ago"
+    if seconds < 2 * 86400:
+        hours = int(seconds // 3600)
+        return "1 hour ago" if hours == 1 else f"{hours} hours ago"
+    return f"{int(seconds // 86400)} days ago"
 
 local_service_exchange_agent.include(chat_protocol, publish_manifest=True)
@@ -0,0 +1,124 @@
+"""
+Micro-batching front for the LLM fallback.
+
+Under load many users reach the fallback within a few milliseconds of each
+other, and each used to become its own completion call carrying the same long
+system prompt. LLMMicroBatcher collects requests for `window_seconds` (or until
+`max_batch_size` are waiting) and dispatches them together:
+
+  - identical requests (same messages and max_tokens) are coalesced into one,
+  - if the client's backend supports batched calls, the distinct requests go out
+    as a single batched request,
+  - otherwise they are fanned out in parallel through the AsyncLLMClient, whose
+    in-flight limit still applies.
+
+Every caller awaits its own future, so answers and errors are demultiplexed back
+to the right sender. A caller that gives up (cancels) does not affect the batch.
+A batched call that comes back without an answer for some request fails just
+those callers; none of them is left waiting.
+"""
+import asyncio
+import json
+
+from instrumentation import metrics
+
+metrics.describe("localhive_llm_batch_size", "Distinct requests per dispatched LLM micro-batch.")
+metrics.describe("localhive_llm_coalesced_total", "LLM requests answered by an identical request in the same batch.")
+
+
+class LLMMicroBatcher:
+    """
+    Collects concurrent completion requests into micro-batches.
+    """
+
+    def __init__(self, client, window_seconds=0.01, max_batch_size=16):
+        self.client = client
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._pending = [] # (key, messages, max_tokens, future)
+        self._timer = None
+        self._batch_size = metrics.histogram("localhive_llm_batch_size")
+        self._coalesced = metrics.counter("localhive_llm_coalesced_total")
+
+    async def complete(self, messages, max_tokens=200):
+        """
+        Returns the answer for `messages`, raising whatever its (batched) call raised.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = json.dumps([messages, max_tokens], sort_keys=True)
+        self._pending.append((key, messages, max_tokens, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        # key -> (messages, max_tokens, [futures waiting on it])
+        requests = {}
+        for key, messages, max_tokens, future in batch:
+            if key in requests:
+                requests[key][2].append(future)
+                self._coalesced.inc()
+            else:
+                requests[key] = (messages, max_tokens, [future])
+        self._batch_size.observe(len(requests))
+
+        groups = list(requests.values())
+        if self.client.supports_batch and len(groups) > 1:
+            # One batched call per max_tokens value (in practice there is one)
+            by_max_tokens = {}
+            for group in groups:
+                by_max_tokens.setdefault(group[1], []).append(group)
+            calls = [
+                self._call_batch(same_max_tokens, max_tokens)
+                for max_tokens, same_max_tokens in by_max_tokens.items()
+            ]
+        else:
+            calls = [self._call_one(group) for group in groups]
+        await asyncio.gather(*calls)
+
+    async def _call_one(self, group):
+        messages, max_tokens, futures = group
+        try:
+            answer = await self.client.complete(messages, max_tokens)
+        except Exception as e:
+            _resolve(futures, error=e)
+        else:
+            _resolve(futures, answer=answer)
+
+    async def _call_batch(self, groups, max_tokens):
+        try:
+            answers = await self.client.complete_batch([messages for messages, _, _ in groups], max_tokens)
+        except Exception as e:
+            for _, _, futures in groups:
+                _resolve(futures, error=e)
+        else:
+            answers = list(answers)
+            for index, (_, _, futures) in enumerate(groups):
+                if index < len(answers) and answers[index] is not None:
+                    _resolve(futures, answer=answers[index])
+                else:
+                    _resolve(futures, error=RuntimeError(
+                        f"LLM batch returned no answer for request {index + 1} of {len(groups)}"
+                        f" ({len(answers)} answers)"
+                    ))
+
+
+def _resolve(futures, answer=None, error=None):
+    for future in futures:
+        if future.done(): # The caller timed out or was cancelled
+            continue
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(answer)
@@ -1,17 +1,37 @@
+import asyncio
+import os
+import time
 from datetime import datetime
 from uuid import uuid4
 
-from openai import OpenAI # Used for ASI:One LLM integration
 from uagents import Context, Protocol, Agent
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
     EndSessionContent,
+    MetadataContent,
     TextContent,
     chat_protocol_spec,
 )
 from uagents.protocols.geolocation import GeolocationRequest, GeolocationResponse
 
+from admission import ConcurrencyGate, RateLimiter
+from circuit_breaker import CircuitBreaker
+from correlation import CorrelationTable
+from geocode_cache import GeocodeCache, normalize_locality
+from instrumentation import export_metrics, instrumented, metrics
+from intent_router import PORTER_INTENTS, IntentRouter
+try:
+    from intent_classifier import PORTER_INTENT_EXAMPLES, IntentClassifier
+except ImportError: # NumPy is not installed; route by keywords only
+    IntentClassifier = None
+from llm_cache import LLMResponseCache
+from llm_client import AsyncLLMClient, OpenAICompatibleBackend
+from micro_batcher import LLMMicroBatcher
+from prompt_builder import HistoryStore, PromptBuilder
+from session_store import SessionStore, UserSession
+from traffic_recorder import TrafficRecorder
+
 # Define a custom model for sending user data to the DataManagerAgent
 class UserProfileData(ChatMessage):
     user_name: str
@@ -22,6 +42,41 @@ class UserProfileData(ChatMessage):
 # --- CONFIGURATION ---
 # IMPORTANT: Replace with your actual ASI:One API Key
 ASI_ONE_API_KEY = 'INSERT_YOUR_ASI_ONE_API_KEY_HERE' 
+# Point this at a local OpenAI-compatible stub (e.g. http://127.0.0.1:8080/v1) for testing
+ASI_ONE_BASE_URL = os.getenv("ASI_ONE_BASE_URL", 'https://api.asi1.ai/v1')
+
+# LLM fallback limits: concurrent requests to ASI:One, pooled connections and per-request deadline
+LLM_MAX_IN_FLIGHT = 8
+LLM_MAX_CONNECTIONS = 16
+LLM_TIMEOUT_SECONDS = 20
+
+# Fallback requests arriving within LLM_BATCH_WINDOW_SECONDS of each other are sent together
+# (identical ones once). Set LLM_BATCH_COMPLETIONS only if the endpoint accepts a list of
+# prompts on /completions; otherwise a batch goes out as parallel chat completions.
+LLM_BATCH_WINDOW_SECONDS = 0.01
+LLM_MAX_BATCH_SIZE = 16
+LLM_BATCH_COMPLETIONS = False
+
+# Queries no keyword matches go to the embedding intent classifier (needs NumPy) before the
+# LLM fallback. Its intent centroids are cached on disk and rebuilt when the examples change.
+# A query is only routed when its best intent beats the "general" (small talk) intent by the margin.
+INTENT_CLASSIFIER_THRESHOLD = 0.2
+INTENT_CLASSIFIER_MARGIN = 0.1
+INTENT_CLASSIFIER_CACHE_PATH = "porter_intent_centroids.npz"
+
+# The fallback prompt sends each user's last PROMPT_HISTORY_TURNS turns (at most
+# PROMPT_HISTORY_TOKEN_BUDGET tokens of them), and the time only to the hour, so the
+# prompt prefix stays the same from call to call and can be cached by the provider.
+PROMPT_HISTORY_TURNS = 8
+PROMPT_HISTORY_TOKEN_BUDGET = 600
+PROMPT_TIME_GRANULARITY_MINUTES = 60
+
+# Cache for repeated fallback questions. Set LLM_CACHE_PATH to None to keep it in memory only.
+LLM_CACHE_MAX_ENTRIES = 2048
+LLM_CACHE_TTL_SECONDS = 3600
+LLM_CACHE_PATH = os.getenv("PORTER_LLM_CACHE", "porter_llm_cache.sqlite3")
+# Rows kept in the on-disk tier; expired rows are purged and the rest trimmed to this every few minutes
+LLM_CACHE_MAX_DISK_ENTRIES = 20000
 
 # IMPORTANT: Replace these with the actual deployed addresses from YOUR Agentverse account
 # You will get these addresses after deploying each agent below.
@@ -32,19 +87,231 @@ LOCAL_RESOURCE_AGENT_ADDRESS = "agent1q..." # YOUR LocalResourceLogisticsAgent a
 SPONSORSHIP_FINANCE_AGENT_ADDRESS = "agent1q..." # YOUR SponsorshipFinanceAgent address
 LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS = "agent1q..." # YOUR LocalServiceExchangeAgent address
 
+# Pending geolocation lookups are matched back to users by request id. Lookups that
+# get no answer within the timeout are dropped and the user is asked to try again.
+GEOLOCATION_TIMEOUT_SECONDS = 120
+MAX_PENDING_GEOLOCATIONS = 10000
+
+# Geocoded localities are cached on disk so repeat localities skip the geolocation round trip
+GEOCODE_CACHE_PATH = os.getenv("PORTER_GEOCODE_CACHE", "porter_geocode_cache.sqlite3")
+GEOCODE_CACHE_TTL_SECONDS = 30 * 24 * 3600
+GEOCODE_CACHE_MAX_ENTRIES = 10000
+
+# Delegated queries are remembered until the specialist answers or the timeout passes.
+# Specialists tag their answers with the delegated msg_id as "in_reply_to" metadata.
+DELEGATION_TIMEOUT_SECONDS = 60
+MAX_PENDING_DELEGATIONS = 10000
+
+# Scatter-gather: a query matching several specialists (each with at least
+# FANOUT_MIN_SCORE keyword weight) goes to all of them at once. Their answers are
+# merged into one reply, sent when the last one arrives or at the deadline with
+# whatever came in; answers arriving after the deadline are forwarded on their own.
+FANOUT_ENABLED = True
+FANOUT_MIN_SCORE = 1.0
+FANOUT_DEADLINE_SECONDS = 10
+
+# Circuit breakers: once BREAKER_FAILURE_RATE of the last BREAKER_WINDOW calls to a
+# specialist or the LLM failed (error, no answer, or slower than *_SLOW_SECONDS), it is
+# skipped for BREAKER_OPEN_SECONDS and users get a local answer; then one probe call
+# decides whether it is back.
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_OPEN_SECONDS = 30
+SPECIALIST_SLOW_SECONDS = 15
+LLM_SLOW_SECONDS = 15
+DELEGATION_SWEEP_SECONDS = 5.0 # How often unanswered delegations are checked for expiry
+LLM_UNAVAILABLE_MESSAGE = (
+    "My AI brain is unavailable at the moment. Meanwhile I can still help you plan events, "
+    "find venues, sponsors and local services - just ask!"
+)
+
+# Admission control: each user may send USER_BURST messages at once, refilled at
+# USER_RATE_PER_SECOND. Expensive paths are capped globally; past the cap users get
+# BUSY_MESSAGE right away instead of waiting in an unbounded queue.
+USER_RATE_PER_SECOND = 1.0
+USER_BURST = 5
+RATE_LIMIT_MAX_SENDERS = 100000
+LLM_MAX_ADMITTED = 32 # LLM fallback calls running or waiting for one of the LLM_MAX_IN_FLIGHT slots
+GEOLOCATION_MAX_IN_FLIGHT = 256
+BUSY_MESSAGE = "I'm handling a lot of requests right now. Please try again in a few seconds."
+
+# User sessions: the most recently active SESSION_HOT_MAX stay in memory, the rest on disk.
+# Sessions idle for SESSION_IDLE_SECONDS leave memory; on disk they are kept for
+# SESSION_RETENTION_SECONDS, or SESSION_ABANDONED_RETENTION_SECONDS if onboarding never finished.
+SESSION_STORE_PATH = os.getenv("PORTER_SESSION_STORE", "porter_sessions.sqlite3")
+SESSION_HOT_MAX = 50000
+SESSION_IDLE_SECONDS = 30 * 60
+SESSION_RETENTION_SECONDS = 90 * 24 * 3600
+SESSION_ABANDONED_RETENTION_SECONDS = 24 * 3600
+SESSION_FLUSH_INTERVAL_SECONDS = 5.0
+
+# Set PORTER_TRAFFIC_LOG to record inbound traffic (gzip JSON Lines) for replaying it with
+# benchmarks/replay_traffic.py. Senders are pseudonymized with PORTER_TRAFFIC_LOG_KEY, or
+# a random per-process key if unset. Off by default.
+TRAFFIC_LOG_PATH = os.getenv("PORTER_TRAFFIC_LOG")
+TRAFFIC_LOG_KEY = os.getenv("PORTER_TRAFFIC_LOG_KEY")
+TRAFFIC_LOG_FLUSH_INTERVAL_SECONDS = 1.0
+
 # --- AGENT SETUP ---
-porter_agent = Agent(name="PorterAgent", seed="porter_recovery_phrase")
+PORTER_SEED = "porter_recovery_phrase" # Also used by the sharded Porter's front dispatcher
+porter_agent = Agent(name="PorterAgent", seed=PORTER_SEED)
 chat_protocol = Protocol(spec=chat_protocol_spec)
 
-# Initialize ASI:One LLM client
-llm_client = OpenAI(
-    base_url='https://api.asi1.ai/v1',
-    api_key=ASI_ONE_API_KEY,
+# Initialize ASI:One LLM client (async, so a slow completion never blocks other users)
+llm_client = AsyncLLMClient(
+    OpenAICompatibleBackend(
+        base_url=ASI_ONE_BASE_URL,
+        api_key=ASI_ONE_API_KEY,
+        model="asi1-mini",
+        max_connections=LLM_MAX_CONNECTIONS,
+        batch_completions=LLM_BATCH_COMPLETIONS,
+    ),
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    timeout=LLM_TIMEOUT_SECONDS,
 )
+llm_batcher = LLMMicroBatcher(llm_client, window_seconds=LLM_BATCH_WINDOW_SECONDS, max_batch_size=LLM_MAX_BATCH_SIZE)
+
+# Keyword intent router compiled once at startup
+porter_router = IntentRouter(PORTER_INTENTS)
+intent_classifier = IntentClassifier(
+    PORTER_INTENT_EXAMPLES,
+    threshold=INTENT_CLASSIFIER_THRESHOLD,
+    margin=INTENT_CLASSIFIER_MARGIN,
+    cache_path=INTENT_CLASSIFIER_CACHE_PATH,
+) if IntentClassifier is not None else None
+
+# Cached fallback answers, keyed by system prompt template + normalized query
+llm_response_cache = LLMResponseCache(
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    path=LLM_CACHE_PATH,
+    name="porter_llm_cache",
+    max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES,
+)
+
+# Static system prompt for the general LLM fallback. Volatile facts (time, the user's
+# locality) are appended after the conversation history by fallback_prompt.
+FALLBACK_SYSTEM_PROMPT = """
+                        You are a helpful assistant for LocalHive, designed for local event planning and service exchange in communities.
+                        Your current location is Bhopal, Madhya Pradesh, India.
+                        If the user asks about something outside these domains, provide a polite and general helpful response,
+                        or suggest how they can use LocalHive.
+                        """
+fallback_prompt = PromptBuilder(
+    FALLBACK_SYSTEM_PROMPT,
+    time_granularity_minutes=PROMPT_TIME_GRANULARITY_MINUTES,
+    time_zone_label="IST",
+)
+# User address -> recent fallback turns
+conversation_histories = HistoryStore(
+    max_users=SESSION_HOT_MAX,
+    max_turns=PROMPT_HISTORY_TURNS,
+    token_budget=PROMPT_HISTORY_TOKEN_BUDGET,
+)
+
+# Geolocation request id (the session the request was sent on) ->
+# {"locality": normalized locality, "users": [user addresses waiting on it]}
+pending_geolocations = CorrelationTable(
+    ttl_seconds=GEOLOCATION_TIMEOUT_SECONDS,
+    max_size=MAX_PENDING_GEOLOCATIONS,
+)
+# Normalized locality -> request id of the lookup already in flight for it (single-flight)
+geocodes_in_flight = CorrelationTable(
+    ttl_seconds=GEOLOCATION_TIMEOUT_SECONDS,
+    max_size=MAX_PENDING_GEOLOCATIONS,
+)
+geocode_cache = GeocodeCache(
+    max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=GEOCODE_CACHE_TTL_SECONDS,
+    path=GEOCODE_CACHE_PATH,
+    name="porter_geocode_cache",
+)
+
+def _breaker(name, slow_call_seconds):
+    return CircuitBreaker(
+        name,
+        window=BREAKER_WINDOW,
+        min_calls=BREAKER_MIN_CALLS,
+        failure_rate=BREAKER_FAILURE_RATE,
+        slow_call_seconds=slow_call_seconds,
+        open_seconds=BREAKER_OPEN_SECONDS,
+    )
+
+# Specialist name -> breaker; a delegation succeeds when the answer arrives and fails when it expires
+specialist_breakers = {
+    name: _breaker(name, SPECIALIST_SLOW_SECONDS)
+    for name in ("EventIdeationPlannerAgent", "LocalServiceExchangeAgent", "SponsorshipFinanceAgent", "LocalResourceLogisticsAgent")
+}
+llm_breaker = _breaker("asi_one", LLM_SLOW_SECONDS)
+
+def _delegation_dropped(msg_id, delegation):
+    specialist_breakers[delegation["agent"]].record(False, DELEGATION_TIMEOUT_SECONDS)
+
+# Delegated msg_id -> {"user": original user address, "agent": specialist name,
+# "gather": fan-out gather id or None, "sent_at": monotonic time}
+pending_delegations = CorrelationTable(
+    ttl_seconds=DELEGATION_TIMEOUT_SECONDS,
+    max_size=MAX_PENDING_DELEGATIONS,
+    on_drop=_delegation_dropped,
+)
+delegation_stats = {"delegated": 0, "forwarded": 0, "late": 0, "orphaned": 0, "fanned_out": 0, "gathered": 0, "partial": 0}
+
+# Gather id -> {"user", "agents": [specialists asked, in order], "replies": {agent: text},
+# "started": perf_counter, "deadline": task}. The TTL only cleans up if a deadline task dies.
+pending_gathers = CorrelationTable(
+    ttl_seconds=FANOUT_DEADLINE_SECONDS * 2,
+    max_size=MAX_PENDING_DELEGATIONS,
+)
+
+user_rate_limiter = RateLimiter("user_messages", USER_RATE_PER_SECOND, USER_BURST, max_senders=RATE_LIMIT_MAX_SENDERS)
+llm_gate = ConcurrencyGate("llm_fallback", LLM_MAX_ADMITTED)
+def _geolocations_in_flight():
+    # A lookup is in flight while it sits in pending_geolocations; purge first so
+    # lookups that timed out stop counting even when no new ones are added. Only
+    # called on the event loop: by try_acquire and by the gate's metrics collector.
+    pending_geolocations.purge()
+    return len(pending_geolocations)
+
+geolocation_gate = ConcurrencyGate("geolocation", GEOLOCATION_MAX_IN_FLIGHT, count=_geolocations_in_flight)
+
+session_store = SessionStore(
+    path=SESSION_STORE_PATH,
+    max_hot=SESSION_HOT_MAX,
+    idle_seconds=SESSION_IDLE_SECONDS,
+    retention_seconds=SESSION_RETENTION_SECONDS,
+    abandoned_retention_seconds=SESSION_ABANDONED_RETENTION_SECONDS,
+)
+
+traffic_recorder = TrafficRecorder(
+    TRAFFIC_LOG_PATH,
+    key=TRAFFIC_LOG_KEY,
+    flush_interval_seconds=TRAFFIC_LOG_FLUSH_INTERVAL_SECONDS,
+) if TRAFFIC_LOG_PATH else None
+
+# --- METRICS ---
+
+def _collect_porter_metrics():
+    for outcome, count in delegation_stats.items():
+        metrics.gauge("localhive_porter_delegations", outcome=outcome).set(count)
+    metrics.gauge("localhive_porter_pending", table="geolocations").set(len(pending_geolocations))
+    metrics.gauge("localhive_porter_pending", table="delegations").set(len(pending_delegations))
+    metrics.gauge("localhive_porter_pending", table="gathers").set(len(pending_gathers))
+    metrics.gauge("localhive_llm_in_flight", agent="PorterAgent").set(llm_client.in_flight)
+    for cache_name, cache in (("porter_llm_cache", llm_response_cache), ("porter_geocode_cache", geocode_cache)):
+        for stat, value in cache.stats().items():
+            metrics.gauge("localhive_cache", store=cache_name, stat=stat).set(value)
+    for stat, value in session_store.stats().items():
+        metrics.gauge("localhive_porter_sessions", stat=stat).set(value)
+
+metrics.describe("localhive_porter_gather_seconds", "Time from fan-out to the combined answer, by whether every specialist answered.")
+metrics.add_collector(_collect_porter_metrics)
+export_metrics(porter_agent)
 
 # --- MESSAGE HANDLERS ---
 
 @chat_protocol.on_message(ChatMessage)
+@instrumented("PorterAgent")
 async def handle_user_message(ctx: Context, sender: str, msg: ChatMessage):
     """
     Handles incoming chat messages from the user, performs intent recognition,
@@ -52,26 +319,38 @@ async def handle_user_message(ctx: Context, sender: str, msg: ChatMessage):
     """
     await ctx.send(sender, ChatAcknowledgement(timestamp=datetime.now(), acknowledged_msg_id=msg.msg_id))
 
-    user_state = ctx.storage.get(sender)
+    # Specialist answers arrive on the same protocol as user messages; tell them apart first
+    in_reply_to = _get_in_reply_to(msg)
+    if traffic_recorder is not None:
+        _record_chat_message(sender, msg, in_reply_to)
+    if in_reply_to is not None or sender in _specialist_addresses():
+        await handle_response_from_other_agent(ctx, sender, msg, in_reply_to)
+        return
+
+    if not user_rate_limiter.allow(sender):
+        ctx.logger.warning("Rate limit hit for %s; asking them to retry.", sender)
+        await ctx.send(sender, ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=BUSY_MESSAGE)]))
+        return
+
+    user_state = _load_user_state(ctx, sender)
     if user_state is None:
-        user_state = {"onboarding_step": 0, "name": None, "locality": None}
-        ctx.storage.set(sender, user_state)
-        ctx.logger.info(f"New user detected: {sender}. Starting onboarding.")
+        user_state = session_store.create(sender)
+        ctx.logger.info("New user detected: %s. Starting onboarding.", sender)
 
     user_query = ''
     for item in msg.content:
         if isinstance(item, TextContent):
             user_query += item.text.lower()
 
-    ctx.logger.info(f"PorterAgent received query: '{user_query}' from {sender}")
+    ctx.logger.info("PorterAgent received query: '%s' from %s", user_query, sender)
     response_text = "I'm sorry, I couldn't understand your request. Can you please rephrase?"
 
     # --- Onboarding Flow ---
-    if user_state["onboarding_step"] == 0:
+    if user_state.onboarding_step == 0:
         response_text = "Welcome to LocalHive! I'm your assistant for community events and services. To get started, please tell me your name and your locality (e.g., 'My name is Alice and I live in Bhopal, India')."
-        user_state["onboarding_step"] = 1
-        ctx.storage.set(sender, user_state)
-    elif user_state["onboarding_step"] == 1:
+        user_state.onboarding_step = 1
+        _save_user_state(ctx, sender, user_state)
+    elif user_state.onboarding_step == 1:
         # Simple parsing for name and locality
         name_match = None
         locality_match = None
@@ -91,176 +370,442 @@ async def handle_user_message(ctx: Context, sender: str, msg: ChatMessage):
                     return
 
         if name_match and locality_match:
-            user_state["name"] = name_match
-            user_state["locality"] = locality_match
-            ctx.storage.set(sender, user_state)
-            ctx.logger.info(f"User {sender} provided name: {name_match}, locality: {locality_match}. Requesting geolocation.")
-
-            if GEOLOCATION_AGENT_ADDRESS != "agent1q...": # Check if address is set
-                await ctx.send(GEOLOCATION_AGENT_ADDRESS, GeolocationRequest(
-                    location_name=locality_match,
-                    current_location=False
-                ))
+            user_state.name = name_match
+            user_state.locality = locality_match
+            _save_user_state(ctx, sender, user_state)
+            ctx.logger.info("User %s provided name: %s, locality: %s. Requesting geolocation.", sender, name_match, locality_match)
+
+            coordinates = geocode_cache.get_coordinates(locality_match)
+            if coordinates is not None:
+                ctx.logger.info("Geocode cache hit for '%s'; completing onboarding for %s.", locality_match, sender)
+                response_text = await _complete_onboarding(ctx, sender, user_state, *coordinates)
+            elif GEOLOCATION_AGENT_ADDRESS != "agent1q...": # Check if address is set
+                locality_key = normalize_locality(locality_match)
+                request_id = geocodes_in_flight.get(locality_key)
+                if request_id is not None and request_id in pending_geolocations:
+                    # Another user is already waiting on this locality; share their lookup
+                    pending_geolocations.get(request_id)["users"].append(sender)
+                elif not geolocation_gate.try_acquire():
+                    # Too many lookups outstanding; stay at step 1 so the user can simply resend
+                    await ctx.send(sender, ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=BUSY_MESSAGE)]))
+                    return
+                else:
+                    # The geolocation agent replies on the same session, which makes it our request id
+                    request_id = str(ctx.session)
+                    pending_geolocations.add(request_id, {"locality": locality_key, "users": [sender]})
+                    geocodes_in_flight.add(locality_key, request_id)
+                    await ctx.send(GEOLOCATION_AGENT_ADDRESS, GeolocationRequest(
+                        location_name=locality_match,
+                        current_location=False
+                    ))
                 response_text = f"Thanks, {name_match}! I'm now getting the coordinates for {locality_match}. Please wait a moment."
-                user_state["onboarding_step"] = 2 # Waiting for geolocation response
-                ctx.storage.set(sender, user_state)
+                user_state.onboarding_step = 2 # Waiting for geolocation response
+                user_state.geolocation_request_id = request_id
+                _save_user_state(ctx, sender, user_state)
             else:
                 response_text = "I received your name and locality, but the geolocation service is not configured. Please contact support."
-                user_state["onboarding_step"] = 3 # Skip geolocation if agent not configured
-                ctx.storage.set(sender, user_state)
+                user_state.onboarding_step = 3 # Skip geolocation if agent not configured
+                _save_user_state(ctx, sender, user_state)
         else:
             response_text = "I couldn't understand your name and locality. Please try again in the format: 'My name is [Your Name] and I live in [Your Locality]'."
-    elif user_state["onboarding_step"] == 2:
-        response_text = "Still getting your location details. Please wait a moment."
-    elif user_state["onboarding_step"] == 3:
+    elif user_state.onboarding_step == 2:
+        if user_state.geolocation_request_id in pending_geolocations:
+            response_text = "Still getting your location details. Please wait a moment."
+        else:
+            # The lookup timed out (or was evicted), so ask for the locality again
+            response_text = "Sorry, I couldn't get the coordinates for your locality. Please tell me again: 'My name is [Your Name] and I live in [Your Locality]'."
+            user_state.onboarding_step = 1
+            user_state.geolocation_request_id = None
+            _save_user_state(ctx, sender, user_state)
+    elif user_state.onboarding_step == 3:
         # --- Onboarding complete, proceed with main functionality ---
-        ctx.logger.info(f"User {user_state['name']} ({user_state['locality']}) is onboarded. Processing general query.")
+        ctx.logger.info("User %s (%s) is onboarded. Processing general query.", user_state.name, user_state.locality)
 
         # --- Basic Intent Recognition and Delegation ---
-        if "event" in user_query or "organize" in user_query or "plan" in user_query:
-            if EVENT_PLANNER_AGENT_ADDRESS != "agent1q...":
-                ctx.logger.info(f"Delegating '{user_query}' to EventIdeationPlannerAgent...")
-                await ctx.send(EVENT_PLANNER_AGENT_ADDRESS, ChatMessage(
-                    timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=user_query)]
-                ))
+        scores = porter_router.scores(user_query)
+        fanout_targets = _fanout_targets(scores) if FANOUT_ENABLED else []
+        intent = porter_router.best(scores)
+        if intent is None and intent_classifier is not None:
+            intent, confidence = intent_classifier.classify(user_query)
+            if intent is not None:
+                ctx.logger.info("No keyword matched; classifier routed '%s' to %s (%.2f).", user_query, intent, confidence)
+        if len(fanout_targets) > 1:
+            await _fan_out(ctx, sender, fanout_targets, user_query)
+            response_text = "That touches on a few things, so I'm asking " + ", ".join(
+                agent_name for _, agent_name in fanout_targets
+            ) + " at the same time. I'll send you one combined answer."
+        elif intent == "event":
+            if EVENT_PLANNER_AGENT_ADDRESS != "agent1q..." and specialist_breakers["EventIdeationPlannerAgent"].allow():
+                await _delegate(ctx, sender, EVENT_PLANNER_AGENT_ADDRESS, "EventIdeationPlannerAgent", user_query)
                 response_text = "Okay, I'll connect you with the event planning expert. What kind of event are you thinking of?"
             else:
                 response_text = "My event planning expert isn't online yet."
-        elif "service" in user_query or "help" in user_query or "find" in user_query:
-            if LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS != "agent1q...":
-                ctx.logger.info(f"Delegating '{user_query}' to LocalServiceExchangeAgent...")
-                await ctx.send(LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS, ChatMessage(
-                    timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=user_query)]
-                ))
+        elif intent == "service":
+            if LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS != "agent1q..." and specialist_breakers["LocalServiceExchangeAgent"].allow():
+                await _delegate(ctx, sender, LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS, "LocalServiceExchangeAgent", user_query)
                 response_text = "Understood. I'll check with the local service exchange. What type of service are you looking for, or offering?"
             else:
                 response_text = "The local service exchange isn't fully set up yet."
-        elif "budget" in user_query or "sponsor" in user_query or "finance" in user_query:
-            if SPONSORSHIP_FINANCE_AGENT_ADDRESS != "agent1q...":
-                ctx.logger.info(f"Delegating '{user_query}' to SponsorshipFinanceAgent...")
-                await ctx.send(SPONSORSHIP_FINANCE_AGENT_ADDRESS, ChatMessage(
-                    timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=user_query)]
-                ))
+        elif intent == "finance":
+            if SPONSORSHIP_FINANCE_AGENT_ADDRESS != "agent1q..." and specialist_breakers["SponsorshipFinanceAgent"].allow():
+                await _delegate(ctx, sender, SPONSORSHIP_FINANCE_AGENT_ADDRESS, "SponsorshipFinanceAgent", user_query)
                 response_text = "Alright, let me connect you with the finance and sponsorship expert."
             else:
                 response_text = "My finance expert isn't available right now."
-        elif "location" in user_query or "venue" in user_query or "map" in user_query:
-            if LOCAL_RESOURCE_AGENT_ADDRESS != "agent1q...": # Using LocalResourceAgent for locations/venues
-                 ctx.logger.info(f"Delegating '{user_query}' to LocalResourceLogisticsAgent...")
-                 await ctx.send(LOCAL_RESOURCE_AGENT_ADDRESS, ChatMessage(
-                    timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=user_query)]
-                 ))
+        elif intent == "venue":
+            if LOCAL_RESOURCE_AGENT_ADDRESS != "agent1q..." and specialist_breakers["LocalResourceLogisticsAgent"].allow(): # Using LocalResourceAgent for locations/venues
+                 await _delegate(ctx, sender, LOCAL_RESOURCE_AGENT_ADDRESS, "LocalResourceLogisticsAgent", user_query)
                  response_text = f"Searching for locations or venues for you. What specific place or type of venue are you looking for?"
             else:
                  response_text = "I can help with locations, but the resource agent isn't configured yet."
         else:
             # Fallback: If no specific intent, directly use ASI:One LLM for a general response
-            ctx.logger.info(f"Using internal ASI:One LLM for general query: '{user_query}'")
-            try:
-                r = llm_client.chat.completions.create(
-                    model="asi1-mini",
-                    messages=[
-                        {"role": "system", "content": f"""
-                        You are a helpful assistant for LocalHive, designed for local event planning and service exchange in communities.
-                        Your current location is Bhopal, Madhya Pradesh, India. The current time is {datetime.now().strftime('%A, %B %d, %Y at %I:%M:%S %p %Z')}.
-                        If the user asks about something outside these domains, provide a polite and general helpful response,
-                        or suggest how they can use LocalHive.
-                        """},
-                        {"role": "user", "content": user_query},
-                    ],
-                    max_tokens=200,
-                )
-                response_text = str(r.choices[0].message.content)
-            except Exception as e:
-                ctx.logger.error(f"Error querying internal ASI:One LLM: {e}")
-                response_text = "I'm having trouble processing your general request with my AI brain at the moment."
+            history = conversation_histories.get(sender)
+            cache_key = fallback_prompt.cache_key(history, user_locality=user_state.locality)
+            cached_response = llm_response_cache.get_response(cache_key, user_query) if cache_key is not None else None
+            if cached_response is not None:
+                ctx.logger.info("Serving cached LLM answer for general query: '%s'", user_query)
+                response_text = cached_response
+                history.add_exchange(user_query, response_text)
+            elif not llm_gate.try_acquire():
+                ctx.logger.warning("LLM fallback saturated (%s admitted); asking %s to retry.", llm_gate.in_flight, sender)
+                response_text = BUSY_MESSAGE
+            else:
+                ctx.logger.info("Using internal ASI:One LLM for general query: '%s'", user_query)
+                try:
+                    response_text = await _ask_fallback_llm(ctx, user_query, history, user_state.locality)
+                finally:
+                    llm_gate.release()
 
     await ctx.send(sender, ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=response_text)]))
 
+async def _ask_fallback_llm(ctx: Context, user_query: str, history=None, locality: str = None) -> str:
+    """
+    Asks ASI:One for a general answer, with the user's recent turns as context, and
+    caches it. Errors are not cached or added to the history.
+    Answers locally straight away while the LLM's circuit breaker is open.
+    """
+    if not llm_breaker.allow():
+        ctx.logger.warning("ASI:One circuit breaker is %s; answering locally.", llm_breaker.state)
+        return LLM_UNAVAILABLE_MESSAGE
+    # Key on exactly what is sent; follow-ups (non-empty history) get no key and skip the cache
+    now = datetime.now()
+    cache_key = fallback_prompt.cache_key(history, now, user_locality=locality)
+    started = time.perf_counter()
+    try:
+        # The client's timeout covers each backend call; this one also covers the batch window
+        # and anything else between this caller and its answer
+        response_text = await asyncio.wait_for(
+            llm_batcher.complete(
+                messages=fallback_prompt.build(user_query, history, now, user_locality=locality),
+                max_tokens=200,
+            ),
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+    except asyncio.TimeoutError:
+        llm_breaker.record(False)
+        ctx.logger.error("ASI:One LLM did not answer within %ss", LLM_TIMEOUT_SECONDS)
+        return "My AI brain is taking too long to answer right now. Please try again shortly."
+    except Exception as e:
+        llm_breaker.record(False)
+        ctx.logger.error("Error querying internal ASI:One LLM: %s", e)
+        return "I'm having trouble processing your general request with my AI brain at the moment."
+    llm_breaker.record(True, time.perf_counter() - started)
+
+    if cache_key is not None:
+        llm_response_cache.set_response(cache_key, user_query, response_text)
+    if history is not None:
+        history.add_exchange(user_query, response_text)
+    return response_text
+
 @porter_agent.on_message(model=GeolocationResponse)
+@instrumented("PorterAgent")
 async def handle_geolocation_response(ctx: Context, sender: str, msg: GeolocationResponse):
     """
     Handles the response from the Google API Geolocation Agent.
-    Stores the geocoded locality in the DataManagerAgent.
-    """
-    ctx.logger.info(f"Received GeolocationResponse from {sender}: Lat={msg.latitude}, Lon={msg.longitude}")
-
-    user_address_for_geolocation = None
-    for user_addr, user_state in ctx.storage.items():
-        if user_state.get("onboarding_step") == 2:
-            user_address_for_geolocation = user_addr
-            break
-
-    if user_address_for_geolocation:
-        user_state = ctx.storage.get(user_address_for_geolocation)
-        user_name = user_state.get("name", "there")
-        locality = user_state.get("locality", "your location")
-
-        if DATA_MANAGER_AGENT_ADDRESS != "agent1q...":
-            try:
-                await ctx.send(DATA_MANAGER_AGENT_ADDRESS, UserProfileData(
-                    timestamp=datetime.utcnow(),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text="User profile data for storage")],
-                    user_name=user_name,
-                    locality=locality,
-                    latitude=msg.latitude,
-                    longitude=msg.longitude
-                ))
-                response_text = f"Great, {user_name}! I've saved your location ({locality}). You are now fully onboarded and ready to use LocalHive! How can I help you today?"
-                user_state["onboarding_step"] = 3
-                ctx.storage.set(user_address_for_geolocation, user_state)
-            except Exception as e:
-                ctx.logger.error(f"Error sending user data to DataManagerAgent: {e}")
-                response_text = f"Welcome, {user_name}! I got your location, but had trouble saving your profile. You are now onboarded. How can I help you today?"
-                user_state["onboarding_step"] = 3
-                ctx.storage.set(user_address_for_geolocation, user_state)
-        else:
-            response_text = f"Welcome, {user_name}! I got your location, but the Data Manager Agent is not configured. You are now onboarded. How can I help you today?"
-            user_state["onboarding_step"] = 3
-            ctx.storage.set(user_address_for_geolocation, user_state)
+    Caches the coordinates and completes onboarding for every user waiting on that locality.
+    """
+    ctx.logger.info("Received GeolocationResponse from %s: Lat=%s, Lon=%s", sender, msg.latitude, msg.longitude)
+
+    request_id = str(ctx.session)
+    pending = pending_geolocations.pop(request_id)
+    if traffic_recorder is not None:
+        traffic_recorder.record_geolocation(pending["locality"] if pending else None, msg.latitude, msg.longitude)
+
+    if pending:
+        geocode_cache.set_coordinates(pending["locality"], msg.latitude, msg.longitude)
+        if geocodes_in_flight.get(pending["locality"]) == request_id:
+            geocodes_in_flight.pop(pending["locality"])
 
-        await ctx.send(user_address_for_geolocation, ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=response_text)]))
+        for user_address in pending["users"]:
+            user_state = _load_user_state(ctx, user_address)
+            if user_state is None or user_state.onboarding_step != 2:
+                continue
+            response_text = await _complete_onboarding(ctx, user_address, user_state, msg.latitude, msg.longitude)
+            await ctx.send(user_address, ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=response_text)]))
     else:
-        ctx.logger.warning("Received GeolocationResponse but could not find matching user in onboarding state.")
+        ctx.logger.warning("Received GeolocationResponse for unknown or expired request %s; dropping it.", ctx.session)
 
-@chat_protocol.on_message(ChatMessage)
-async def handle_response_from_other_agent(ctx: Context, sender: str, msg: ChatMessage):
+async def _complete_onboarding(ctx: Context, user_address: str, user_state: UserSession, latitude: float, longitude: float) -> str:
+    """
+    Stores the user's geocoded profile in the DataManagerAgent and marks onboarding complete.
+    Returns the message to send to the user.
     """
-    Handles responses from other agents and forwards them back to the user.
-    (This simple forward assumes a direct one-to-one reply and doesn't handle complex threading).
+    user_state.geolocation_request_id = None
+    user_state.latitude = latitude
+    user_state.longitude = longitude
+    user_name = user_state.name or "there"
+    locality = user_state.locality or "your location"
+
+    if DATA_MANAGER_AGENT_ADDRESS != "agent1q...":
+        try:
+            await ctx.send(DATA_MANAGER_AGENT_ADDRESS, UserProfileData(
+                timestamp=datetime.utcnow(),
+                msg_id=uuid4(),
+                content=[TextContent(type="text", text="User profile data for storage")],
+                user_name=user_name,
+                locality=locality,
+                latitude=latitude,
+                longitude=longitude
+            ))
+            response_text = f"Great, {user_name}! I've saved your location ({locality}). You are now fully onboarded and ready to use LocalHive! How can I help you today?"
+        except Exception as e:
+            ctx.logger.error("Error sending user data to DataManagerAgent: %s", e)
+            response_text = f"Welcome, {user_name}! I got your location, but had trouble saving your profile. You are now onboarded. How can I help you today?"
+    else:
+        response_text = f"Welcome, {user_name}! I got your location, but the Data Manager Agent is not configured. You are now onboarded. How can I help you today?"
+
+    user_state.onboarding_step = 3
+    _save_user_state(ctx, user_address, user_state)
+    return response_text
+
+def _load_user_state(ctx: Context, user_address: str):
+    """
+    Returns the user's session, or None for a new user. Users still stored as a
+    dict in ctx.storage (from before session records) are migrated on first sight.
+    """
+    user_state = session_store.get(user_address)
+    if user_state is None:
+        legacy_state = ctx.storage.get(user_address)
+        if legacy_state is not None:
+            user_state = session_store.create(user_address, UserSession.from_legacy(legacy_state))
+            ctx.storage.remove(user_address)
+    return user_state
+
+def _save_user_state(ctx: Context, user_address: str, user_state: UserSession):
+    session_store.save(user_address, user_state)
+
+@porter_agent.on_interval(period=SESSION_FLUSH_INTERVAL_SECONDS)
+async def maintain_sessions(ctx: Context):
+    """
+    Writes changed sessions to disk and moves idle ones out of memory; commits and
+    trims the disk tiers of the LLM response and geocode caches.
+    """
+    session_store.maintain()
+    llm_response_cache.maintain()
+    geocode_cache.maintain()
+
+@porter_agent.on_interval(period=DELEGATION_SWEEP_SECONDS)
+async def sweep_delegations(ctx: Context):
+    """
+    Expires unanswered delegations, so a specialist that stopped answering trips its breaker.
+    """
+    pending_delegations.purge()
+
+@porter_agent.on_interval(period=TRAFFIC_LOG_FLUSH_INTERVAL_SECONDS)
+async def flush_traffic_log(ctx: Context):
+    if traffic_recorder is not None:
+        traffic_recorder.maybe_flush()
+
+@porter_agent.on_event("shutdown")
+async def close_session_store(ctx: Context):
+    session_store.close()
+    llm_response_cache.close()
+    geocode_cache.close()
+    if traffic_recorder is not None:
+        traffic_recorder.close()
+    await llm_client.aclose()
+
+async def _delegate(ctx: Context, sender: str, agent_address: str, agent_name: str, user_query: str, gather_id: str = None):
+    """
+    Sends the user's query to a specialist and remembers who to forward the answer to
+    (or, for a fan-out, which gather to add it to).
+    """
+    ctx.logger.info("Delegating '%s' to %s...", user_query, agent_name)
+    delegated_msg_id = uuid4()
+    pending_delegations.add(str(delegated_msg_id), {
+        "user": sender, "agent": agent_name, "gather": gather_id, "sent_at": time.monotonic(),
+    })
+    delegation_stats["delegated"] += 1
+    await ctx.send(agent_address, ChatMessage(
+        timestamp=datetime.utcnow(),
+        msg_id=delegated_msg_id,
+        content=[
+            TextContent(type="text", text=user_query),
+            # Who is asking and from where, for specialists that answer per user or by distance
+            MetadataContent(type="metadata", metadata=_delegation_metadata(sender)),
+        ],
+    ))
+
+def _delegation_metadata(user_address: str):
+    """
+    Returns the user's address and (once onboarded) location, as metadata strings.
+    """
+    metadata = {"user": user_address}
+    user_state = session_store.get(user_address)
+    if user_state is not None and user_state.latitude is not None and user_state.longitude is not None:
+        metadata["latitude"] = str(user_state.latitude)
+        metadata["longitude"] = str(user_state.longitude)
+    return metadata
+
+def _configured_specialists():
     """
+    Returns {intent: (address, agent name)} for every specialist with a configured
+    address whose circuit breaker would let a call through.
+    """
+    specialists = {
+        "event": (EVENT_PLANNER_AGENT_ADDRESS, "EventIdeationPlannerAgent"),
+        "service": (LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS, "LocalServiceExchangeAgent"),
+        "finance": (SPONSORSHIP_FINANCE_AGENT_ADDRESS, "SponsorshipFinanceAgent"),
+        "venue": (LOCAL_RESOURCE_AGENT_ADDRESS, "LocalResourceLogisticsAgent"),
+    }
+    return {
+        intent: target for intent, target in specialists.items()
+        if target[0] != "agent1q..." and specialist_breakers[target[1]].available()
+    }
+
+def _fanout_targets(scores):
+    """
+    Returns [(address, agent name)] for every configured specialist whose intent
+    scored at least FANOUT_MIN_SCORE, strongest match first.
+    """
+    specialists = _configured_specialists()
+    intents = sorted(
+        (intent for intent, score in scores.items() if score >= FANOUT_MIN_SCORE and intent in specialists),
+        key=lambda intent: (scores[intent], porter_router.priorities[intent]),
+        reverse=True,
+    )
+    return [specialists[intent] for intent in intents]
+
+async def _fan_out(ctx: Context, sender: str, targets, user_query: str):
+    """
+    Delegates the query to every target at once and starts the gather deadline.
+    """
+    gather_id = str(uuid4())
+    pending_gathers.add(gather_id, {
+        "user": sender,
+        "agents": [agent_name for _, agent_name in targets],
+        "replies": {},
+        "started": time.perf_counter(),
+        "deadline": asyncio.get_running_loop().create_task(_gather_deadline(ctx, gather_id)),
+    })
+    delegation_stats["fanned_out"] += 1
+    for agent_address, agent_name in targets:
+        specialist_breakers[agent_name].allow() # Takes the probe if the breaker is half-open
+        await _delegate(ctx, sender, agent_address, agent_name, user_query, gather_id=gather_id)
+
+async def _gather_deadline(ctx: Context, gather_id: str):
+    await asyncio.sleep(FANOUT_DEADLINE_SECONDS)
+    gather = pending_gathers.pop(gather_id)
+    if gather is not None:
+        await _send_gathered(ctx, gather)
+
+async def _send_gathered(ctx: Context, gather: dict):
+    """
+    Sends the user one message with every answer gathered so far, in fan-out order.
+    """
+    replies = gather["replies"]
+    missing = [agent_name for agent_name in gather["agents"] if agent_name not in replies]
+    outcome = "partial" if missing else "gathered"
+    delegation_stats[outcome] += 1
+    metrics.histogram("localhive_porter_gather_seconds", outcome=outcome).observe(time.perf_counter() - gather["started"])
+
+    parts = [f"({agent_name}) {replies[agent_name]}" for agent_name in gather["agents"] if agent_name in replies]
+    if missing:
+        parts.append(f"Still waiting on {', '.join(missing)}; I'll pass their answers on when they arrive.")
+    ctx.logger.info("Sending %s answer from %s of %s specialists to %s", outcome, len(replies), len(gather["agents"]), gather["user"])
+    await ctx.send(gather["user"], ChatMessage(
+        timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text="\n\n".join(parts))]
+    ))
+
+def _get_in_reply_to(msg: ChatMessage):
+    """
+    Returns the delegated msg_id a specialist answer refers to, or None for user messages.
+    """
+    for item in msg.content:
+        if isinstance(item, MetadataContent) and "in_reply_to" in item.metadata:
+            return item.metadata["in_reply_to"]
+    return None
+
+def _record_chat_message(sender: str, msg: ChatMessage, in_reply_to: str):
+    """
+    Records a user message, or a specialist answer with the user it was delegated for.
+    """
+    text = "".join(item.text for item in msg.content if isinstance(item, TextContent))
+    if in_reply_to is None and sender not in _specialist_addresses():
+        traffic_recorder.record_message(sender, text)
+        return
+    delegation = pending_delegations.get(in_reply_to) if in_reply_to is not None else None
+    if delegation is None:
+        traffic_recorder.record_reply(None, None, text)
+    else:
+        traffic_recorder.record_reply(delegation["agent"], delegation["user"], text)
+
+def _specialist_addresses():
+    return {
+        EVENT_PLANNER_AGENT_ADDRESS,
+        LOCAL_RESOURCE_AGENT_ADDRESS,
+        SPONSORSHIP_FINANCE_AGENT_ADDRESS,
+        LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS,
+    } - {"agent1q..."}
+
+async def handle_response_from_other_agent(ctx: Context, sender: str, msg: ChatMessage, in_reply_to: str):
+    """
+    Forwards a specialist's answer to the user whose query was delegated.
+    Late (timed out) and orphaned (unknown) replies are counted and dropped.
+    """
+    delegation = pending_delegations.pop(in_reply_to) if in_reply_to is not None else None
+    if delegation is None:
+        if in_reply_to is not None and pending_delegations.was_dropped(in_reply_to):
+            delegation_stats["late"] += 1
+            ctx.logger.warning("Dropping late reply from %s to delegation %s.", sender, in_reply_to)
+        else:
+            delegation_stats["orphaned"] += 1
+            ctx.logger.warning("Dropping orphaned reply from %s (in_reply_to=%s).", sender, in_reply_to)
+        return
+    specialist_breakers[delegation["agent"]].record(True, time.monotonic() - delegation["sent_at"])
+
     response_content = ''
     for item in msg.content:
         if isinstance(item, TextContent):
             response_content += item.text
 
-    ctx.logger.info(f"PorterAgent received response from {sender}: {response_content}")
-
-    # Acknowledge the message from the other agent
-    await ctx.send(sender, ChatAcknowledgement(timestamp=datetime.now(), acknowledged_msg_id=msg.msg_id))
+    # Part of a fan-out still within its deadline: hold the answer for the combined reply
+    gather = pending_gathers.get(delegation["gather"]) if delegation.get("gather") else None
+    if gather is not None:
+        delegation_stats["forwarded"] += 1
+        gather["replies"][delegation["agent"]] = response_content
+        if len(gather["replies"]) == len(gather["agents"]):
+            pending_gathers.pop(delegation["gather"])
+            gather["deadline"].cancel()
+            await _send_gathered(ctx, gather)
+        return
 
-    # Try to find the original user to forward the response
-    # In a real system, you'd associate the original user_address with delegated messages
-    # For MVP, we'll just log and assume direct user interaction.
-    # If the sender is not the user and not the geolocation agent, we assume it's a sub-agent's reply
-    # and we forward it to the user who triggered the delegation.
-    # This requires a more robust state management to map sender to original user.
-    # For a simple demo, we'll assume the Porter is talking directly to the user.
-    
-    # A simple (but not robust) way to forward might be to check if the sender is not a known sub-agent and forward to the
-    # current active user (if only one user is expected for demo).
-    # A more robust approach would be to store original_user_address when delegating.
-    # For now, we'll just log that a response was received from a sub-agent.
-    # The `handle_user_message` already sends an initial response.
-    pass # No direct forwarding to user here for simplicity, Porter handles the user-facing response.
+    ctx.logger.info("PorterAgent forwarding response from %s to %s", delegation['agent'], delegation['user'])
+    delegation_stats["forwarded"] += 1
+    await ctx.send(delegation["user"], ChatMessage(
+        timestamp=datetime.utcnow(),
+        msg_id=uuid4(),
+        content=[TextContent(type="text", text=f"({delegation['agent']}) {response_content}")],
+    ))
 
 
 @chat_protocol.on_message(ChatAcknowledgement)
+@instrumented("PorterAgent")
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
     """
     Handles acknowledgements from other agents, confirming message receipt.
     """
-    ctx.logger.info(f"Received acknowledgement from {sender} for message ID: {msg.acknowledged_msg_id}")
+    ctx.logger.info("Received acknowledgement from %s for message ID: %s", sender, msg.acknowledged_msg_id)
 
 porter_agent.include(chat_protocol, publish_manifest=True)
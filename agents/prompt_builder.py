@@ -0,0 +1,149 @@
+"""
+Prompt assembly for LLM calls: a stable prefix, recent turns, then volatile context.
+
+Providers cache prompts by prefix, so anything that changes between calls must
+come last. The fallback prompt used to start with the current time formatted to
+the second, which made every prompt unique from its first line. A PromptBuilder
+instead lays out each call as
+
+    [static system prefix]      identical for every call, normalized once
+    [recent turns]              append-only per user, so also stable turn to turn
+    [volatile context]          current time rounded to `time_granularity_minutes`, locality, ...
+    [the new user message]
+
+ConversationHistory keeps a user's recent turns in a bounded ring buffer,
+trimmed from the oldest turn to a token budget, so follow-up questions keep
+their context without the input growing with the conversation. HistoryStore
+holds one history per user in an LRU of at most `max_users`.
+"""
+import inspect
+from collections import OrderedDict, deque
+from datetime import datetime
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (about four characters per token), good enough for budgeting.
+    """
+    return len(text) // 4 + 1
+
+
+class ConversationHistory:
+    """
+    The most recent turns of one conversation, within `max_turns` and `token_budget`.
+    """
+
+    __slots__ = ("max_turns", "token_budget", "_turns", "_tokens")
+
+    def __init__(self, max_turns=8, token_budget=600):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self._turns = deque() # (role, content, tokens), oldest first
+        self._tokens = 0
+
+    def add(self, role, content):
+        tokens = estimate_tokens(content)
+        self._turns.append((role, content, tokens))
+        self._tokens += tokens
+        while self._turns and (len(self._turns) > self.max_turns or self._tokens > self.token_budget):
+            self._tokens -= self._turns.popleft()[2]
+        # Never start on an answer whose question was trimmed away
+        while self._turns and self._turns[0][0] != "user":
+            self._tokens -= self._turns.popleft()[2]
+
+    def add_exchange(self, query, answer):
+        self.add("user", query)
+        self.add("assistant", answer)
+
+    def messages(self):
+        return [{"role": role, "content": content} for role, content, _ in self._turns]
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def __len__(self):
+        return len(self._turns)
+
+
+class HistoryStore:
+    """
+    One ConversationHistory per user, in an LRU of at most `max_users`.
+    """
+
+    def __init__(self, max_users=50000, max_turns=8, token_budget=600):
+        self.max_users = max_users
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self._histories = OrderedDict()
+
+    def get(self, user):
+        """
+        Returns the user's history, creating an empty one if needed.
+        """
+        history = self._histories.pop(user, None)
+        if history is None:
+            history = ConversationHistory(self.max_turns, self.token_budget)
+        self._histories[user] = history
+        if len(self._histories) > self.max_users:
+            self._histories.popitem(last=False)
+        return history
+
+    def __len__(self):
+        return len(self._histories)
+
+
+class PromptBuilder:
+    """
+    Builds chat messages around one static system prefix.
+    """
+
+    def __init__(self, static_prefix, time_granularity_minutes=60, time_zone_label=""):
+        self.static_prefix = inspect.cleandoc(static_prefix)
+        self.time_granularity_minutes = time_granularity_minutes
+        self.time_zone_label = time_zone_label
+        self._prefix_message = {"role": "system", "content": self.static_prefix}
+
+    def coarse_time(self, now=None):
+        """
+        The current time rounded down to `time_granularity_minutes`, as text.
+        """
+        now = now or datetime.now()
+        minutes = now.hour * 60 + now.minute
+        minutes -= minutes % self.time_granularity_minutes
+        now = now.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+        text = now.strftime("%A, %B %d, %Y, around %I:%M %p")
+        return f"{text} {self.time_zone_label}".rstrip()
+
+    def facts(self, now=None, **context):
+        """
+        The volatile context line: the coarse current time, then `context` (e.g. locality)
+        in the order given.
+        """
+        facts = [f"Current time: {self.coarse_time(now)}."]
+        facts.extend(f"{name.replace('_', ' ').capitalize()}: {value}." for name, value in context.items() if value)
+        return " ".join(facts)
+
+    def build(self, query, history=None, now=None, **context):
+        """
+        Returns the messages for one call. `context` adds volatile facts (e.g. locality)
+        after the current time, in the order given.
+        """
+        messages = [self._prefix_message]
+        if history is not None:
+            messages.extend(history.messages())
+        messages.append({"role": "system", "content": self.facts(now, **context)})
+        messages.append({"role": "user", "content": query})
+        return messages
+
+    def cache_key(self, history=None, now=None, **context):
+        """
+        The prompt part of a response cache key: the static prefix plus the volatile
+        facts `build` sends with the same arguments, so an answer that depends on the
+        hour or the locality is only served to calls that would send the same ones.
+        Returns None when `history` has turns: a follow-up's answer depends on the
+        conversation, so it should neither be looked up nor stored.
+        """
+        if history is not None and len(history):
+            return None
+        return f"{self.static_prefix}\0{self.facts(now, **context)}"
@@ -0,0 +1,520 @@
+"""
+Catalog of venues and vendors for the LocalResourceLogisticsAgent.
+
+Resources are loaded from a JSON Lines file, one resource per line:
+
+    {"id": "van-vihar", "name": "Van Vihar National Park", "category": "venue", "locality": "Van Vihar", "latitude": 23.233, "longitude": 77.365, "description": "Large, serene", "capacity": 500, "rating": 4.6, "availability": [{"days": ["daily"], "start": "06:00", "end": "18:00"}]}
+
+Availability `days` are day names (or "mon", "tue", ...) and "daily", "weekdays"
+or "weekends"; a window ending before it starts runs past midnight.
+
+Each category keeps its own indexes:
+  - a GeoGridIndex, for "near this locality" queries,
+  - an interval tree over weekly availability windows (minutes since Monday
+    00:00), for "free on Saturday 4-8pm" queries,
+  - the resources ranked by rating, for queries without a location.
+
+The set of resources free in a given slot is cached per category, under the
+category's generation, so repeated slot queries skip the tree.
+
+`reload` is incremental. An unchanged file (same size and mtime) costs one
+stat call. Otherwise lines identical to the last load are skipped without
+being parsed, only new or edited resources are re-indexed, and only the
+categories they touch rebuild their tree and ranking.
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from itertools import count
+
+from geocode_cache import normalize_locality
+from instrumentation import metrics
+from spatial_index import GeoGridIndex, haversine_km
+from ttl_cache import TTLCache
+
+metrics.describe("localhive_resource_catalog_resources", "Resources in the catalog, by category.")
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+DAY_ALIASES = {day[:3]: index for index, day in enumerate(DAYS)}
+DAY_ALIASES.update({day: index for index, day in enumerate(DAYS)})
+DAY_ALIASES.update({"tues": 1, "thur": 3, "thurs": 3})
+DAY_GROUPS = {"daily": range(7), "weekdays": range(5), "weekends": range(5, 7)}
+
+# Hours of the named parts of the day, as (start, end)
+DAY_PARTS = {"morning": (6, 12), "afternoon": (12, 17), "evening": (17, 21), "night": (20, 24)}
+# Length of a slot given only as a start time ("at 6pm")
+DEFAULT_SLOT_HOURS = 2
+
+_TIME = r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)?"
+_TIME_RANGE = re.compile(r"\b" + _TIME + r"\s*(?:-|–|—|to|until|till)\s*" + _TIME + r"\b")
+_TIME_AT = re.compile(r"\bat\s+" + _TIME + r"\b")
+# A range directly preceded by one of these is a time even without am/pm or a colon ("from 10-12")
+_TIME_CUE_BEFORE = re.compile(r"\b(?:at|from|between)\s*$")
+# A range followed by one of these counts something else ("10-20 people", "2-3 days")
+_COUNT_NOUN_AFTER = re.compile(
+    r"\s*(?:people|persons?|guests?|attendees?|participants?|visitors?|members?|volunteers?|kids|children|"
+    r"seats?|tables?|chairs?|plates?|stalls?|events?|days?|nights?|hours?|hrs?|weeks?|months?|years?|km|kms)\b"
+)
+_DAY_WORD = re.compile(r"\b(today|tonight|tomorrow|weekend|" + "|".join(sorted(DAY_ALIASES, key=len, reverse=True)) + r")\b")
+_DAY_PART = re.compile(r"\b(" + "|".join(DAY_PARTS) + r")\b")
+
+
+# --- Time slots ---
+
+class TimeSlot:
+    """
+    A window of the week in minutes since Monday 00:00. A slot without a time of day
+    (`whole_day`) asks for anything open during it rather than open throughout it.
+    """
+
+    __slots__ = ("start", "end", "label", "whole_day")
+
+    def __init__(self, start, end, label, whole_day=False):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.whole_day = whole_day
+
+    def key(self):
+        return f"{self.start}-{self.end}-{int(self.whole_day)}"
+
+    def __repr__(self):
+        return f"TimeSlot({self.label!r}, {self.start}-{self.end})"
+
+
+def _valid_times(groups):
+    """
+    Whether (hour, minute, meridiem, ...) groups are clock times rather than other numbers ("50-100 people").
+    """
+    for hour, minute, meridiem in zip(groups[::3], groups[1::3], groups[2::3]):
+        if int(hour) > (12 if meridiem else 24) or int(minute or 0) > 59:
+            return False
+    return True
+
+
+def _is_clock_range(match, text):
+    """
+    Whether a _TIME_RANGE match in `text` is a time slot. A bare range ("10-20") only
+    counts when the text also names a day or part of the day, or "at", "from" or
+    "between" precedes it, and no range counts when a count noun follows it ("15-20 guests").
+    """
+    if not _valid_times(match.groups()) or _COUNT_NOUN_AFTER.match(text, match.end()):
+        return False
+    start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = match.groups()
+    if start_minute or start_meridiem or end_minute or end_meridiem:
+        return True
+    return bool(_TIME_CUE_BEFORE.search(text, 0, match.start()) or _DAY_WORD.search(text) or _DAY_PART.search(text))
+
+
+def _to_minutes(hour, minute, meridiem):
+    hour = int(hour) % 24
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return hour * 60 + int(minute or 0)
+
+
+def _format_minutes(minutes):
+    hour, minute = divmod(minutes % MINUTES_PER_DAY, 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def parse_time_slot(text, now=None):
+    """
+    Reads a slot like "saturday 4-8pm", "sun 10:00-13:00", "tomorrow evening",
+    "friday at 6pm" or "this weekend" from `text`. A time without a day means
+    today; a day without a time means the whole day. Returns None if `text`
+    names neither.
+    """
+    text = text.lower()
+    now = now or datetime.now()
+    day_match = _DAY_WORD.search(text)
+    day_word = day_match.group(1) if day_match else None
+
+    start = end = None
+    range_match = next((match for match in _TIME_RANGE.finditer(text) if _is_clock_range(match, text)), None)
+    at_match = next(
+        (match for match in _TIME_AT.finditer(text) if _valid_times(match.groups()) and (match.group(2) or match.group(3))),
+        None,
+    )
+    part_match = _DAY_PART.search(text)
+    if range_match:
+        start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = range_match.groups()
+        if start_meridiem is None and end_meridiem is None and int(start_hour) <= 12 and int(end_hour) <= 12 and int(start_hour) < 7:
+            start_meridiem = end_meridiem = "pm" # "4-8" at an event means the afternoon
+        end = _to_minutes(end_hour, end_minute, end_meridiem)
+        start = _to_minutes(start_hour, start_minute, start_meridiem or end_meridiem)
+        if start_meridiem is None and start > end:
+            start = _to_minutes(start_hour, start_minute, "am") # "10-2pm"
+    elif at_match:
+        start = _to_minutes(*at_match.groups())
+        end = start + DEFAULT_SLOT_HOURS * 60
+    elif part_match:
+        start_hour, end_hour = DAY_PARTS[part_match.group(1)]
+        start, end = start_hour * 60, end_hour * 60
+    elif day_word == "tonight":
+        start, end = DAY_PARTS["evening"][0] * 60, MINUTES_PER_DAY
+
+    if day_word is None and start is None:
+        return None
+    if day_word == "weekend":
+        if start is None:
+            return TimeSlot(5 * MINUTES_PER_DAY, MINUTES_PER_WEEK, "this weekend", whole_day=True)
+        day = 5 # Saturday, the usual event day of a weekend
+    elif day_word in (None, "today", "tonight"):
+        day = now.weekday()
+    elif day_word == "tomorrow":
+        day = (now + timedelta(days=1)).weekday()
+    else:
+        day = DAY_ALIASES[day_word]
+
+    day_start = day * MINUTES_PER_DAY
+    if start is None:
+        return TimeSlot(day_start, day_start + MINUTES_PER_DAY, DAYS[day].capitalize(), whole_day=True)
+    if end <= start:
+        end += MINUTES_PER_DAY # Past midnight
+    label = f"{DAYS[day].capitalize()} {_format_minutes(start)}–{_format_minutes(end)}"
+    return TimeSlot(day_start + start, min(day_start + end, MINUTES_PER_WEEK), label)
+
+
+def _parse_clock(value):
+    hour, _, minute = value.partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+
+def weekly_windows(availability):
+    """
+    Turns catalog availability entries into [(start, end)] minutes of the week.
+    Windows past Sunday midnight are cut there.
+    """
+    windows = []
+    for entry in availability:
+        start = _parse_clock(entry["start"])
+        end = _parse_clock(entry["end"])
+        if end <= start:
+            end += MINUTES_PER_DAY
+        for name in entry["days"]:
+            name = name.lower()
+            days = DAY_GROUPS[name] if name in DAY_GROUPS else [DAY_ALIASES[name]]
+            for day in days:
+                day_start = day * MINUTES_PER_DAY
+                windows.append((day_start + start, min(day_start + end, MINUTES_PER_WEEK)))
+    return windows
+
+
+# --- Interval tree ---
+
+class IntervalTree:
+    """
+    Static centered interval tree over half-open (start, end, value) intervals.
+    An overlap query costs O(log n + matches).
+    """
+
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, intervals):
+        self.left = self.right = None
+        if not intervals:
+            self.center = 0
+            self.by_start = self.by_end = []
+            return
+        # The median start lies in its own interval, so every node keeps at least one
+        starts = sorted(interval[0] for interval in intervals)
+        self.center = starts[len(starts) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] <= self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        if left:
+            self.left = IntervalTree(left)
+        if right:
+            self.right = IntervalTree(right)
+
+    def overlapping(self, start, end):
+        """
+        Yields every interval overlapping [start, end).
+        """
+        node = self
+        while node is not None:
+            if end <= node.center:
+                # Intervals here end after the center, so they overlap iff they start before `end`
+                for interval in node.by_start:
+                    if interval[0] >= end:
+                        break
+                    yield interval
+                node = node.left
+            elif start > node.center:
+                # Intervals here start at or before the center, so they overlap iff they end after `start`
+                for interval in node.by_end:
+                    if interval[1] <= start:
+                        break
+                    yield interval
+                node = node.right
+            else:
+                yield from node.by_start
+                if node.left is not None:
+                    yield from node.left.overlapping(start, end)
+                node = node.right
+
+
+# --- Catalog ---
+
+class Resource:
+    __slots__ = ("resource_id", "name", "category", "locality", "latitude", "longitude", "description",
+                 "capacity", "rating", "windows")
+
+    def __init__(self, record):
+        self.resource_id = str(record["id"])
+        self.name = record["name"]
+        self.category = record["category"]
+        self.locality = record.get("locality", "")
+        self.latitude = record.get("latitude")
+        self.longitude = record.get("longitude")
+        self.description = record.get("description", "")
+        self.capacity = record.get("capacity")
+        self.rating = record.get("rating", 0.0)
+        self.windows = weekly_windows(record.get("availability", []))
+
+    @property
+    def located(self):
+        return self.latitude is not None and self.longitude is not None
+
+    def __repr__(self):
+        return f"Resource({self.category}, {self.name!r})"
+
+
+class _CategoryIndex:
+    __slots__ = ("resources", "spatial", "windows", "availability", "ranked", "generation")
+
+    def __init__(self, cell_degrees):
+        self.resources = {} # resource_id -> Resource
+        self.spatial = GeoGridIndex(cell_degrees=cell_degrees)
+        # Opening hours repeat a lot, so each distinct window is held once, with everyone open in it
+        self.windows = {} # (start, end) -> {resource_id}
+        self.availability = IntervalTree([])
+        self.ranked = []
+        self.generation = 0
+
+    def add(self, resource):
+        self.resources[resource.resource_id] = resource
+        if resource.located:
+            self.spatial.insert(resource.resource_id, resource.latitude, resource.longitude)
+        for window in resource.windows:
+            self.windows.setdefault(window, set()).add(resource.resource_id)
+
+    def remove(self, resource):
+        del self.resources[resource.resource_id]
+        self.spatial.remove(resource.resource_id)
+        for window in resource.windows:
+            ids = self.windows.get(window)
+            if ids is not None:
+                ids.discard(resource.resource_id)
+                if not ids:
+                    del self.windows[window]
+
+    def rebuild(self, generation):
+        """
+        Rebuilds what cannot be updated in place: the availability tree and the ranking.
+        """
+        self.availability = IntervalTree([(start, end, ids) for (start, end), ids in self.windows.items()])
+        self.ranked = sorted(self.resources.values(), key=lambda resource: (-resource.rating, resource.name))
+        self.generation = generation
+
+
+class ResourceCatalog:
+    """
+    Venues and vendors by category, searchable by place and free time slot.
+    """
+
+    def __init__(self, path, cell_degrees=0.05, default_radius_km=10.0, slot_cache_entries=1024, slot_cache_ttl_seconds=600.0):
+        self.path = path
+        self.cell_degrees = cell_degrees
+        self.default_radius_km = default_radius_km
+        self._resources = {} # resource_id -> Resource
+        self._lines = {} # line of the file last loaded -> resource_id
+        self._categories = {} # category -> _CategoryIndex
+        self._localities = {} # normalized locality -> [locality, latitude sum, longitude sum, resources]
+        self._file_signature = None # (size, mtime_ns) of the file last loaded
+        self._file_digest = None
+        self._generations = count(1) # Catalog-wide, so a re-created category never reuses cached slots
+        self._slot_cache = TTLCache(max_entries=slot_cache_entries, ttl_seconds=slot_cache_ttl_seconds, name="resource_slots")
+        self._reload_timer = metrics.timer("localhive_storage_op_seconds", store="resource_catalog", op="reload")
+        self._search_timer = metrics.timer("localhive_storage_op_seconds", store="resource_catalog", op="search")
+        metrics.add_collector(self._collect)
+
+    # --- Loading ---
+
+    def reload(self):
+        """
+        Applies changes in the catalog file. Returns (added, updated, removed) counts,
+        or None if the file is unchanged.
+        """
+        stat = os.stat(self.path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature == self._file_signature:
+            return None
+        with self._reload_timer:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            file_digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+            if file_digest != self._file_digest:
+                changes = self._apply(raw.decode("utf-8").splitlines())
+            else:
+                changes = None # Touched, not changed
+        # Only remembered once applied, so a file that failed to load is retried
+        self._file_signature = signature
+        self._file_digest = file_digest
+        return changes
+
+    def _apply(self, lines):
+        lines = {line: None for line in lines if line.strip()}
+        seen = set()
+        dirty = set()
+        added = updated = 0
+        for line in lines:
+            resource_id = self._lines.get(line)
+            if resource_id is not None: # Same line as last time, so the same resource
+                lines[line] = resource_id
+                seen.add(resource_id)
+                continue
+            resource = Resource(json.loads(line))
+            lines[line] = resource.resource_id
+            seen.add(resource.resource_id)
+            current = self._resources.get(resource.resource_id)
+            if current is None:
+                added += 1
+            else:
+                updated += 1
+                self._remove(current)
+                dirty.add(current.category)
+            self._add(resource)
+            dirty.add(resource.category)
+
+        removed = [resource for resource_id, resource in self._resources.items() if resource_id not in seen]
+        for resource in removed:
+            self._remove(resource)
+            dirty.add(resource.category)
+        self._lines = lines
+
+        for name in dirty:
+            if self._categories[name].resources:
+                self._categories[name].rebuild(next(self._generations))
+            else:
+                del self._categories[name]
+        return added, updated, len(removed)
+
+    def _add(self, resource):
+        self._resources[resource.resource_id] = resource
+        category = self._categories.get(resource.category)
+        if category is None:
+            category = self._categories[resource.category] = _CategoryIndex(self.cell_degrees)
+        category.add(resource)
+        if resource.locality and resource.located:
+            entry = self._localities.setdefault(normalize_locality(resource.locality), [resource.locality, 0.0, 0.0, 0])
+            entry[1] += resource.latitude
+            entry[2] += resource.longitude
+            entry[3] += 1
+
+    def _remove(self, resource):
+        del self._resources[resource.resource_id]
+        self._categories[resource.category].remove(resource)
+        if resource.locality and resource.located:
+            name = normalize_locality(resource.locality)
+            entry = self._localities[name]
+            entry[1] -= resource.latitude
+            entry[2] -= resource.longitude
+            entry[3] -= 1
+            if not entry[3]:
+                del self._localities[name]
+
+    # --- Queries ---
+
+    def categories(self):
+        return list(self._categories)
+
+    def find_locality(self, text):
+        """
+        Returns (locality, latitude, longitude) for the longest known locality named in
+        `text` (its resources' average position), or None.
+        """
+        text = f" {normalize_locality(text)} "
+        best_name = None
+        for name in self._localities:
+            if f" {name} " in text and (best_name is None or len(name) > len(best_name)):
+                best_name = name
+        if best_name is None:
+            return None
+        locality, latitude_sum, longitude_sum, resources = self._localities[best_name]
+        return locality, latitude_sum / resources, longitude_sum / resources
+
+    def search(self, category, latitude=None, longitude=None, radius_km=None, slot=None, limit=5):
+        """
+        Returns up to `limit` [(distance_km, Resource)] in `category`, free during `slot`
+        if given. With a location, only resources within `radius_km` (default
+        `default_radius_km`) count, nearest first; distance_km is None otherwise and
+        resources come best rated first.
+        """
+        index = self._categories.get(category)
+        if index is None:
+            return []
+        with self._search_timer:
+            free = self._free_during(category, index, slot) if slot is not None else None
+            if latitude is None or longitude is None:
+                candidates = index.ranked if free is None else (resource for resource in index.ranked if resource.resource_id in free)
+                results = []
+                for resource in candidates:
+                    results.append((None, resource))
+                    if len(results) == limit:
+                        break
+                return results
+
+            radius_km = radius_km or self.default_radius_km
+            if free is not None and len(free) < len(index.resources) // 8:
+                # Few resources are free: measuring them directly beats walking the grid
+                hits = []
+                for resource_id in free:
+                    resource = index.resources[resource_id]
+                    if resource.located:
+                        distance = haversine_km(latitude, longitude, resource.latitude, resource.longitude)
+                        if distance <= radius_km:
+                            hits.append((distance, resource_id))
+                hits.sort()
+            else:
+                hits = index.spatial.within_radius(latitude, longitude, radius_km)
+                if free is not None:
+                    hits = [hit for hit in hits if hit[1] in free]
+            return [(distance, index.resources[resource_id]) for distance, resource_id in hits[:limit]]
+
+    def _free_during(self, category, index, slot):
+        """
+        Returns the ids of resources in `category` open during `slot` (anywhere in it for
+        a whole-day slot, throughout it otherwise), cached per category generation.
+        """
+        key = f"{category}\0{index.generation}\0{slot.key()}"
+        free = self._slot_cache.get(key)
+        if free is None:
+            free = set()
+            for start, end, ids in index.availability.overlapping(slot.start, slot.end):
+                if slot.whole_day or (start <= slot.start and end >= slot.end):
+                    free.update(ids)
+            self._slot_cache.set(key, free)
+        return free
+
+    def _collect(self):
+        for name, index in self._categories.items():
+            metrics.gauge("localhive_resource_catalog_resources", category=name).set(len(index.resources))
+
+    def __len__(self):
+        return len(self._resources)
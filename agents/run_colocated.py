@@ -0,0 +1,77 @@
+"""
+Runs the Porter, the DataManagerAgent and the four specialists in one process.
+
+All six agents share one Bureau (one endpoint, one event loop), and messages
+between them go through the in-memory LocalBus instead of envelopes: the Porter's
+delegations, the specialists' answers, profile writes and acks are handed over
+as objects. Users and the geolocation agent still reach the Porter through the
+Bureau's endpoint as usual.
+
+The Porter's *_AGENT_ADDRESS settings are pointed at the co-located agents, so
+they don't need to be filled in for this mode. Run from the agents/ directory:
+    python run_colocated.py
+"""
+from uagents import Bureau
+from uagents_core.contrib.protocols.chat import ChatAcknowledgement, ChatMessage
+from uagents.protocols.geolocation import GeolocationResponse
+
+import data_manager
+import event_ideation_planner_agent as event_planner
+import local_resource_logistics_agent as local_resource
+import local_service_exchange_agent as service_exchange
+import porter_agent as porter
+import sponsership_finance_agent as finance
+from colocated import LocalBus, install
+
+# --- CONFIGURATION ---
+BUREAU_PORT = 8000
+BUREAU_ENDPOINT = f"http://127.0.0.1:{BUREAU_PORT}/submit"
+
+
+def build_local_bus():
+    """
+    Wires the Porter to the co-located agents and registers every handler on a LocalBus.
+    """
+    porter.DATA_MANAGER_AGENT_ADDRESS = data_manager.data_manager_agent.address
+    porter.EVENT_PLANNER_AGENT_ADDRESS = event_planner.event_planner_agent.address
+    porter.LOCAL_RESOURCE_AGENT_ADDRESS = local_resource.local_resource_agent.address
+    porter.SPONSORSHIP_FINANCE_AGENT_ADDRESS = finance.sponsorship_finance_agent.address
+    porter.LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS = service_exchange.local_service_exchange_agent.address
+
+    bus = LocalBus()
+    bus.register(porter.porter_agent, ChatMessage, porter.handle_user_message)
+    bus.register(porter.porter_agent, ChatAcknowledgement, porter.handle_ack)
+    bus.register(porter.porter_agent, GeolocationResponse, porter.handle_geolocation_response)
+
+    bus.register(data_manager.data_manager_agent, data_manager.UserProfileData, data_manager.handle_user_profile_data)
+    bus.register(data_manager.data_manager_agent, data_manager.NearbyUsersRequest, data_manager.handle_nearby_users_request)
+    bus.register(data_manager.data_manager_agent, ChatAcknowledgement, data_manager.handle_ack)
+
+    for module, agent, handler in (
+        (event_planner, event_planner.event_planner_agent, event_planner.handle_event_request),
+        (local_resource, local_resource.local_resource_agent, local_resource.handle_resource_request),
+        (finance, finance.sponsorship_finance_agent, finance.handle_finance_request),
+        (service_exchange, service_exchange.local_service_exchange_agent, service_exchange.handle_service_request),
+    ):
+        bus.register(agent, ChatMessage, handler)
+        bus.register(agent, ChatAcknowledgement, module.handle_ack)
+    return bus
+
+
+def colocated_agents():
+    return [
+        porter.porter_agent,
+        data_manager.data_manager_agent,
+        event_planner.event_planner_agent,
+        local_resource.local_resource_agent,
+        finance.sponsorship_finance_agent,
+        service_exchange.local_service_exchange_agent,
+    ]
+
+
+if __name__ == "__main__":
+    install(build_local_bus())
+    bureau = Bureau(port=BUREAU_PORT, endpoint=[BUREAU_ENDPOINT])
+    for agent in colocated_agents():
+        bureau.add(agent)
+    bureau.run()
@@ -0,0 +1,353 @@
+"""
+Offer/request matching engine for the LocalServiceExchangeAgent.
+
+Users register offers ("I offer maths tutoring") and requests ("I need a
+plumber"). Each listing is indexed under its service category and the terms of
+its text, per coarse geo cell of `cell_degrees` on each side:
+
+    (kind, "c:<category>" or "t:<term>", cell) -> {listing_id: Listing}
+
+Matching is incremental: when a listing arrives it is matched straight away
+against the opposite kind, by looking up only its own categories and terms in
+the cells that can hold a listing within `max_distance_km` of it. By default
+cells are sized from that distance, so the search covers 3 x 3 cells anywhere
+between CELL_REFERENCE_LATITUDE north and south. Postings keep insertion order;
+tokens are read rarest first, each newest first across the cells, until
+`max_candidates` listings within reach have been collected in total. The work
+per match is therefore bounded however many listings are live. The cap trades
+a little ranking quality for latency: an older listing past it is only found
+through a rarer term it shares with the new one.
+
+Candidates are ranked by
+
+    shared tokens (category counts double) / (1 + km / distance_scale_km) / (1 + hours old / recency_scale_hours)
+
+and the top `top_k` are returned. Owners of the matched listings get a
+notification, which the agent hands them the next time they get in touch.
+Listings expire after `ttl_seconds`.
+"""
+import heapq
+import math
+import re
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from operator import attrgetter, itemgetter
+from uuid import uuid4
+
+from instrumentation import metrics
+from spatial_index import EARTH_RADIUS_KM, haversine_km
+
+metrics.describe("localhive_service_exchange_listings", "Live listings in the service exchange, by kind.")
+metrics.describe("localhive_service_exchange_matches", "Counterparts returned per new listing.")
+
+OFFER = "offer"
+REQUEST = "request"
+COUNTERPART = {OFFER: REQUEST, REQUEST: OFFER}
+
+NO_CELL = None # Bucket for listings without coordinates; searched by every match, and the only one they search
+# Derived cells are as wide as the search distance's longitude span at this latitude, so
+# closer to the equator one ring of cells around a listing's own reaches far enough
+CELL_REFERENCE_LATITUDE = 45.0
+# Listings read per candidate kept, at most; the rest of the reads are ones outside the search distance
+SCAN_PER_CANDIDATE = 4
+
+_WORD_RE = re.compile(r"[a-z]+")
+STOPWORDS = frozenset("""
+    a an and any are around can could do does for from get have help i im in is it looking me my near need
+    needs of offer offering offers on or our please service services some someone the this to want we who
+    with you your
+""".split())
+
+
+def extract_terms(text):
+    """
+    Lowercased content words of `text`, with a plural "s" stripped.
+    """
+    terms = set()
+    for word in _WORD_RE.findall(text.lower()):
+        if len(word) < 3 or word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return frozenset(terms)
+
+
+class Listing:
+    __slots__ = ("listing_id", "kind", "owner", "text", "category", "terms", "latitude", "longitude", "created_at", "cell")
+
+    def __init__(self, listing_id, kind, owner, text, category=None, latitude=None, longitude=None, created_at=0.0):
+        self.listing_id = listing_id
+        self.kind = kind
+        self.owner = owner
+        self.text = text
+        self.category = category
+        self.terms = extract_terms(text)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.created_at = created_at
+        self.cell = NO_CELL
+
+    def tokens(self):
+        if self.category:
+            yield "c:" + self.category
+        for term in self.terms:
+            yield "t:" + term
+
+    def to_dict(self):
+        return {
+            "listing_id": self.listing_id,
+            "kind": self.kind,
+            "owner": self.owner,
+            "text": self.text,
+            "category": self.category,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "created_at": self.created_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        return f"Listing({self.kind}, {self.category!r}, {self.text!r})"
+
+
+def _overlap(listing, counterpart):
+    """
+    Shared token weight of two listings; a shared category counts double.
+    """
+    weight = 2.0 if listing.category and listing.category == counterpart.category else 0.0
+    return weight + len(listing.terms & counterpart.terms)
+
+
+class ServiceExchange:
+    """
+    Inverted index of live offers and requests with incremental top-k matching.
+    """
+
+    def __init__(self, cell_degrees=None, top_k=5, max_distance_km=25.0, max_candidates=200,
+                 distance_scale_km=5.0, recency_scale_hours=72.0, ttl_seconds=14 * 24 * 3600.0,
+                 notifications_per_owner=20, max_notified_owners=100000, clock=time.time):
+        # Angle subtended by max_distance_km; sets the cell size and how many cells a match may be away
+        self._search_angle = max_distance_km / EARTH_RADIUS_KM
+        if cell_degrees is None:
+            cell_degrees = math.degrees(self._search_angle) / math.cos(math.radians(CELL_REFERENCE_LATITUDE))
+        self.cell_degrees = cell_degrees
+        self.top_k = top_k
+        self.max_distance_km = max_distance_km
+        self.max_candidates = max_candidates
+        self.distance_scale_km = distance_scale_km
+        self.recency_scale_hours = recency_scale_hours
+        self.ttl_seconds = ttl_seconds
+        self.notifications_per_owner = notifications_per_owner
+        self.max_notified_owners = max_notified_owners
+        self._clock = clock
+        self._lon_cells = int(math.ceil(360.0 / cell_degrees))
+        self._lat_cells = int(math.ceil(180.0 / cell_degrees))
+        self._row_rings = int(math.ceil(math.degrees(self._search_angle) / cell_degrees))
+        self._listings = {} # listing_id -> Listing, oldest first
+        self._postings = {} # (kind, token, cell) -> {listing_id: Listing}, oldest first
+        self._notifications = OrderedDict() # owner -> deque of listing ids that matched theirs
+        self._counts = {OFFER: 0, REQUEST: 0}
+        self._match_timer = metrics.timer("localhive_storage_op_seconds", store="service_exchange", op="match")
+        self._matches = metrics.histogram("localhive_service_exchange_matches")
+        metrics.add_collector(self._collect)
+
+    # --- Listings ---
+
+    def add(self, kind, owner, text, category=None, latitude=None, longitude=None):
+        """
+        Registers a listing and returns (listing, [(score, distance_km, counterpart)]),
+        the best matching listings of the opposite kind, best first.
+        """
+        listing = Listing(uuid4().hex, kind, owner, text, category, latitude, longitude, self._clock())
+        listing.cell = self._cell(latitude, longitude)
+        with self._match_timer:
+            matches = self.match(listing)
+        self._matches.observe(len(matches))
+        self.restore(listing)
+        for _, _, counterpart in matches:
+            self._notify(counterpart.owner, listing.listing_id)
+        return listing, matches
+
+    def restore(self, listing):
+        """
+        Indexes an existing listing (e.g. one reloaded from storage) without matching it.
+        """
+        self.remove(listing.listing_id)
+        listing.cell = self._cell(listing.latitude, listing.longitude)
+        self._listings[listing.listing_id] = listing
+        self._counts[listing.kind] += 1
+        for token in listing.tokens():
+            self._postings.setdefault((listing.kind, token, listing.cell), {})[listing.listing_id] = listing
+
+    def remove(self, listing_id):
+        listing = self._listings.pop(listing_id, None)
+        if listing is None:
+            return None
+        self._counts[listing.kind] -= 1
+        for token in listing.tokens():
+            key = (listing.kind, token, listing.cell)
+            posting = self._postings[key]
+            del posting[listing_id]
+            if not posting:
+                del self._postings[key]
+        return listing
+
+    def get(self, listing_id):
+        return self._listings.get(listing_id)
+
+    def purge_expired(self, now=None):
+        """
+        Removes listings older than `ttl_seconds` and returns them.
+        """
+        cutoff = (self._clock() if now is None else now) - self.ttl_seconds
+        expired = []
+        for listing in self._listings.values(): # Oldest first, so stop at the first live one
+            if listing.created_at > cutoff:
+                break
+            expired.append(listing)
+        for listing in expired:
+            self.remove(listing.listing_id)
+        return expired
+
+    # --- Matching ---
+
+    def match(self, listing, k=None):
+        """
+        Returns up to `k` (default `top_k`) [(score, distance_km, counterpart)] for
+        `listing`, best first. distance_km is None when either side has no coordinates.
+        """
+        kind = COUNTERPART[listing.kind]
+        k = k or self.top_k
+        cells = self._nearby_cells(listing.latitude, listing.longitude)
+        by_token = []
+        for token in listing.tokens():
+            postings = [posting for posting in (self._postings.get((kind, token, cell)) for cell in cells) if posting]
+            if postings:
+                by_token.append((sum(map(len, postings)), postings))
+        # Rarest tokens first, each with an even share of what is left of the budget; a
+        # listing found through one token is scored on every token it shares. Listings
+        # outside the search distance's bounding box are skipped without using the budget,
+        # but at most SCAN_PER_CANDIDATE of them are read per candidate.
+        by_token.sort(key=itemgetter(0))
+        located = listing.cell is not NO_CELL
+        if located:
+            lat_span, lon_span = self._search_spans(listing.latitude)
+        overlaps = {} # counterpart -> shared token weight
+        budget = self.max_candidates
+        for remaining_tokens, (_, postings) in zip(range(len(by_token), 0, -1), by_token):
+            share = budget // remaining_tokens
+            found = 0
+            newest_first = heapq.merge(*(reversed(posting.values()) for posting in postings),
+                                       key=attrgetter("created_at"), reverse=True)
+            for counterpart in islice(newest_first, share * SCAN_PER_CANDIDATE):
+                if found == share:
+                    break
+                if counterpart in overlaps:
+                    continue
+                if located and counterpart.cell is not NO_CELL:
+                    lon_offset = abs(counterpart.longitude - listing.longitude) % 360.0
+                    if (abs(counterpart.latitude - listing.latitude) > lat_span
+                            or min(lon_offset, 360.0 - lon_offset) > lon_span):
+                        continue
+                overlaps[counterpart] = _overlap(listing, counterpart)
+                found += 1
+            budget -= found
+
+        # Overlap and recency bound each score from above (the distance factor is >= 1),
+        # so distances are only computed until no remaining bound can enter the top k.
+        recency_scale_seconds = self.recency_scale_hours * 3600.0
+        offset = recency_scale_seconds + self._clock()
+        bounds = sorted(
+            ((overlap * recency_scale_seconds / (offset - counterpart.created_at), counterpart)
+             for counterpart, overlap in overlaps.items() if counterpart.owner != listing.owner),
+            key=itemgetter(0),
+            reverse=True,
+        )
+        located = listing.cell is not NO_CELL
+        top = [] # min-heap of (score, tiebreak, distance_km, counterpart)
+        for tiebreak, (bound, counterpart) in enumerate(bounds):
+            if len(top) == k and bound <= top[0][0]:
+                break
+            distance = None
+            score = bound
+            if located and counterpart.cell is not NO_CELL:
+                distance = haversine_km(listing.latitude, listing.longitude, counterpart.latitude, counterpart.longitude)
+                if distance > self.max_distance_km:
+                    continue
+                score = bound / (1.0 + distance / self.distance_scale_km)
+            entry = (score, -tiebreak, distance, counterpart)
+            if len(top) < k:
+                heapq.heappush(top, entry)
+            elif score > top[0][0]:
+                heapq.heapreplace(top, entry)
+        return [(score, distance, counterpart) for score, _, distance, counterpart in sorted(top, reverse=True)]
+
+    def _cell(self, latitude, longitude):
+        if latitude is None or longitude is None:
+            return NO_CELL
+        row = min(int((latitude + 90.0) / self.cell_degrees), self._lat_cells - 1)
+        col = int((longitude + 180.0) / self.cell_degrees) % self._lon_cells
+        return row, col
+
+    def _nearby_cells(self, latitude, longitude):
+        center = self._cell(latitude, longitude)
+        if center is NO_CELL:
+            return [NO_CELL]
+        row, col = center
+        _, lon_span = self._search_spans(latitude)
+        if lon_span >= 180.0:
+            cols = range(self._lon_cells)
+        else:
+            col_rings = int(math.ceil(lon_span / self.cell_degrees))
+            cols = {(col + offset) % self._lon_cells for offset in range(-col_rings, col_rings + 1)}
+        cells = {
+            (r, c)
+            for r in range(max(0, row - self._row_rings), min(self._lat_cells, row + self._row_rings + 1))
+            for c in cols
+        }
+        cells.add(NO_CELL)
+        return cells
+
+    def _search_spans(self, latitude):
+        """
+        (latitude, longitude) degrees that points within `max_distance_km` of `latitude`
+        can be away: the distance along the meridian, and the widest longitude offset
+        within it there (180 if the circle reaches a pole).
+        """
+        sin_angle = math.sin(min(self._search_angle, math.pi / 2))
+        cos_lat = math.cos(math.radians(latitude))
+        lon_span = 180.0 if sin_angle >= cos_lat else math.degrees(math.asin(sin_angle / cos_lat))
+        return math.degrees(self._search_angle), lon_span
+
+    # --- Notifications ---
+
+    def _notify(self, owner, listing_id):
+        inbox = self._notifications.pop(owner, None)
+        if inbox is None:
+            inbox = deque(maxlen=self.notifications_per_owner)
+        inbox.append(listing_id)
+        self._notifications[owner] = inbox
+        if len(self._notifications) > self.max_notified_owners:
+            self._notifications.popitem(last=False)
+
+    def take_notifications(self, owner):
+        """
+        Returns (and clears) the still-live listings that matched `owner`'s listings since the last call.
+        """
+        inbox = self._notifications.pop(owner, ())
+        return [self._listings[listing_id] for listing_id in inbox if listing_id in self._listings]
+
+    def stats(self):
+        return {"offers": self._counts[OFFER], "requests": self._counts[REQUEST], "postings": len(self._postings)}
+
+    def _collect(self):
+        for kind, count in self._counts.items():
+            metrics.gauge("localhive_service_exchange_listings", kind=kind).set(count)
+
+    def __len__(self):
+        return len(self._listings)
@@ -0,0 +1,260 @@
+"""
+Compact per-user session records for the Porter, with a hot and a cold tier.
+
+A UserSession is a `__slots__` object instead of a dict, so a resident session
+costs ~100 bytes plus its strings. Recently active sessions live in an LRU hot
+tier of at most `max_hot` entries; the rest live in a small SQLite table (the
+cold tier) and are loaded back on the user's next message.
+
+Writes are write-back: saving a session only marks it dirty, and dirty sessions
+reach SQLite in one transaction per `flush()` or when they leave the hot tier.
+Reading a session counts as seeing its user, so `get()` refreshes `last_seen`
+(and marks the session dirty) even when nothing else about it changed.
+`maintain()` runs the housekeeping from a timer: flush, move sessions idle for
+`idle_seconds` out of memory, and delete cold sessions past their retention
+(shorter for users who never finished onboarding, who are mostly one-time
+visitors). Memory and file size therefore stay bounded however many distinct
+senders show up.
+
+The geolocation request id is not persisted: pending lookups live in memory
+only, so after a restart such a user is simply asked for their locality again.
+"""
+import sqlite3
+import time
+from collections import OrderedDict
+
+from instrumentation import metrics
+
+ONBOARDED_STEP = 3
+
+
+class UserSession:
+    __slots__ = (
+        "onboarding_step",
+        "name",
+        "locality",
+        "latitude",
+        "longitude",
+        "geolocation_request_id",
+        "last_seen",
+    )
+
+    def __init__(self, onboarding_step=0, name=None, locality=None, latitude=None, longitude=None,
+                 geolocation_request_id=None, last_seen=0.0):
+        self.onboarding_step = onboarding_step
+        self.name = name
+        self.locality = locality
+        self.latitude = latitude
+        self.longitude = longitude
+        self.geolocation_request_id = geolocation_request_id
+        self.last_seen = last_seen
+
+    @classmethod
+    def from_legacy(cls, state):
+        """
+        Builds a session from the free-form dict the Porter used to keep in ctx.storage.
+        """
+        return cls(
+            onboarding_step=state.get("onboarding_step", 0),
+            name=state.get("name"),
+            locality=state.get("locality"),
+            latitude=state.get("latitude"),
+            longitude=state.get("longitude"),
+        )
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def __repr__(self):
+        return f"UserSession(step={self.onboarding_step}, name={self.name!r}, locality={self.locality!r})"
+
+
+class SessionStore:
+    """
+    LRU hot tier of UserSession objects over a SQLite cold tier.
+    """
+
+    def __init__(self, path=None, max_hot=50000, idle_seconds=1800.0, retention_seconds=90 * 24 * 3600.0,
+                 abandoned_retention_seconds=24 * 3600.0, sweep_interval_seconds=60.0, clock=time.time):
+        self.max_hot = max_hot
+        self.idle_seconds = idle_seconds
+        self.retention_seconds = retention_seconds
+        self.abandoned_retention_seconds = abandoned_retention_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._clock = clock
+        self._hot = OrderedDict() # address -> UserSession, least recently used first
+        self._dirty = set()
+        self._last_sweep = clock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "address TEXT PRIMARY KEY, step INTEGER NOT NULL, name TEXT, locality TEXT,"
+            " latitude REAL, longitude REAL, last_seen REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self._db.commit()
+        self.loads = 0
+        self.evictions = 0
+        self.expired = 0
+        self._load_timer = metrics.timer("localhive_storage_op_seconds", store="porter_sessions", op="load")
+        self._flush_timer = metrics.timer("localhive_storage_op_seconds", store="porter_sessions", op="flush")
+
+    # --- Sessions ---
+
+    def get(self, address):
+        """
+        Returns the session for `address` from either tier, or None if there is none,
+        and records that its user was just seen.
+        """
+        session = self._hot.get(address)
+        if session is not None:
+            self._hot.move_to_end(address)
+            self._touch(address, session)
+            return session
+        with self._load_timer:
+            row = self._db.execute(
+                "SELECT step, name, locality, latitude, longitude, last_seen FROM sessions WHERE address = ?",
+                (address,),
+            ).fetchone()
+        if row is None:
+            return None
+        self.loads += 1
+        session = UserSession(
+            onboarding_step=row[0], name=row[1], locality=row[2], latitude=row[3], longitude=row[4], last_seen=row[5]
+        )
+        self._put_hot(address, session)
+        self._touch(address, session)
+        return session
+
+    def create(self, address, session=None):
+        session = session or UserSession()
+        session.last_seen = self._clock()
+        self._put_hot(address, session)
+        self._dirty.add(address)
+        return session
+
+    def save(self, address, session):
+        """
+        Records that `session` changed (and that its user was just seen).
+        """
+        session.last_seen = self._clock()
+        if address not in self._hot:
+            self._put_hot(address, session)
+        self._dirty.add(address)
+
+    def _touch(self, address, session):
+        session.last_seen = self._clock()
+        self._dirty.add(address)
+
+    def remove(self, address):
+        self._hot.pop(address, None)
+        self._dirty.discard(address)
+        self._db.execute("DELETE FROM sessions WHERE address = ?", (address,))
+        self._db.commit()
+
+    def addresses(self):
+        """
+        Every known address, hot or cold.
+        """
+        seen = set(self._hot)
+        yield from list(self._hot)
+        for (address,) in self._db.execute("SELECT address FROM sessions").fetchall():
+            if address not in seen:
+                yield address
+
+    def _put_hot(self, address, session):
+        self._hot[address] = session
+        self._hot.move_to_end(address)
+        while len(self._hot) > self.max_hot:
+            evicted_address, evicted = self._hot.popitem(last=False)
+            if evicted_address in self._dirty:
+                self._write([(evicted_address, evicted)])
+                self._dirty.discard(evicted_address)
+            self.evictions += 1
+
+    # --- Persistence ---
+
+    def flush(self):
+        """
+        Writes every dirty hot session to the cold tier in one transaction.
+        """
+        if not self._dirty:
+            return 0
+        sessions = [(address, self._hot[address]) for address in self._dirty if address in self._hot]
+        with self._flush_timer:
+            self._write(sessions)
+        self._dirty.clear()
+        return len(sessions)
+
+    def _write(self, sessions):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO sessions (address, step, name, locality, latitude, longitude, last_seen)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (address, s.onboarding_step, s.name, s.locality, s.latitude, s.longitude, s.last_seen)
+                for address, s in sessions
+            ],
+        )
+        self._db.commit()
+
+    def evict_idle(self, now=None):
+        """
+        Moves sessions idle for `idle_seconds` out of memory (their cold copy stays).
+        """
+        now = self._clock() if now is None else now
+        idle = [address for address, session in self._hot.items() if now - session.last_seen >= self.idle_seconds]
+        dirty = [(address, self._hot[address]) for address in idle if address in self._dirty]
+        if dirty:
+            self._write(dirty)
+        for address in idle:
+            del self._hot[address]
+            self._dirty.discard(address)
+        self.evictions += len(idle)
+        return len(idle)
+
+    def purge_expired(self, now=None):
+        """
+        Deletes cold sessions past their retention.
+        """
+        now = self._clock() if now is None else now
+        cursor = self._db.execute(
+            "DELETE FROM sessions WHERE last_seen < ? OR (step < ? AND last_seen < ?)",
+            (now - self.retention_seconds, ONBOARDED_STEP, now - self.abandoned_retention_seconds),
+        )
+        self._db.commit()
+        self.expired += cursor.rowcount
+        return cursor.rowcount
+
+    def maintain(self):
+        """
+        Periodic housekeeping: flush now, and every `sweep_interval_seconds` also
+        evict idle sessions and purge expired ones.
+        """
+        self.flush()
+        now = self._clock()
+        if now - self._last_sweep >= self.sweep_interval_seconds:
+            self._last_sweep = now
+            self.evict_idle(now)
+            self.purge_expired(now)
+
+    def stats(self):
+        return {
+            "hot": len(self._hot),
+            "dirty": len(self._dirty),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self._hot)
@@ -0,0 +1,457 @@
+"""
+Sharded Porter: a front dispatcher agent in front of N Porter worker processes.
+
+The front is the public PorterAgent (same seed, same address). It does no
+onboarding, routing or LLM work itself; it consistent-hashes each user's address
+to a shard and hands the message to that shard's worker process. Each worker runs
+the unchanged Porter handlers from porter_agent.py on its own event loop, with
+its own slice of user sessions in a session store, and sends its outgoing
+messages back to the front, which puts them on the wire as the Porter.
+
+Replies that belong to a shard rather than a user are routed back to the shard
+that is waiting on them:
+  - specialist answers, by the delegated msg_id they carry as "in_reply_to",
+  - geolocation responses, by the session the request was sent on.
+
+Adding a shard (`await pool.add_shard()`) rebalances: dispatch pauses, existing
+shards hand over the users whose hash now falls on the new shard, and the front
+switches to the new ring once every shard has finished. Lookups a moved user had
+in flight on its old shard are lost; the Porter asks them to try again.
+
+Run from the agents/ directory:
+    PORTER_SHARDS=4 python sharded_porter.py
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from uuid import uuid4
+
+from consistent_hash import HashRing
+from correlation import CorrelationTable
+from session_store import UserSession
+from write_behind import WriteBehindStore
+
+# --- CONFIGURATION ---
+PORTER_SHARDS = int(os.getenv("PORTER_SHARDS", os.cpu_count() or 1))
+HASH_RING_VNODES = 128
+# Each shard keeps its user sessions in SHARD_SESSION_PATH, and anything else the
+# handlers put in ctx.storage in <path>.snapshot.jsonl / <path>.log.jsonl
+SHARD_SESSION_PATH = "porter_shard_{}_sessions.sqlite3"
+# Each shard's LLM answer and geocode caches get their own SQLite files too: a cache
+# holds its write transaction open between batched commits, so shards sharing a file
+# would block each other ("database is locked")
+SHARD_LLM_CACHE_PATH = "porter_shard_{}_llm_cache.sqlite3"
+SHARD_GEOCODE_CACHE_PATH = "porter_shard_{}_geocode_cache.sqlite3"
+SHARD_STORAGE_PATH = "porter_shard_{}"
+SHARD_FLUSH_INTERVAL_SECONDS = 2.0
+# With PORTER_TRAFFIC_LOG set, each shard records to its own file next to it
+SHARD_TRAFFIC_LOG_PATH = "{}.shard{}"
+
+
+class KeyedSequencer:
+    """
+    Runs coroutines one after another per key, and concurrently across keys.
+    """
+
+    def __init__(self):
+        self._tails = {} # key -> last task submitted for it
+
+    def submit(self, key, coro):
+        previous = self._tails.get(key)
+        task = asyncio.get_running_loop().create_task(self._after(previous, coro))
+        self._tails[key] = task
+        task.add_done_callback(lambda done: self._tails.pop(key, None) if self._tails.get(key) is done else None)
+        return task
+
+    @staticmethod
+    async def _after(previous, coro):
+        if previous is not None:
+            await asyncio.wait({previous}) # Wait for it whether it succeeded or not
+        return await coro
+
+    async def drain(self):
+        while self._tails:
+            await asyncio.wait(set(self._tails.values()))
+
+    def __len__(self):
+        return len(self._tails)
+
+
+# --- WORKER (runs in each shard process) ---
+
+class ShardContext:
+    """
+    The part of uAgents' Context the Porter handlers use, backed by the shard.
+    """
+
+    def __init__(self, worker, request_id, session):
+        self._worker = worker
+        self._request_id = request_id
+        self.session = session
+        self.storage = worker.storage
+        self.logger = worker.logger
+
+    async def send(self, destination, message):
+        self._worker.emit_send(self._request_id, destination, message)
+
+
+class ShardWorker:
+    def __init__(self, shard_id, inbox, outbox, setup=None):
+        self.shard_id = shard_id
+        self._inbox = inbox
+        self._outbox = outbox
+        self._setup = setup
+        self._digests = {}
+        self.logger = logging.getLogger(f"PorterShard{shard_id}")
+
+    def run(self):
+        logging.basicConfig(level=logging.INFO, format="%(levelname)s: [%(name)s]: %(message)s")
+        # Only the front serves metrics; workers would all fight over the same port
+        os.environ.pop("LOCALHIVE_METRICS_PORT", None)
+        asyncio.run(self._main())
+
+    async def _main(self):
+        # Imported here so every worker builds its own LLM client, caches and pending tables
+        from uagents import Model
+        from uagents_core.contrib.protocols.chat import ChatMessage
+        from uagents.protocols.geolocation import GeolocationResponse
+
+        os.environ["PORTER_SESSION_STORE"] = SHARD_SESSION_PATH.format(self.shard_id)
+        os.environ["PORTER_LLM_CACHE"] = SHARD_LLM_CACHE_PATH.format(self.shard_id)
+        os.environ["PORTER_GEOCODE_CACHE"] = SHARD_GEOCODE_CACHE_PATH.format(self.shard_id)
+        if os.getenv("PORTER_TRAFFIC_LOG"):
+            # One traffic log per shard; the replay tool merges them by time
+            os.environ["PORTER_TRAFFIC_LOG"] = SHARD_TRAFFIC_LOG_PATH.format(os.environ["PORTER_TRAFFIC_LOG"], self.shard_id)
+        import porter_agent as porter
+
+        if self._setup is not None:
+            self._setup(porter)
+        self._sessions = porter.session_store
+        self._traffic_recorder = porter.traffic_recorder
+        self._pending_delegations = porter.pending_delegations
+        self._caches = (porter.llm_response_cache, porter.geocode_cache)
+        self._llm_client = porter.llm_client
+        self._build_schema_digest = Model.build_schema_digest
+        self._models = {"ChatMessage": ChatMessage, "GeolocationResponse": GeolocationResponse}
+        self._handlers = {
+            "ChatMessage": porter.handle_user_message,
+            "GeolocationResponse": porter.handle_geolocation_response,
+        }
+        self.storage = WriteBehindStore(
+            SHARD_STORAGE_PATH.format(self.shard_id),
+            flush_interval_seconds=SHARD_FLUSH_INTERVAL_SECONDS,
+        )
+        self._sequencer = KeyedSequencer()
+
+        loop = asyncio.get_running_loop()
+        commands = asyncio.Queue()
+        threading.Thread(
+            target=_pump, args=(self._inbox, loop, commands.put_nowait), name="shard-inbox", daemon=True
+        ).start()
+        flusher = loop.create_task(self._flush_periodically())
+        self._outbox.put(("started", self.shard_id))
+
+        while True:
+            command = await commands.get()
+            kind = command[0]
+            if kind == "message":
+                _, request_id, sender, session, model_name, payload = command
+                message = self._models[model_name].parse_raw(payload)
+                handler = self._handlers[model_name]
+                self._sequencer.submit(sender, self._handle(handler, request_id, sender, session, message))
+            elif kind == "import":
+                self._sessions.create(command[1], UserSession.from_dict(command[2]))
+            elif kind == "export":
+                await self._export(HashRing(command[1], vnodes=command[2]))
+            elif kind == "stop":
+                break
+
+        await self._sequencer.drain()
+        flusher.cancel()
+        self._sessions.close()
+        for cache in self._caches:
+            cache.close()
+        self.storage.close()
+        if self._traffic_recorder is not None:
+            self._traffic_recorder.close()
+        await self._llm_client.aclose()
+        self._outbox.put(("stopped", self.shard_id))
+
+    async def _handle(self, handler, request_id, sender, session, message):
+        try:
+            await handler(ShardContext(self, request_id, session), sender, message)
+        except Exception as e:
+            self.logger.exception("Handler %s failed: %s", handler.__name__, e)
+        finally:
+            self.storage.maybe_flush()
+            self._outbox.put(("done", request_id))
+
+    async def _export(self, ring):
+        """
+        Hands every user that `ring` places on another shard over to the front.
+        """
+        moved = 0
+        for address in list(self._sessions.addresses()):
+            if ring.node_for(address) != self.shard_id:
+                self._outbox.put(("migrate", address, self._sessions.get(address).to_dict()))
+                self._sessions.remove(address)
+                moved += 1
+        # Users stored before session records still sit in ctx.storage as dicts
+        for key, value in list(self.storage.items()):
+            if ring.node_for(key) != self.shard_id:
+                self._outbox.put(("migrate", key, UserSession.from_legacy(value).to_dict()))
+                self.storage.remove(key)
+                moved += 1
+        self.storage.flush()
+        self.logger.info("Handed over %s users for rebalancing.", moved)
+        self._outbox.put(("exported", self.shard_id))
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(SHARD_FLUSH_INTERVAL_SECONDS)
+            self._sessions.maintain()
+            for cache in self._caches:
+                cache.maintain()
+            self._pending_delegations.purge()
+            self.storage.maybe_flush()
+            if self._traffic_recorder is not None:
+                self._traffic_recorder.maybe_flush()
+
+    def emit_send(self, request_id, destination, message):
+        model = type(message)
+        digest = self._digests.get(model)
+        if digest is None:
+            digest = self._digests[model] = self._build_schema_digest(model)
+        # The front relays the JSON as-is; msg_id lets it route a specialist's answer back here
+        correlation = str(message.msg_id) if hasattr(message, "msg_id") else None
+        self._outbox.put(("send", request_id, destination, model.__name__, digest, message.json(), correlation))
+
+
+def _run_worker(shard_id, inbox, outbox, setup):
+    ShardWorker(shard_id, inbox, outbox, setup).run()
+
+
+def _pump(queue, loop, callback):
+    """
+    Moves items from a multiprocessing queue onto the event loop, until a None arrives.
+    """
+    try:
+        for item in iter(queue.get, None):
+            loop.call_soon_threadsafe(callback, item)
+    except (EOFError, OSError, RuntimeError):
+        pass # The other side or the loop went away during shutdown
+
+
+# --- FRONT ---
+
+class PorterShardPool:
+    """
+    Owns the shard processes, the hash ring and the request/result traffic between them.
+
+    `on_send(token, shard_id, destination, kind, schema_digest, payload, correlation)`
+    is awaited for every message a shard sends, in order per request; `token` is
+    whatever was passed to `dispatch` (the front passes its Context), or
+    `default_token` for sends a shard makes outside any request, such as a
+    fan-out answer sent at its deadline.
+    """
+
+    def __init__(self, num_shards, on_send, on_done=None, setup=None, vnodes=HASH_RING_VNODES):
+        self.num_shards = num_shards
+        self.vnodes = vnodes
+        self.ring = HashRing(vnodes=vnodes)
+        self.migrated = 0
+        self.last_rebalance_pause = None # seconds dispatch was paused by the last add_shard
+        self.default_token = None
+        self._on_send = on_send
+        self._on_done = on_done
+        self._setup = setup
+        self._mp = multiprocessing.get_context("spawn")
+        self._workers = {} # shard_id -> (process, inbox, outbox)
+        self._tokens = {} # request_id -> token
+        self._sequencer = KeyedSequencer()
+        self._loop = None
+        self._started = {}
+        self._paused = None # list of buffered dispatches while rebalancing
+        self._next_ring = None
+        self._exports_waiting = set()
+        self._rebalanced = None
+        self._stopped = {}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await asyncio.gather(*(self._start_worker(shard_id) for shard_id in range(self.num_shards)))
+        for shard_id in range(self.num_shards):
+            self.ring.add(shard_id)
+
+    async def _start_worker(self, shard_id):
+        inbox = self._mp.Queue()
+        outbox = self._mp.Queue()
+        process = self._mp.Process(
+            target=_run_worker, args=(shard_id, inbox, outbox, self._setup), name=f"porter-shard-{shard_id}", daemon=True
+        )
+        process.start()
+        self._workers[shard_id] = (process, inbox, outbox)
+        self._started[shard_id] = self._loop.create_future()
+        threading.Thread(
+            target=_pump,
+            args=(outbox, self._loop, lambda item, shard_id=shard_id: self._on_output(shard_id, item)),
+            name=f"shard-{shard_id}-outbox",
+            daemon=True,
+        ).start()
+        await self._started[shard_id]
+
+    def dispatch(self, sender, session, message, token, shard_id=None):
+        """
+        Sends `message` to `shard_id`, or to the shard owning `sender` if None.
+        """
+        if self._paused is not None:
+            self._paused.append((sender, session, message, token, shard_id))
+            return
+        if shard_id is None:
+            shard_id = self.ring.node_for(sender)
+        request_id = uuid4().hex
+        self._tokens[request_id] = token
+        self._workers[shard_id][1].put(
+            ("message", request_id, sender, str(session), type(message).__name__, message.json())
+        )
+
+    def _on_output(self, shard_id, item):
+        kind = item[0]
+        if kind == "send":
+            _, request_id, destination, model_name, digest, payload, correlation = item
+            token = self._tokens.get(request_id, self.default_token)
+            self._sequencer.submit(request_id, self._relay(
+                token, shard_id, destination, model_name, digest, payload, correlation
+            ))
+        elif kind == "done":
+            self._sequencer.submit(item[1], self._finish(item[1]))
+        elif kind == "migrate":
+            _, key, value = item
+            self._workers[self._next_ring.node_for(key)][1].put(("import", key, value))
+            self.migrated += 1
+        elif kind == "exported":
+            self._exports_waiting.discard(item[1])
+            if not self._exports_waiting:
+                self._rebalanced.set_result(None)
+        elif kind == "started":
+            self._started[item[1]].set_result(None)
+        elif kind == "stopped":
+            self._stopped[item[1]].set_result(None)
+
+    async def _relay(self, token, shard_id, destination, model_name, digest, payload, correlation):
+        try:
+            await self._on_send(token, shard_id, destination, model_name, digest, payload, correlation)
+        except Exception as e:
+            logging.getLogger("PorterFront").exception("Relaying %s to %s failed: %s", model_name, destination, e)
+
+    async def _finish(self, request_id):
+        token = self._tokens.pop(request_id, None)
+        if self._on_done is not None:
+            self._on_done(token)
+
+    async def add_shard(self):
+        """
+        Starts one more shard and moves the users it now owns onto it.
+        """
+        shard_id = max(self._workers) + 1
+        await self._start_worker(shard_id)
+        paused_at = time.perf_counter()
+        self._paused = []
+        self._next_ring = HashRing(self.ring.nodes + [shard_id], vnodes=self.vnodes)
+        self._exports_waiting = set(self.ring.nodes)
+        self._rebalanced = self._loop.create_future()
+        for old_shard in self.ring.nodes:
+            self._workers[old_shard][1].put(("export", self._next_ring.nodes, self.vnodes))
+        await self._rebalanced
+
+        # Imports were queued on the new shard before any of these messages, so
+        # moved users' state is in place when their next message arrives.
+        self.ring, self._next_ring = self._next_ring, None
+        buffered, self._paused = self._paused, None
+        for args in buffered:
+            self.dispatch(*args)
+        self.last_rebalance_pause = time.perf_counter() - paused_at
+        self.num_shards += 1
+        return shard_id
+
+    async def close(self):
+        await self._sequencer.drain()
+        for shard_id, (process, inbox, _) in self._workers.items():
+            self._stopped[shard_id] = self._loop.create_future()
+            inbox.put(("stop",))
+        await asyncio.gather(*self._stopped.values())
+        for process, inbox, outbox in self._workers.values():
+            outbox.put(None) # Stops the pump thread
+            process.join()
+
+
+def build_front_agent(num_shards=PORTER_SHARDS, setup=None):
+    """
+    Builds the public PorterAgent, which routes incoming messages to shards and
+    relays their sends. Returns (agent, pool); the shards start with the agent.
+    """
+    from uagents import Agent, Context, Protocol
+    from uagents_core.contrib.protocols.chat import ChatAcknowledgement, ChatMessage, chat_protocol_spec
+    from uagents.protocols.geolocation import GeolocationResponse
+
+    import porter_agent as porter
+    from instrumentation import export_metrics, instrumented
+
+    front_agent = Agent(name="PorterAgent", seed=porter.PORTER_SEED)
+    export_metrics(front_agent)
+    front_protocol = Protocol(spec=chat_protocol_spec)
+
+    # Delegated msg_id -> shard, and geolocation session -> shard
+    delegations = CorrelationTable(ttl_seconds=porter.DELEGATION_TIMEOUT_SECONDS, max_size=porter.MAX_PENDING_DELEGATIONS)
+    geolocations = CorrelationTable(ttl_seconds=porter.GEOLOCATION_TIMEOUT_SECONDS, max_size=porter.MAX_PENDING_GEOLOCATIONS)
+
+    async def relay(ctx, shard_id, destination, model_name, digest, payload, correlation):
+        if model_name == "ChatMessage" and destination in porter._specialist_addresses():
+            delegations.add(correlation, shard_id)
+        elif model_name == "GeolocationRequest":
+            geolocations.add(str(ctx.session), shard_id)
+        await ctx.send_raw(destination, digest, payload)
+
+    pool = PorterShardPool(num_shards, on_send=relay, setup=setup)
+
+    @front_protocol.on_message(ChatMessage)
+    @instrumented("PorterFront")
+    async def dispatch_chat_message(ctx: Context, sender: str, msg: ChatMessage):
+        in_reply_to = porter._get_in_reply_to(msg)
+        shard_id = delegations.pop(in_reply_to) if in_reply_to is not None else None
+        pool.dispatch(sender, ctx.session, msg, ctx, shard_id=shard_id)
+
+    @front_protocol.on_message(ChatAcknowledgement)
+    @instrumented("PorterFront")
+    async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
+        ctx.logger.info("Received acknowledgement from %s for message ID: %s", sender, msg.acknowledged_msg_id)
+
+    @front_agent.on_message(model=GeolocationResponse)
+    @instrumented("PorterFront")
+    async def dispatch_geolocation_response(ctx: Context, sender: str, msg: GeolocationResponse):
+        shard_id = geolocations.pop(str(ctx.session))
+        if shard_id is None:
+            ctx.logger.warning("Received GeolocationResponse for unknown or expired request %s; dropping it.", ctx.session)
+            return
+        pool.dispatch(sender, ctx.session, msg, ctx, shard_id=shard_id)
+
+    @front_agent.on_event("startup")
+    async def start_shards(ctx: Context):
+        pool.default_token = ctx
+        await pool.start()
+        ctx.logger.info("Started %s Porter shards.", pool.num_shards)
+
+    @front_agent.on_event("shutdown")
+    async def stop_shards(ctx: Context):
+        await pool.close()
+
+    front_agent.include(front_protocol, publish_manifest=True)
+    return front_agent, pool
+
+
+if __name__ == "__main__":
+    front_agent, _ = build_front_agent()
+    front_agent.run()
@@ -0,0 +1,165 @@
+"""
+Grid-based spatial index over latitude/longitude points.
+
+Points are bucketed into fixed-size cells of `cell_degrees` on each side. A
+radius query only visits the cells overlapping the query's bounding box, and a
+k-nearest query visits rings of cells around the query point until no unvisited
+cell can hold anything closer. Inserts, moves and removals are O(1), so the
+index can be kept current on every profile write.
+
+Query cost depends on how many points share the visited cells, so pick
+`cell_degrees` close to the typical query radius (0.05 degrees is ~5.5 km).
+"""
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+# Length of one degree of a great circle on the same sphere haversine_km uses (~111.195 km)
+KM_PER_DEGREE = math.radians(EARTH_RADIUS_KM)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points in kilometres.
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoGridIndex:
+    """
+    Maps keys to (latitude, longitude) and answers radius and k-nearest queries.
+    """
+
+    def __init__(self, cell_degrees=0.05):
+        self.cell_degrees = cell_degrees
+        self._lon_cells = int(math.ceil(360.0 / cell_degrees))
+        self._lat_cells = int(math.ceil(180.0 / cell_degrees))
+        self._cells = {} # (row, col) -> {key: (lat, lon)}
+        self._points = {} # key -> (lat, lon)
+
+    def cell_of(self, latitude, longitude):
+        row = min(int((latitude + 90.0) / self.cell_degrees), self._lat_cells - 1)
+        col = int((longitude + 180.0) / self.cell_degrees) % self._lon_cells
+        return row, col
+
+    def insert(self, key, latitude, longitude):
+        """
+        Adds `key` at the given position, moving it if it is already indexed.
+        """
+        self.remove(key)
+        self._points[key] = (latitude, longitude)
+        self._cells.setdefault(self.cell_of(latitude, longitude), {})[key] = (latitude, longitude)
+
+    def remove(self, key):
+        position = self._points.pop(key, None)
+        if position is None:
+            return False
+        cell = self.cell_of(*position)
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+        return True
+
+    def get(self, key):
+        return self._points.get(key)
+
+    def within_radius(self, latitude, longitude, radius_km, limit=None):
+        """
+        Returns [(distance_km, key)] for every point within `radius_km`, nearest first.
+        """
+        # Exact bounding box of the spherical cap: its latitude extent, and the widest
+        # longitude offset any point of it reaches (all of them if it contains a pole)
+        angle = radius_km / EARTH_RADIUS_KM
+        lat_span = math.degrees(angle)
+        sin_angle = math.sin(min(angle, math.pi / 2))
+        cos_lat = math.cos(math.radians(latitude))
+        lon_span = 180.0 if sin_angle >= cos_lat else math.degrees(math.asin(sin_angle / cos_lat))
+
+        row_min, _ = self.cell_of(max(-90.0, latitude - lat_span), longitude)
+        row_max, _ = self.cell_of(min(90.0, latitude + lat_span), longitude)
+        col_radius = int(math.ceil(lon_span / self.cell_degrees))
+        _, center_col = self.cell_of(latitude, longitude)
+        if 2 * col_radius + 1 >= self._lon_cells:
+            cols = range(self._lon_cells)
+        else:
+            cols = [(center_col + offset) % self._lon_cells for offset in range(-col_radius, col_radius + 1)]
+
+        results = []
+        for row in range(row_min, row_max + 1):
+            for col in cols:
+                bucket = self._cells.get((row, col))
+                if not bucket:
+                    continue
+                for key, (lat, lon) in bucket.items():
+                    distance = haversine_km(latitude, longitude, lat, lon)
+                    if distance <= radius_km:
+                        results.append((distance, key))
+        results.sort()
+        return results[:limit] if limit is not None else results
+
+    def nearest(self, latitude, longitude, k):
+        """
+        Returns [(distance_km, key)] for the `k` points nearest to the query, nearest first.
+        """
+        if k <= 0 or not self._points:
+            return []
+        center_row, center_col = self.cell_of(latitude, longitude)
+        heap = [] # max-heap of the best k as (-distance, key)
+        max_ring = max(self._lat_cells, self._lon_cells // 2)
+        for ring in range(max_ring + 1):
+            for row, col in self._ring_cells(center_row, center_col, ring):
+                bucket = self._cells.get((row, col))
+                if not bucket:
+                    continue
+                for key, (lat, lon) in bucket.items():
+                    distance = haversine_km(latitude, longitude, lat, lon)
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-distance, key))
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, (-distance, key))
+            if len(heap) == k and -heap[0][0] <= self._ring_reach_km(latitude, ring):
+                break
+            if len(heap) == len(self._points):
+                break
+        return sorted((-negative, key) for negative, key in heap)
+
+    def _ring_cells(self, center_row, center_col, ring):
+        if ring == 0:
+            yield center_row, center_col
+            return
+        # Near the poles a ring can wrap all the way around in longitude; dedupe so
+        # no cell is visited twice.
+        cols = dict.fromkeys((center_col + offset) % self._lon_cells for offset in range(-ring, ring + 1))
+        for row in (center_row - ring, center_row + ring):
+            if 0 <= row < self._lat_cells:
+                for col in cols:
+                    yield row, col
+        if 2 * ring - 1 >= self._lon_cells:
+            return # The previous ring already covered every column of the middle rows
+        side_cols = dict.fromkeys(((center_col - ring) % self._lon_cells, (center_col + ring) % self._lon_cells))
+        for row in range(max(0, center_row - ring + 1), min(self._lat_cells, center_row + ring)):
+            for col in side_cols:
+                yield row, col
+
+    def _ring_reach_km(self, latitude, ring):
+        """
+        Distance from the query that is fully covered once rings 0..`ring` are visited.
+        Unvisited points are at least `ring` cells away in latitude or in longitude; the
+        nearest point `reach` degrees of longitude away lies on that meridian, at an
+        angle of asin(cos(latitude) * sin(reach)).
+        """
+        reach = math.radians(ring * self.cell_degrees)
+        lon_reach = math.asin(min(1.0, math.cos(math.radians(latitude)) * math.sin(min(reach, math.pi / 2))))
+        return EARTH_RADIUS_KM * min(reach, lon_reach)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
@@ -5,34 +5,65 @@ from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
     ChatMessage,
+    MetadataContent,
     TextContent,
     chat_protocol_spec,
 )
 
+from instrumentation import export_metrics, instrumented
+from intent_router import SPONSORSHIP_FINANCE_INTENTS, IntentRouter
+try:
+    from budget_simulator import BudgetSimulator, parse_budget_request
+except ImportError: # NumPy is not installed; give advice only
+    BudgetSimulator = None
+
+# --- CONFIGURATION ---
+# Monte Carlo scenarios per budget; 100k keep percentiles stable to well under 1%
+SIMULATION_SCENARIOS = 100000
+# The quoted break-even ticket price covers the costs in this share of scenarios
+BREAK_EVEN_CONFIDENCE = 0.9
+
+BUDGET_INPUT_EXAMPLE = "venue 5000-8000, food 200-300 per person, sound 3k; 80-150 people; ticket 100; sponsor Sharma Traders 10000 at 70%"
+
 # --- AGENT SETUP ---
 sponsorship_finance_agent = Agent(name="SponsorshipFinanceAgent", seed="finance_recovery_phrase")
+export_metrics(sponsorship_finance_agent)
 chat_protocol = Protocol(spec=chat_protocol_spec)
+finance_router = IntentRouter(SPONSORSHIP_FINANCE_INTENTS)
+# Budget scenario engine; results are memoized, so a repeated budget is answered from memory
+budget_simulator = BudgetSimulator(
+    scenarios=SIMULATION_SCENARIOS,
+    break_even_confidence=BREAK_EVEN_CONFIDENCE,
+) if BudgetSimulator is not None else None
 
 # --- MESSAGE HANDLERS ---
 
 @chat_protocol.on_message(ChatMessage)
+@instrumented("SponsorshipFinanceAgent")
 async def handle_finance_request(ctx: Context, sender: str, msg: ChatMessage):
     """
-    Handles finance and sponsorship requests and provides hardcoded advice.
+    Handles finance and sponsorship requests: simulates budgets given with numbers,
+    and gives general advice otherwise.
     """
-    ctx.logger.info(f"SponsorshipFinanceAgent received request from {sender}: {msg.content}")
+    ctx.logger.info("SponsorshipFinanceAgent received request from %s: %s", sender, msg.content)
 
     user_query = ''
     for item in msg.content:
         if isinstance(item, TextContent):
             user_query += item.text.lower()
 
-    # Hardcoded responses based on simple keyword matching
-    if "sponsorship" in user_query or "sponsor" in user_query:
+    # A budget with clear costs gets simulated, whatever else the query mentions
+    scenario = parse_budget_request(user_query) if budget_simulator is not None else None
+    intent = finance_router.route(user_query)
+    if scenario is not None:
+        response = _describe_simulation(scenario, budget_simulator.simulate(scenario))
+    elif intent == "sponsorship":
         response = "To secure sponsorship for your event in Bhopal, consider: 1. Local businesses (restaurants, shops). 2. Community banks/credit unions. 3. Local political representatives. Prepare a clear proposal outlining benefits for sponsors."
-    elif "budget" in user_query or "cost" in user_query:
+    elif intent == "budget":
         response = "For event budgeting: 1. Estimate all expenses (venue, food, marketing, equipment). 2. Add a 10-15% contingency. 3. Track all income sources (tickets, sponsorships). Focus on maximizing value for money."
-    elif "fundraising" in user_query:
+        if budget_simulator is not None:
+            response += f" Send me your cost ranges, expected attendance and sponsor pledges (e.g., '{BUDGET_INPUT_EXAMPLE}') and I'll work out your chance of a shortfall and a break-even ticket price."
+    elif intent == "fundraising":
         response = "Fundraising ideas for community projects: 1. Online crowdfunding. 2. Local bake sales or car washes. 3. Partnership with local non-profits. 4. Small donation drives at local gatherings."
     else:
         response = "I can offer basic financial and sponsorship advice. What specific area are you interested in (e.g., 'getting sponsors', 'creating a budget', 'fundraising')?"
@@ -42,13 +73,49 @@ async def handle_finance_request(ctx: Context, sender: str, msg: ChatMessage):
         ChatMessage(
             timestamp=datetime.utcnow(),
             msg_id=uuid4(),
-            content=[TextContent(type="text", text=response)]
+            content=[
+                TextContent(type="text", text=response),
+                # Lets the Porter route this answer back to the user who asked
+                MetadataContent(type="metadata", metadata={"in_reply_to": str(msg.msg_id)}),
+            ]
         )
     )
-    ctx.logger.info(f"SponsorshipFinanceAgent sent response to {sender}.")
+    ctx.logger.info("SponsorshipFinanceAgent sent response to %s.", sender)
 
 @chat_protocol.on_message(ChatAcknowledgement)
+@instrumented("SponsorshipFinanceAgent")
 async def handle_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
-    ctx.logger.info(f"Received acknowledgement from {sender} for message ID: {msg.acknowledged_msg_id}")
+    ctx.logger.info("Received acknowledgement from %s for message ID: %s", sender, msg.acknowledged_msg_id)
+
+# --- BUDGET SIMULATION ---
+
+def _describe_simulation(scenario, result):
+    net = result.net
+    lines = [f"Budget simulation over {result.scenarios:,} scenarios:"]
+    lines.append(f"- Costs: about {_money(result.cost[50])} ({_money(result.cost[5])} to {_money(result.cost[95])}, 90% range)")
+    if result.income[95] > 0:
+        lines.append(f"- Income: about {_money(result.income[50])} ({_money(result.income[5])} to {_money(result.income[95])})")
+    outcome = "surplus" if net[50] >= 0 else "shortfall"
+    lines.append(f"- Typical result: a {outcome} of {_money(abs(net[50]))}; bad case (5th percentile) {_money(net[5])}, good case (95th) {_money(net[95])}")
+    if result.shortfall_probability > 0:
+        chance = "under 1%" if result.shortfall_probability < 0.01 else f"{result.shortfall_probability:.0%}"
+        lines.append(f"- Chance of a shortfall: {chance}, averaging {_money(result.expected_shortfall)} when it happens")
+    else:
+        lines.append("- No shortfall in any scenario")
+    if scenario.attendance[1] > 0:
+        confidence = f"{result.break_even_confidence:.0%}"
+        if result.break_even_price == float("inf"):
+            lines.append(f"- Tickets alone can't cover the costs in {confidence} of scenarios; look for more sponsors")
+        else:
+            lines.append(f"- Break-even ticket price: {_money(result.break_even_price)} covers the costs in {confidence} of scenarios "
+                         f"({_money(result.median_break_even_price)} in half of them)")
+    else:
+        lines.append("- Add expected attendance (e.g., '80-150 people') to get a break-even ticket price")
+    if net[5] < 0 <= net[50]:
+        lines.append(f"Keep a contingency of about {_money(-net[5])} to cover the bad case.")
+    return "\n".join(lines)
+
+def _money(amount):
+    return f"-₹{-amount:,.0f}" if amount < 0 else f"₹{amount:,.0f}"
 
 sponsorship_finance_agent.include(chat_protocol, publish_manifest=True)
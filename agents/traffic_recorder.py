@@ -0,0 +1,135 @@
+"""
+Opt-in recording of the traffic the Porter receives, for replaying it locally.
+
+TrafficRecorder appends one JSON record per inbound message to a gzip-compressed
+JSON Lines log:
+
+  {"t": 1760000000.123, "kind": "message", "from": "u-3f9c...", "text": "..."}
+  {"t": ..., "kind": "reply", "from": "LocalResourceLogisticsAgent", "user": "u-3f9c...", "text": "..."}
+  {"t": ..., "kind": "geolocation", "locality": "bhopal", "latitude": 23.25, "longitude": 77.41}
+
+  - "message": a user's ChatMessage, as handle_user_message saw it,
+  - "reply": a specialist's answer to a delegation, with the user it was for
+    ("from"/"user" are null for late or orphaned replies),
+  - "geolocation": a GeolocationResponse, with the locality that was looked up.
+
+User addresses are replaced by an HMAC of the address, so one user's messages stay
+linked without the log naming them. With the same key, the same user gets the same
+id across restarts; without one a random key is drawn per process. Message text
+is kept verbatim (replay needs it), so treat the log like the session store.
+
+Records are buffered in memory and appended in batches, each batch as its own gzip
+member; concatenated members are still one valid gzip file, and a crash can only
+tear the last one. read_traffic streams the records back and stops at a torn tail.
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import zlib
+
+from instrumentation import metrics
+
+MESSAGE = "message"
+REPLY = "reply"
+GEOLOCATION = "geolocation"
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("localhive_traffic_records_total", "Inbound messages recorded to the traffic log.")
+metrics.describe("localhive_traffic_log_bytes_total", "Compressed bytes appended to the traffic log.")
+
+
+class TrafficRecorder:
+    """
+    Buffers inbound traffic records and appends them to `path` in compressed batches.
+    """
+
+    def __init__(self, path, key=None, flush_batch_size=1000, flush_interval_seconds=1.0, clock=time.time):
+        self.path = path
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._key = key.encode("utf-8") if isinstance(key, str) else (key or os.urandom(32))
+        self._clock = clock
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self.recorded = 0
+        self._records = metrics.counter("localhive_traffic_records_total")
+        self._bytes = metrics.counter("localhive_traffic_log_bytes_total")
+        self._flush_timer = metrics.timer("localhive_storage_op_seconds", store="traffic_log", op="flush")
+
+    def anonymize(self, address):
+        """
+        Returns a stable pseudonym for `address` under this recorder's key.
+        """
+        return "u-" + hmac.new(self._key, address.encode("utf-8"), hashlib.sha256).hexdigest()[:20]
+
+    # --- Recording ---
+
+    def record_message(self, sender, text):
+        self._append({"kind": MESSAGE, "from": self.anonymize(sender), "text": text})
+
+    def record_reply(self, agent_name, user_address, text):
+        self._append({
+            "kind": REPLY,
+            "from": agent_name,
+            "user": self.anonymize(user_address) if user_address is not None else None,
+            "text": text,
+        })
+
+    def record_geolocation(self, locality, latitude, longitude):
+        self._append({"kind": GEOLOCATION, "locality": locality, "latitude": latitude, "longitude": longitude})
+
+    def _append(self, record):
+        record["t"] = round(self._clock(), 3)
+        self._buffer.append(record)
+        self._records.inc()
+        self.maybe_flush()
+
+    # --- Persistence ---
+
+    def maybe_flush(self):
+        if len(self._buffer) >= self.flush_batch_size or (
+            self._buffer and time.monotonic() - self._last_flush >= self.flush_interval_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered records to the log as one gzip member.
+        """
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        records, self._buffer = self._buffer, []
+        with self._flush_timer:
+            lines = "".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records)
+            member = gzip.compress(lines.encode("utf-8"), compresslevel=6)
+            with open(self.path, "ab") as f:
+                f.write(member)
+        self.recorded += len(records)
+        self._bytes.inc(len(member))
+
+    def close(self):
+        self.flush()
+
+    def __len__(self):
+        return len(self._buffer)
+
+
+def read_traffic(path):
+    """
+    Yields the records in the log at `path`, oldest first, without loading it whole.
+    A torn last member (from a crash mid-append) ends the stream with a warning.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                yield json.loads(line)
+        except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            logger.warning("Traffic log %s ends in a torn record (%s); stopping there.", path, e)
@@ -0,0 +1,203 @@
+"""
+Bounded LRU + TTL cache with an optional on-disk tier.
+
+The memory tier is an OrderedDict kept in recency order, so lookups, inserts
+and evictions are all O(1). When `path` is given, every entry is also written
+to a small SQLite file; memory misses fall through to it, which lets cached
+values survive restarts without rewriting a whole file on each insert. Values
+must be JSON-serializable.
+
+Disk writes are committed in batches: once `commit_batch_size` writes are
+pending or `commit_interval_seconds` have passed since the last commit (a crash
+loses at most that much, which a cache can afford). Every
+`purge_interval_seconds` expired rows are deleted and the table is trimmed to
+`max_disk_entries`, dropping the entries closest to expiry first, so the file
+stays bounded. Both run from `set()`; call `maintain()` from a timer to also
+cover quiet periods, and `close()` to commit what is pending.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import metrics
+
+
+class TTLCache:
+    """
+    Key/value cache with LRU eviction, per-entry expiry and hit/miss counters.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0, path=None, clock=time.time, name="cache",
+                 max_disk_entries=None, commit_batch_size=64, commit_interval_seconds=1.0,
+                 purge_interval_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = 10 * max_entries if max_disk_entries is None else max_disk_entries
+        self.commit_batch_size = commit_batch_size
+        self.commit_interval_seconds = commit_interval_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self._clock = clock
+        self._entries = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self._db = None
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+        self._last_purge = time.monotonic()
+        self._disk_get_timer = metrics.timer("localhive_storage_op_seconds", store=name, op="disk_get")
+        self._disk_set_timer = metrics.timer("localhive_storage_op_seconds", store=name, op="disk_set")
+        self._commit_timer = metrics.timer("localhive_storage_op_seconds", store=name, op="commit")
+        self._purge_timer = metrics.timer("localhive_storage_op_seconds", store=name, op="purge")
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+            self._db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if self._db is not None:
+            self._purge_disk(clock()) # Whatever expired while the process was down
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key`, or `default` if it is missing or expired.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                with self._disk_get_timer:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+                    ).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._store_in_memory(key, value, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl_seconds=None):
+        """
+        Stores `value` under `key` in memory and, if enabled, on disk (committed with the next batch).
+        """
+        expires_at = self._clock() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._store_in_memory(key, value, expires_at)
+            if self._db is not None:
+                with self._disk_set_timer:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), expires_at),
+                    )
+                self._uncommitted += 1
+                self._maintain_disk()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._uncommitted += 1
+                self._maintain_disk()
+
+    def purge_expired(self):
+        """
+        Drops expired entries from both tiers and trims the disk tier to `max_disk_entries`.
+        """
+        now = self._clock()
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+            if self._db is not None:
+                self._purge_disk(now)
+
+    def maintain(self):
+        """
+        Periodic housekeeping: commits pending disk writes and purges the disk tier when they are due.
+        """
+        if self._db is None:
+            return
+        with self._lock:
+            self._maintain_disk(force_commit=self._uncommitted > 0)
+
+    def flush(self):
+        """
+        Commits pending disk writes now.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+
+    # --- Disk tier (callers hold the lock) ---
+
+    def _maintain_disk(self, force_commit=False):
+        if time.monotonic() - self._last_purge >= self.purge_interval_seconds:
+            self._purge_disk(self._clock())
+        elif force_commit or self._uncommitted >= self.commit_batch_size or (
+            self._uncommitted and time.monotonic() - self._last_commit >= self.commit_interval_seconds
+        ):
+            self._commit()
+
+    def _purge_disk(self, now):
+        with self._purge_timer:
+            self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            (rows,) = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()
+            excess = rows - self.max_disk_entries
+            if excess > 0:
+                # The entries closest to expiry have the least cache life left
+                self._db.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT ?)", (excess,)
+                )
+                self.disk_evictions += excess
+        self._last_purge = time.monotonic()
+        self._commit()
+
+    def _commit(self):
+        with self._commit_timer:
+            self._db.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._commit()
+                self._db.close()
+                self._db = None
+
+    def _store_in_memory(self, key, value, expires_at):
+        self._entries.pop(key, None)
+        self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
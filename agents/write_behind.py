@@ -0,0 +1,182 @@
+"""
+Write-behind key/value store with batched, crash-safe persistence.
+
+uAgents' default storage rewrites its whole JSON file on every `set`, so the
+cost of one write grows with the number of keys. WriteBehindStore keeps the
+live data in memory and only marks written keys dirty. Dirty keys are flushed
+in batches, once `flush_batch_size` keys are dirty or `flush_interval_seconds`
+have passed, as records appended to a log file, so a write costs the same no
+matter how many keys exist.
+
+On disk there are two files:
+  <path>.snapshot.jsonl  full copy of the data, replaced atomically (write temp + fsync + rename)
+  <path>.log.jsonl       records appended since the snapshot, fsynced per batch
+
+Loading reads the snapshot and replays the log; a torn last line from a crash
+mid-append is discarded. Once the log outgrows the live data it is compacted into
+a new snapshot, which keeps the amortized cost per write constant. Writes not yet
+flushed are lost on a crash, so keep the flush interval short.
+"""
+import json
+import os
+import time
+
+from instrumentation import metrics
+
+_DELETED = object()
+
+
+class WriteBehindStore:
+    """
+    Dict-like store whose reads are served from memory (read-your-writes) and whose
+    writes reach disk in batches.
+    """
+
+    def __init__(self, path, flush_batch_size=500, flush_interval_seconds=2.0, min_compaction_records=10000):
+        self.snapshot_path = f"{path}.snapshot.jsonl"
+        self.log_path = f"{path}.log.jsonl"
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.min_compaction_records = min_compaction_records
+        self._data = {}
+        self._dirty = {} # key -> value, or _DELETED for removals
+        self._log_records = 0
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+        self.compactions = 0
+        store_name = os.path.basename(path)
+        self._flush_timer = metrics.timer("localhive_storage_op_seconds", store=store_name, op="flush")
+        self._compact_timer = metrics.timer("localhive_storage_op_seconds", store=store_name, op="compact")
+        self._load()
+        self._log_file = open(self.log_path, "a", encoding="utf-8")
+
+    # --- Reads ---
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def items(self):
+        return self._data.items()
+
+    def keys(self):
+        return self._data.keys()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    # --- Writes ---
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._dirty[key] = value
+
+    def remove(self, key):
+        if self._data.pop(key, None) is not None:
+            self._dirty[key] = _DELETED
+
+    @property
+    def dirty_count(self):
+        return len(self._dirty)
+
+    def maybe_flush(self):
+        """
+        Flushes if the batch-size or time threshold has been reached. Returns True if it flushed.
+        """
+        if not self._dirty:
+            return False
+        if len(self._dirty) >= self.flush_batch_size or time.monotonic() - self._last_flush >= self.flush_interval_seconds:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """
+        Appends every dirty key to the log as one batch and fsyncs it.
+        """
+        self._last_flush = time.monotonic()
+        if not self._dirty:
+            return
+        with self._flush_timer:
+            self._append_dirty()
+        if self._log_records >= max(self.min_compaction_records, len(self._data)):
+            self.compact()
+
+    def _append_dirty(self):
+        lines = []
+        for key, value in self._dirty.items():
+            if value is _DELETED:
+                lines.append(json.dumps({"k": key, "d": True}))
+            else:
+                lines.append(json.dumps({"k": key, "v": value}))
+        self._log_file.write("\n".join(lines) + "\n")
+        self._log_file.flush()
+        os.fsync(self._log_file.fileno())
+        self._log_records += len(lines)
+        self._dirty.clear()
+        self.flushes += 1
+
+    def compact(self):
+        """
+        Writes a fresh snapshot of the live data and truncates the log.
+        """
+        if self._dirty:
+            self.flush()
+        with self._compact_timer:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as snapshot:
+            for key, value in self._data.items():
+                snapshot.write(json.dumps({"k": key, "v": value}) + "\n")
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Replaying the old log over the new snapshot is harmless, so a crash
+        # between the rename and the truncate loses nothing.
+        self._log_file.close()
+        self._log_file = open(self.log_path, "w", encoding="utf-8")
+        self._log_records = 0
+        self.compactions += 1
+
+    def close(self):
+        self.flush()
+        self._log_file.close()
+
+    # --- Loading ---
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            self._replay(self.snapshot_path)
+        if os.path.exists(self.log_path):
+            good_bytes = self._replay(self.log_path)
+            if good_bytes < os.path.getsize(self.log_path):
+                # Cut off a torn write from a crash mid-append, so new records
+                # don't get glued onto it.
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(good_bytes)
+
+    def _replay(self, path):
+        """
+        Applies the records in `path` and returns how many leading bytes were valid.
+        """
+        good_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record.get("d"):
+                    self._data.pop(record["k"], None)
+                else:
+                    self._data[record["k"]] = record["v"]
+                if path == self.log_path:
+                    self._log_records += 1
+                good_bytes += len(line)
+        return good_bytes
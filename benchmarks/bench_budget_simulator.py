@@ -0,0 +1,87 @@
+"""
+Benchmark: SponsorshipFinanceAgent budget simulation, NumPy vs a plain Python loop.
+
+Simulates one event budget (line-item cost ranges, an attendance range,
+per-head costs, a ticket price and candidate sponsors) with the vectorized
+BudgetSimulator and with a scenario-at-a-time Python loop drawing from the same
+distributions, then compares run time and the resulting percentiles. A repeated
+request is answered from the simulator's memo.
+
+Run from the repository root:
+    python benchmarks/bench_budget_simulator.py --scenarios 100000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from budget_simulator import BudgetSimulator, parse_budget_request
+
+BUDGET = (
+    "venue 40-60k, sound and lighting 15-25k, decorations 10-20k, stage 20k, security 8-12k, "
+    "printing 3-6k, permits 5k, photography 10-15k, cleanup 4-7k, transport 6-10k, "
+    "food 250-400 per person, kits 50-80 per person; 300-600 people; ticket 450; "
+    "sponsor Sharma Traders 50k at 70%, sponsor city bank 1 lakh at 40%, sponsor local cafe 20k at 90%"
+)
+
+
+def naive_simulate(scenario, scenarios, confidence, rng):
+    """
+    The same model, one scenario at a time.
+    """
+    nets = []
+    required = []
+    for _ in range(scenarios):
+        cost = sum(rng.triangular(low, high) for _, low, high in scenario.line_items)
+        attendance = round(rng.triangular(*scenario.attendance))
+        cost += attendance * rng.triangular(*scenario.per_attendee_cost)
+        sponsorship = sum(amount for _, amount, probability in scenario.sponsors if rng.random() < probability)
+        nets.append(sponsorship + attendance * scenario.ticket_price - cost)
+        required.append(max(0.0, (cost - sponsorship) / attendance) if attendance else math.inf)
+    nets.sort()
+    required.sort()
+    percentiles = {pct: nets[min(len(nets) - 1, int(pct / 100 * len(nets)))] for pct in (5, 50, 95)}
+    shortfall = sum(net < 0 for net in nets) / len(nets)
+    return percentiles, shortfall, required[min(len(required) - 1, int(confidence * len(required)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5, help="distinct budgets timed with the simulator")
+    args = parser.parse_args()
+
+    scenario = parse_budget_request(BUDGET)
+    simulator = BudgetSimulator(scenarios=args.scenarios)
+    simulator.simulate(parse_budget_request("warm-up 1-2k")) # NumPy's first call pays for imports and allocation
+
+    timings = []
+    for i in range(args.repeats):
+        variant = parse_budget_request(BUDGET.replace("ticket 450", f"ticket {450 + i}"))
+        started = time.perf_counter()
+        simulator.simulate(variant)
+        timings.append(time.perf_counter() - started)
+    result = simulator.simulate(scenario)
+    started = time.perf_counter()
+    simulator.simulate(scenario)
+    memo_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    naive_net, naive_shortfall, naive_break_even = naive_simulate(scenario, args.scenarios, simulator.break_even_confidence, random.Random(7))
+    naive_seconds = time.perf_counter() - started
+
+    vector_seconds = sorted(timings)[len(timings) // 2]
+    print(f"scenarios: {args.scenarios:,}  line items: {len(scenario.line_items)}  sponsors: {len(scenario.sponsors)}")
+    print(f"{'engine':<14} {'time (ms)':>10} {'net p5':>10} {'net p50':>10} {'net p95':>10} {'shortfall':>10} {'break-even':>11}")
+    print(f"{'numpy':<14} {vector_seconds * 1000:>10.1f} {result.net[5]:>10,.0f} {result.net[50]:>10,.0f} {result.net[95]:>10,.0f} "
+          f"{result.shortfall_probability:>10.1%} {result.break_even_price:>11,.0f}")
+    print(f"{'python loop':<14} {naive_seconds * 1000:>10.1f} {naive_net[5]:>10,.0f} {naive_net[50]:>10,.0f} {naive_net[95]:>10,.0f} "
+          f"{naive_shortfall:>10.1%} {naive_break_even:>11,.0f}")
+    print(f"speedup: {naive_seconds / vector_seconds:.0f}x  memoized repeat: {memo_seconds * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
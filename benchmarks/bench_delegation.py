@@ -0,0 +1,174 @@
+"""
+Delegation latency: uAgents dispatch vs the co-located in-memory bus.
+
+Runs the Porter, the DataManagerAgent and the four specialists in one Bureau with
+N simulated users. Each user onboards and then sends delegated queries one after
+another. For every query it records the time to the Porter's immediate reply and
+to the specialist's forwarded answer; the difference is the delegation hop
+(Porter -> specialist -> Porter).
+
+Two transports are compared, each in a fresh process:
+  bureau     uAgents' own in-process dispatch (messages serialized, queued and parsed)
+  colocated  agents/colocated.py LocalBus (message objects handed over directly)
+
+Separately deployed agents pay for envelope signing and an HTTP round trip on top
+of the bureau numbers, so the real saving is larger than shown here.
+
+Run from the repository root:
+    python benchmarks/bench_delegation.py --users 20 --queries-per-user 50
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from uuid import uuid4
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "agents"))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# One query per specialist, so every delegation path is exercised
+DELEGATED_QUERIES = [
+    "help me organize a community picnic event",
+    "i need a gardener service",
+    "how do i get sponsors for a festival",
+    "which venue is good for a picnic",
+]
+
+
+def run_mode(args):
+    from uagents import Agent, Bureau, Context, Protocol
+    from uagents_core.contrib.protocols.chat import (
+        ChatAcknowledgement,
+        ChatMessage,
+        TextContent,
+        chat_protocol_spec,
+    )
+
+    from mesh_load import percentile
+
+    os.chdir(tempfile.mkdtemp(prefix="localhive-delegation-"))
+    import porter_agent as porter
+    from admission import RateLimiter
+    from colocated import install
+    from run_colocated import build_local_bus, colocated_agents
+
+    bus = build_local_bus()
+    if args.mode == "colocated":
+        install(bus)
+    # Skip the external geolocation lookup so users finish onboarding in one message
+    porter.GEOLOCATION_AGENT_ADDRESS = "agent1q..."
+    # Users send back to back; measure transport latency, not the per-user rate limit
+    porter.user_rate_limiter = RateLimiter("user_messages", 1e9, 1e9)
+
+    first_reply = []
+    hop = []
+    timeouts = [0]
+    done = asyncio.Semaphore(0)
+    run_id = uuid4().hex[:8]
+
+    def make_user(index):
+        user = Agent(name=f"DelegationUser{index}", seed=f"localhive-delegation-{run_id}-{index}")
+        protocol = Protocol(spec=chat_protocol_spec)
+        inbox = asyncio.Queue()
+
+        @protocol.on_message(ChatMessage)
+        async def on_reply(ctx: Context, sender: str, msg: ChatMessage):
+            text = "".join(item.text for item in msg.content if isinstance(item, TextContent))
+            inbox.put_nowait((time.perf_counter(), text))
+
+        @protocol.on_message(ChatAcknowledgement)
+        async def on_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
+            pass
+
+        user.include(protocol)
+
+        async def send_and_wait(ctx, text, replies_wanted):
+            while not inbox.empty():
+                inbox.get_nowait()
+            sent_at = time.perf_counter()
+            await ctx.send(porter.porter_agent.address, ChatMessage(
+                timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=text)]
+            ))
+            received = []
+            try:
+                while len(received) < replies_wanted:
+                    received.append((await asyncio.wait_for(inbox.get(), timeout=args.timeout))[0])
+            except asyncio.TimeoutError:
+                timeouts[0] += 1
+                return None
+            return [at - sent_at for at in received]
+
+        async def scenario(ctx: Context):
+            try:
+                await send_and_wait(ctx, "hi", 1)
+                await send_and_wait(ctx, f"my name is user {index} and i live in bhopal", 1)
+                for i in range(args.queries_per_user):
+                    latencies = await send_and_wait(ctx, DELEGATED_QUERIES[i % len(DELEGATED_QUERIES)], 2)
+                    if latencies is not None:
+                        first_reply.append(latencies[0])
+                        hop.append(latencies[1] - latencies[0])
+            finally:
+                done.release()
+
+        @user.on_event("startup")
+        async def start(ctx: Context):
+            asyncio.get_event_loop().create_task(scenario(ctx))
+
+        return user
+
+    bureau = Bureau()
+    for agent in colocated_agents():
+        bureau.add(agent)
+    for index in range(args.users):
+        bureau.add(make_user(index))
+
+    loop = asyncio.get_event_loop()
+
+    async def run():
+        bureau_task = loop.create_task(bureau.run_async())
+        started = time.perf_counter()
+        for _ in range(args.users):
+            await done.acquire()
+        elapsed = time.perf_counter() - started
+        bureau_task.cancel()
+        return elapsed
+
+    elapsed = loop.run_until_complete(run())
+    fmt = lambda values: "/".join(f"{percentile(values, p) * 1000:.2f}" for p in (50, 95, 99))
+    print(f"{args.mode:<10} {len(hop):>8} {timeouts[0]:>8} {len(hop) / elapsed:>9.1f} | {fmt(first_reply):>24} | {fmt(hop):>24}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--queries-per-user", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each reply")
+    parser.add_argument("--mode", choices=["bureau", "colocated"], help="run a single transport in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    header = f"{'transport':<10} {'queries':>8} {'timeouts':>8} {'queries/s':>9} | {'first reply p50/p95/p99 ms':>24} | {'delegation hop p50/p95/p99':>24}"
+    print(header)
+    print("-" * len(header))
+    sys.stdout.flush()
+    for mode in ("bureau", "colocated"):
+        # A fresh process per transport, since the co-located mode patches uAgents' send
+        subprocess.run([
+            sys.executable, os.path.abspath(__file__),
+            "--mode", mode,
+            "--users", str(args.users),
+            "--queries-per-user", str(args.queries_per_user),
+            "--timeout", str(args.timeout),
+        ], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Intent routing accuracy and throughput: keyword router vs embedding classifier.
+
+Routes a labelled set of queries (plain keyword requests, paraphrases without
+any keyword, and general questions that should reach the LLM fallback) with
+  keywords    the IntentRouter alone (what the Porter did before)
+  classifier  the IntentClassifier alone
+  combined    the router first, the classifier only when no keyword matched
+              (what the Porter does now)
+and reports accuracy per query group plus queries per second, one query at a
+time and in batches.
+
+Run from the repository root:
+    python benchmarks/bench_intent_classifier.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from intent_classifier import PORTER_INTENT_EXAMPLES, IntentClassifier
+from intent_router import PORTER_INTENTS, IntentRouter
+
+# (query, expected intent or None for the LLM fallback), none of them among the example phrases
+LABELLED_QUERIES = {
+    "keyword": [
+        ("i want to plan a community picnic", "event"),
+        ("help me organize a cleanup", "event"),
+        ("how do i get sponsors for a festival", "finance"),
+        ("what budget do we need", "finance"),
+        ("which venue is good for a picnic", "venue"),
+        ("show me locations near the lake", "venue"),
+        ("i need a gardener service", "service"),
+        ("are there tutoring services nearby", "service"),
+    ],
+    "paraphrase": [
+        ("get money for our fair", "finance"),
+        ("who will pay for the festival stage", "finance"),
+        ("can local shops donate for the picnic", "finance"),
+        ("raise some funds for the neighbourhood", "finance"),
+        ("arrange a get-together for the residents", "event"),
+        ("we'd like to host a diwali party", "event"),
+        ("put together a charity run", "event"),
+        ("schedule a meetup for the colony", "event"),
+        ("where could we hold 100 people on saturday", "venue"),
+        ("is there a hall we can rent", "venue"),
+        ("any open ground near arera colony", "venue"),
+        ("book a park for the kids' day", "venue"),
+        ("my tap is leaking, looking for a plumber", "service"),
+        ("someone who can repair my washing machine", "service"),
+        ("i can teach guitar to kids", "service"),
+        ("hire an electrician for the wiring", "service"),
+    ],
+    "general": [
+        ("hi there", None),
+        ("what can you help me with", None),
+        ("who made you", None),
+        ("tell me something about bhopal", None),
+        ("what's the weather like", None),
+        ("thanks a lot", None),
+    ],
+}
+ROUNDS = 200
+BATCH_SIZE = 64
+
+
+def accuracy(route, queries):
+    return sum(1 for text, expected in queries if route(text) == expected) / len(queries)
+
+
+def queries_per_second(route, texts, rounds=ROUNDS):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            route(text)
+    return rounds * len(texts) / (time.perf_counter() - started)
+
+
+def main():
+    router = IntentRouter(PORTER_INTENTS)
+    cache_path = os.path.join(tempfile.mkdtemp(prefix="localhive-intents-"), "centroids.npz")
+    started = time.perf_counter()
+    classifier = IntentClassifier(PORTER_INTENT_EXAMPLES, cache_path=cache_path)
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    classifier = IntentClassifier(PORTER_INTENT_EXAMPLES, cache_path=cache_path)
+    loaded = time.perf_counter() - started
+    print(f"centroids: built in {built * 1000:.1f} ms, loaded from cache in {loaded * 1000:.1f} ms (hit={classifier.cache_hit})\n")
+
+    def classify(text):
+        return classifier.classify(text)[0]
+
+    def combined(text):
+        return router.route(text) or classifier.classify(text)[0]
+
+    routes = {"keywords": router.route, "classifier": classify, "combined": combined}
+    groups = list(LABELLED_QUERIES)
+    everything = [query for queries in LABELLED_QUERIES.values() for query in queries]
+
+    print(f"{'router':<11}" + "".join(f"{group:>12}" for group in groups) + f"{'overall':>10}{'queries/s':>12}")
+    texts = [text for text, _ in everything]
+    for name, route in routes.items():
+        row = "".join(f"{accuracy(route, LABELLED_QUERIES[group]):>12.0%}" for group in groups)
+        print(f"{name:<11}{row}{accuracy(route, everything):>10.0%}{queries_per_second(route, texts):>12.0f}")
+
+    batch = (texts * (BATCH_SIZE // len(texts) + 1))[:BATCH_SIZE]
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        classifier.classify_many(batch)
+    batched = ROUNDS * BATCH_SIZE / (time.perf_counter() - started)
+    print(f"\nclassifier in batches of {BATCH_SIZE}: {batched:.0f} queries/s")
+
+    misses = [(text, expected, combined(text)) for text, expected in everything if combined(text) != expected]
+    if misses:
+        print("\ncombined misroutes:")
+        for text, expected, got in misses:
+            print(f"  {text!r}: expected {expected}, got {got}")
+
+
+if __name__ == "__main__":
+    main()
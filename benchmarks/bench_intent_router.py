@@ -0,0 +1,72 @@
+"""
+Microbenchmark: per-message routing cost as the keyword tables grow.
+
+Compares the compiled IntentRouter against the old approach of one `"x" in text`
+check per keyword. The router's cost should stay flat as tables grow to
+thousands of keywords; the substring chain grows linearly.
+
+Run from the repository root:
+    python benchmarks/bench_intent_router.py
+"""
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from intent_router import PORTER_INTENTS, IntentRouter
+
+MESSAGES = [
+    "i want to plan a community picnic next saturday at the lake",
+    "can you help me find a gardener for my terrace",
+    "we need sponsors and a budget for the diwali festival",
+    "where is a good venue near arera colony",
+    "what can you do for me today",
+]
+TABLE_SIZES = [10, 100, 1000, 5000]
+ROUNDS = 2000
+
+
+def build_tables(total_keywords, seed=7):
+    """
+    Pads the Porter's intent table with random filler keywords up to `total_keywords`.
+    """
+    rng = random.Random(seed)
+    intents = {name: (priority, list(keywords)) for name, (priority, keywords) in PORTER_INTENTS.items()}
+    names = list(intents)
+    count = sum(len(keywords) for _, keywords in intents.values())
+    while count < total_keywords:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10)))
+        intents[names[count % len(names)]][1].append(word)
+        count += 1
+    return intents
+
+
+def substring_chain(intents):
+    chain = [(name, [k if isinstance(k, str) else k[0] for k in keywords]) for name, (_, keywords) in intents.items()]
+
+    def route(text):
+        for name, keywords in chain:
+            if any(keyword.rstrip("*") in text for keyword in keywords):
+                return name
+        return None
+
+    return route
+
+
+def per_message_us(route):
+    seconds = timeit.timeit(lambda: [route(m) for m in MESSAGES], number=ROUNDS)
+    return seconds / (ROUNDS * len(MESSAGES)) * 1e6
+
+
+def main():
+    print(f"{'keywords':>9} {'router (us/msg)':>16} {'substring chain (us/msg)':>25}")
+    for size in TABLE_SIZES:
+        intents = build_tables(size)
+        router = IntentRouter(intents)
+        print(f"{size:>9} {per_message_us(router.route):>16.2f} {per_message_us(substring_chain(intents)):>25.2f}")
+
+
+if __name__ == "__main__":
+    main()
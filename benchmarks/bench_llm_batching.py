@@ -0,0 +1,101 @@
+"""
+LLM fallback throughput: one call per message vs micro-batching.
+
+Concurrent simulated users send general questions (drawn from a pool, so some
+repeat) to a local stub LLM server through the Porter's real client stack
+(OpenAICompatibleBackend + AsyncLLMClient with the Porter's in-flight limit):
+  per-message  one chat completion per question (the old path)
+  fan-out      LLMMicroBatcher, coalescing identical questions and sending the
+               rest as parallel chat completions
+  batched      LLMMicroBatcher with batch completions: one request per micro-batch
+
+The stub answers a batch in the same time as a single prompt, as a batching
+inference server would. Reports questions per second, latency and how many
+requests reached the server.
+
+Run from the repository root:
+    python benchmarks/bench_llm_batching.py --users 200 --questions-per-user 10 --latency-ms 200
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "agents"))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from llm_client import AsyncLLMClient, OpenAICompatibleBackend
+from micro_batcher import LLMMicroBatcher
+from stub_llm_server import StubLLMServer
+
+# Same shape as the Porter's fallback prompt: long and identical for every user
+SYSTEM_PROMPT = (
+    "You are a helpful assistant for LocalHive, designed for local event planning and service exchange in "
+    "communities. Your current location is Bhopal, Madhya Pradesh, India. If the user asks about something "
+    "outside these domains, provide a polite and general helpful response, or suggest how they can use LocalHive."
+)
+LLM_MAX_IN_FLIGHT = 8 # The Porter's defaults
+LLM_MAX_CONNECTIONS = 16
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+async def run(mode, base_url, args):
+    backend = OpenAICompatibleBackend(
+        base_url=base_url,
+        api_key="stub",
+        model="asi1-mini",
+        max_connections=LLM_MAX_CONNECTIONS,
+        batch_completions=mode == "batched",
+    )
+    client = AsyncLLMClient(backend, max_in_flight=LLM_MAX_IN_FLIGHT, timeout=300)
+    if mode == "per-message":
+        complete = client.complete
+    else:
+        complete = LLMMicroBatcher(client, window_seconds=args.window_ms / 1000, max_batch_size=args.max_batch_size).complete
+
+    rng = random.Random(7)
+    questions = [f"tell me something interesting about place number {i} in bhopal" for i in range(args.distinct_questions)]
+    latencies = []
+
+    async def user():
+        for _ in range(args.questions_per_user):
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": rng.choice(questions)}]
+            started = time.perf_counter()
+            await complete(messages, 200)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(args.users)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 95)
+
+
+async def main(args):
+    server = StubLLMServer(latency=args.latency_ms / 1000)
+    base_url = await server.start()
+    print(f"{'path':<12} {'questions/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'server requests':>16}")
+    for mode in ("per-message", "fan-out", "batched"):
+        requests_before = server.requests
+        rate, p50, p95 = await run(mode, base_url, args)
+        print(f"{mode:<12} {rate:>11.1f} {p50 * 1000:>8.0f} {p95 * 1000:>8.0f} {server.requests - requests_before:>16}")
+    await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--questions-per-user", type=int, default=10)
+    parser.add_argument("--distinct-questions", type=int, default=500, help="pool the questions are drawn from")
+    parser.add_argument("--latency-ms", type=float, default=200, help="stub LLM latency per request")
+    parser.add_argument("--window-ms", type=float, default=10, help="micro-batch collection window")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
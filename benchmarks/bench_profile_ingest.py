@@ -0,0 +1,91 @@
+"""
+Benchmark: per-message cost of storing user profiles as the number of users grows.
+
+Compares the DataManagerAgent's WriteBehindStore against a store that rewrites
+one JSON file on every write, the way uAgents' default storage does. The
+write-behind cost per profile should stay flat; the full-rewrite cost grows
+with the number of stored users.
+
+Run from the repository root:
+    python benchmarks/bench_profile_ingest.py --users 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from write_behind import WriteBehindStore
+
+
+class FullRewriteStore:
+    """
+    Minimal stand-in for uAgents' KeyValueStore: every set rewrites the whole file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+
+    def set(self, key, value):
+        self._data[key] = value
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._data))
+
+    def maybe_flush(self):
+        pass
+
+
+def profile(i):
+    return f"user_{i}_bhopal", {
+        "name": f"User {i}",
+        "locality": "Bhopal",
+        "latitude": 23.2599,
+        "longitude": 77.4126,
+        "last_updated": datetime.now().isoformat(),
+    }
+
+
+def ingest(store, users, checkpoints, window=1000):
+    """
+    Returns {checkpoint: mean microseconds per profile over the last `window` writes}.
+    """
+    results = {}
+    window_start = time.perf_counter()
+    for i in range(1, users + 1):
+        store.set(*profile(i))
+        store.maybe_flush()
+        if i % window == 0:
+            now = time.perf_counter()
+            if i in checkpoints:
+                results[i] = (now - window_start) / window * 1e6
+            window_start = now
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--full-rewrite-users", type=int, default=5_000,
+                        help="the full-rewrite store is quadratic, so stop it earlier")
+    args = parser.parse_args()
+
+    checkpoints = [n for n in (1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000) if n <= args.users]
+    with tempfile.TemporaryDirectory() as tmp:
+        write_behind = WriteBehindStore(os.path.join(tmp, "profiles"))
+        write_behind_results = ingest(write_behind, args.users, checkpoints)
+        write_behind.close()
+        full_rewrite_results = ingest(FullRewriteStore(os.path.join(tmp, "profiles.json")),
+                                      min(args.users, args.full_rewrite_users), checkpoints)
+
+    print(f"{'users stored':>12} {'write-behind (us/profile)':>26} {'full rewrite (us/profile)':>26}")
+    for n in checkpoints:
+        full = f"{full_rewrite_results[n]:.1f}" if n in full_rewrite_results else "-"
+        print(f"{n:>12,} {write_behind_results[n]:>26.1f} {full:>26}")
+
+
+if __name__ == "__main__":
+    main()
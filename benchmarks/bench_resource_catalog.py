@@ -0,0 +1,154 @@
+"""
+Benchmark: LocalResourceLogisticsAgent catalog search by place and time slot.
+
+Writes a catalog of N random venues and vendors around Bhopal, each open a few
+windows a week, and times:
+  - "near this point, free in this slot" searches against the catalog's indexes
+    (first query per slot, then with the per-category slot cache warm) and
+    against a linear scan over every resource,
+  - reloads: the initial load, an unchanged file, and a file with 1% of its
+    records edited.
+
+Run from the repository root:
+    python benchmarks/bench_resource_catalog.py --resources 50000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from resource_catalog import DAYS, ResourceCatalog, TimeSlot, weekly_windows
+from spatial_index import haversine_km
+
+BHOPAL = (23.2599, 77.4126)
+SPREAD_DEGREES = 0.5
+CATEGORIES = ["venue", "equipment", "catering"]
+RADIUS_KM = 10.0
+LIMIT = 5
+
+
+def random_record(rng, i):
+    availability = []
+    for _ in range(rng.randint(1, 3)):
+        start = rng.randint(6, 16)
+        availability.append({
+            "days": rng.sample(DAYS, rng.randint(1, 7)),
+            "start": f"{start:02d}:00",
+            "end": f"{min(23, start + rng.randint(3, 10)):02d}:00",
+        })
+    return {
+        "id": f"resource-{i}",
+        "name": f"Resource {i}",
+        "category": rng.choice(CATEGORIES),
+        "locality": f"Locality {i % 500}",
+        "latitude": BHOPAL[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        "longitude": BHOPAL[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        "description": "Benchmark resource",
+        "capacity": rng.randint(20, 500),
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "availability": availability,
+    }
+
+
+def random_slot(rng):
+    day = rng.randrange(7)
+    start = rng.randint(8, 20) * 60
+    return TimeSlot(day * 1440 + start, day * 1440 + start + rng.choice((60, 120, 240)), "benchmark")
+
+
+def linear_search(records, category, latitude, longitude, slot):
+    hits = []
+    for record in records:
+        if record["category"] != category:
+            continue
+        if not any(start <= slot.start and end >= slot.end for start, end in weekly_windows(record["availability"])):
+            continue
+        distance = haversine_km(latitude, longitude, record["latitude"], record["longitude"])
+        if distance <= RADIUS_KM:
+            hits.append((distance, record["id"]))
+    hits.sort()
+    return hits[:LIMIT]
+
+
+def write_catalog(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def timed_queries(catalog, queries):
+    latencies = []
+    for category, latitude, longitude, slot in queries:
+        started = time.perf_counter()
+        catalog.search(category, latitude, longitude, RADIUS_KM, slot, LIMIT)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resources", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--distinct-slots", type=int, default=50, help="slots the queries are drawn from")
+    parser.add_argument("--linear-queries", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    records = [random_record(rng, i) for i in range(args.resources)]
+    path = os.path.join(tempfile.mkdtemp(), "catalog.jsonl")
+    write_catalog(path, records)
+
+    catalog = ResourceCatalog(path, default_radius_km=RADIUS_KM)
+    started = time.perf_counter()
+    catalog.reload()
+    load_seconds = time.perf_counter() - started
+
+    slots = [random_slot(rng) for _ in range(args.distinct_slots)]
+    queries = [
+        (rng.choice(CATEGORIES), BHOPAL[0] + rng.uniform(-0.3, 0.3), BHOPAL[1] + rng.uniform(-0.3, 0.3), rng.choice(slots))
+        for _ in range(args.queries)
+    ]
+    first = {}
+    for (category, latitude, longitude, slot), latency in zip(queries, timed_queries(catalog, queries)):
+        first.setdefault((category, slot.key()), latency)
+    warm = timed_queries(catalog, queries)
+    linear = []
+    for category, latitude, longitude, slot in queries[:args.linear_queries]:
+        started = time.perf_counter()
+        expected = linear_search(records, category, latitude, longitude, slot)
+        linear.append(time.perf_counter() - started)
+        found = catalog.search(category, latitude, longitude, RADIUS_KM, slot, LIMIT)
+        assert [resource_id for _, resource_id in expected] == [resource.resource_id for _, resource in found]
+
+    started = time.perf_counter()
+    os.utime(path) # Touched, same content
+    catalog.reload()
+    unchanged_seconds = time.perf_counter() - started
+    for record in rng.sample(records, max(1, args.resources // 100)):
+        record["rating"] = round(rng.uniform(3.0, 5.0), 1)
+        record["availability"][0]["start"] = f"{rng.randint(6, 16):02d}:00"
+    write_catalog(path, records)
+    started = time.perf_counter()
+    changes = catalog.reload()
+    edited_seconds = time.perf_counter() - started
+
+    print(f"resources: {args.resources:,}  initial load: {load_seconds * 1000:.0f} ms")
+    print(f"{'search (ms)':<28} {'p50':>8} {'p95':>8}")
+    print(f"{'index, first per slot':<28} {percentile(list(first.values()), 50) * 1000:>8.3f} {percentile(list(first.values()), 95) * 1000:>8.3f}")
+    print(f"{'index, slot cached':<28} {percentile(warm, 50) * 1000:>8.3f} {percentile(warm, 95) * 1000:>8.3f}")
+    print(f"{'linear scan':<28} {percentile(linear, 50) * 1000:>8.1f} {percentile(linear, 95) * 1000:>8.1f}")
+    print(f"reload, file touched: {unchanged_seconds * 1000:.0f} ms  "
+          f"reload, {changes[1]:,} records edited: {edited_seconds * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: the LocalServiceExchangeAgent's matching engine with many live offers.
+
+Registers N offers (category plus a few terms, spread over ~100 x 100 km around
+Bhopal and posted over the last two weeks), then times incoming requests, each
+matched against the live offers and registered as it would be by the agent.
+A linear scan over every offer, scoring the same way, is timed for comparison
+and gives the exact top k; "ranking quality" is the index's summed top-k score
+as a share of the exact one.
+
+Run from the repository root:
+    python benchmarks/bench_service_exchange.py --offers 500000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from service_exchange_engine import OFFER, REQUEST, Listing, ServiceExchange
+from spatial_index import haversine_km
+
+BHOPAL = (23.2599, 77.4126)
+SPREAD_DEGREES = 0.5
+CATEGORIES = [
+    "photography", "gardening", "tutoring", "plumbing", "electrician", "carpentry",
+    "cooking", "tailoring", "painting", "cleaning", "repair", "music",
+]
+VOCABULARY = [f"skill{i}" for i in range(400)]
+HISTORY_SECONDS = 14 * 24 * 3600
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def random_listing_args(rng):
+    category = rng.choice(CATEGORIES)
+    text = " ".join(rng.sample(VOCABULARY, rng.randint(2, 4)))
+    latitude = BHOPAL[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+    longitude = BHOPAL[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+    return category, text, latitude, longitude
+
+
+def linear_match(exchange, offers, listing, k):
+    """
+    Scores every live offer the way the engine does, without the index.
+    """
+    now = exchange._clock()
+    tokens = set(listing.tokens())
+    ranked = []
+    for offer in offers:
+        overlap = sum(2.0 if token.startswith("c:") else 1.0 for token in tokens.intersection(offer.tokens()))
+        if not overlap:
+            continue
+        distance = haversine_km(listing.latitude, listing.longitude, offer.latitude, offer.longitude)
+        if distance > exchange.max_distance_km:
+            continue
+        age_hours = max(0.0, now - offer.created_at) / 3600.0
+        ranked.append(overlap / (1.0 + distance / exchange.distance_scale_km) / (1.0 + age_hours / exchange.recency_scale_hours))
+    ranked.sort(reverse=True)
+    return ranked[:k]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, default=500_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--linear-requests", type=int, default=10)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-candidates", type=int, default=200, help="candidates scored per match")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    clock = FakeClock(time.time() - HISTORY_SECONDS)
+    exchange = ServiceExchange(top_k=args.k, max_candidates=args.max_candidates, clock=clock)
+    step = HISTORY_SECONDS / args.offers
+
+    start = time.perf_counter()
+    for i in range(args.offers):
+        clock.now += step
+        category, text, latitude, longitude = random_listing_args(rng)
+        exchange.add(OFFER, f"provider_{i}", text, category, latitude, longitude)
+    insert_seconds = time.perf_counter() - start
+
+    requests = [random_listing_args(rng) for _ in range(args.requests)]
+    latencies = []
+    matched = 0
+    start = time.perf_counter()
+    for i, (category, text, latitude, longitude) in enumerate(requests):
+        started = time.perf_counter()
+        _, matches = exchange.add(REQUEST, f"seeker_{i}", text, category, latitude, longitude)
+        latencies.append(time.perf_counter() - started)
+        matched += bool(matches)
+    request_seconds = time.perf_counter() - start
+
+    offers = [listing for listing in exchange._listings.values() if listing.kind == OFFER]
+    linear_latencies = []
+    index_total = exact_total = 0.0
+    for i, (category, text, latitude, longitude) in enumerate(requests[:args.linear_requests]):
+        listing = Listing("", REQUEST, f"linear_{i}", text, category, latitude, longitude, clock.now)
+        listing.cell = exchange._cell(latitude, longitude)
+        started = time.perf_counter()
+        exact = linear_match(exchange, offers, listing, args.k)
+        linear_latencies.append(time.perf_counter() - started)
+        exact_total += sum(exact)
+        index_total += sum(score for score, _, _ in exchange.match(listing))
+
+    print(f"live offers: {args.offers:,}  insert: {args.offers / insert_seconds:,.0f} offers/s "
+          f"({insert_seconds / args.offers * 1e6:.1f} us/offer)")
+    print(f"requests: {args.requests:,}  throughput: {args.requests / request_seconds:,.0f} requests/s  "
+          f"with a match: {matched / args.requests:.0%}  ranking quality: {index_total / exact_total:.1%}")
+    print(f"{'match latency':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    print(f"{'index':<16} {percentile(latencies, 50) * 1000:>8.3f} {percentile(latencies, 95) * 1000:>8.3f} "
+          f"{percentile(latencies, 99) * 1000:>8.3f}")
+    print(f"{'linear scan':<16} {percentile(linear_latencies, 50) * 1000:>8.1f} {percentile(linear_latencies, 95) * 1000:>8.1f} "
+          f"{percentile(linear_latencies, 99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Sharded Porter throughput vs number of shards.
+
+Drives agents/sharded_porter.py's PorterShardPool directly, without the network
+front: N users each onboard and then send a mix of delegated and general
+(LLM fallback, answered by an in-process stub) queries. Every message runs the
+real Porter handlers in a shard process; outgoing messages are counted instead
+of sent. For each shard count the report shows messages per second and the
+speed-up over one shard. The last configuration then adds a shard and reports
+how many users were moved and how long dispatch was paused.
+
+Run from the repository root:
+    python benchmarks/bench_sharded_porter.py --shards 1,2,4,8 --users 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from uuid import uuid4
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "agents"))
+
+QUERIES = [
+    "i want to plan a community picnic",
+    "i need a gardener service",
+    "how do i get sponsors for a cleanup drive",
+    "which venue is good for a picnic",
+    "what can you do",
+    "tell me about bhopal",
+]
+
+
+def configure_worker(porter):
+    """
+    Runs in every shard: skips the external lookups and answers the LLM fallback in-process.
+    """
+    from admission import RateLimiter
+    from llm_cache import LLMResponseCache
+    from llm_client import AsyncLLMClient, StubLLMBackend
+    from micro_batcher import LLMMicroBatcher
+
+    porter.GEOLOCATION_AGENT_ADDRESS = "agent1q..." # Onboarding completes in one message
+    porter.EVENT_PLANNER_AGENT_ADDRESS = "agent1qbench-event"
+    porter.LOCAL_RESOURCE_AGENT_ADDRESS = "agent1qbench-resource"
+    porter.SPONSORSHIP_FINANCE_AGENT_ADDRESS = "agent1qbench-finance"
+    porter.LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS = "agent1qbench-service"
+    porter.llm_client = AsyncLLMClient(StubLLMBackend())
+    porter.llm_batcher = LLMMicroBatcher(porter.llm_client)
+    porter.llm_response_cache = LLMResponseCache(path=None)
+    porter.user_rate_limiter = RateLimiter("user_messages", 1e9, 1e9) # Users send back to back
+    porter.llm_gate.limit = 10 ** 9
+
+
+def user_messages(users, queries_per_user):
+    """
+    Yields (sender, text) round by round, so every user's messages stay in order.
+    """
+    for index in range(users):
+        yield f"agent1qbenchuser{index}", "hi"
+    for index in range(users):
+        yield f"agent1qbenchuser{index}", f"my name is user {index} and i live in bhopal"
+    for round_index in range(queries_per_user):
+        for index in range(users):
+            yield f"agent1qbenchuser{index}", QUERIES[(index + round_index) % len(QUERIES)]
+
+
+async def run(num_shards, args, rebalance):
+    from uagents_core.contrib.protocols.chat import ChatMessage, TextContent
+
+    from sharded_porter import PorterShardPool
+
+    os.chdir(tempfile.mkdtemp(prefix="localhive-shards-"))
+    window = asyncio.Semaphore(args.window)
+    sent = [0]
+
+    async def count_send(token, shard_id, destination, kind, digest, payload, correlation):
+        sent[0] += 1
+
+    pool = PorterShardPool(num_shards, on_send=count_send, on_done=lambda token: window.release(), setup=configure_worker)
+    await pool.start()
+
+    started = time.perf_counter()
+    count = 0
+    for sender, text in user_messages(args.users, args.queries_per_user):
+        await window.acquire()
+        message = ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=text)])
+        pool.dispatch(sender, uuid4(), message, None)
+        count += 1
+    for _ in range(args.window):
+        await window.acquire()
+    elapsed = time.perf_counter() - started
+
+    rebalance_report = None
+    if rebalance:
+        await pool.add_shard()
+        rebalance_report = (pool.migrated, pool.last_rebalance_pause)
+
+    await pool.close()
+    return count, sent[0], elapsed, rebalance_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default=None, help="comma-separated shard counts (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--queries-per-user", type=int, default=10)
+    parser.add_argument("--window", type=int, default=2000, help="messages in flight at once")
+    args = parser.parse_args()
+
+    if args.shards:
+        shard_counts = [int(value) for value in args.shards.split(",")]
+    else:
+        shard_counts = [1]
+        while shard_counts[-1] * 2 <= (os.cpu_count() or 1):
+            shard_counts.append(shard_counts[-1] * 2)
+
+    print(f"{'shards':>6} {'messages':>9} {'sent':>9} {'seconds':>8} {'msg/s':>9} {'speed-up':>8}")
+    baseline = None
+    rebalance_report = None
+    for num_shards in shard_counts:
+        rebalance = num_shards == shard_counts[-1]
+        count, sent, elapsed, report = asyncio.run(run(num_shards, args, rebalance))
+        rate = count / elapsed
+        baseline = baseline or rate
+        print(f"{num_shards:>6} {count:>9} {sent:>9} {elapsed:>8.2f} {rate:>9.0f} {rate / baseline:>7.2f}x")
+        rebalance_report = report or rebalance_report
+
+    migrated, pause = rebalance_report
+    print(f"\nadding shard {shard_counts[-1] + 1}: moved {migrated} of {args.users} users, dispatch paused {pause * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: "users near me" queries on the DataManagerAgent's spatial index vs a linear scan.
+
+Indexes N random profiles spread over India and times radius and k-nearest
+queries against a plain scan over every stored profile.
+
+Run from the repository root:
+    python benchmarks/bench_spatial_index.py --profiles 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+from spatial_index import GeoGridIndex, haversine_km
+
+# Rough bounding box of India
+LAT_RANGE = (8.0, 35.0)
+LON_RANGE = (68.0, 97.0)
+
+
+def linear_radius(points, latitude, longitude, radius_km):
+    results = []
+    for key, (lat, lon) in points.items():
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if distance <= radius_km:
+            results.append((distance, key))
+    results.sort()
+    return results
+
+
+def linear_nearest(points, latitude, longitude, k):
+    return sorted((haversine_km(latitude, longitude, lat, lon), key) for key, (lat, lon) in points.items())[:k]
+
+
+def time_queries(fn, queries):
+    start = time.perf_counter()
+    for latitude, longitude in queries:
+        fn(latitude, longitude)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--linear-queries", type=int, default=5)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    points = {f"user_{i}": (rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for i in range(args.profiles)}
+    queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+
+    index = GeoGridIndex()
+    start = time.perf_counter()
+    for key, (lat, lon) in points.items():
+        index.insert(key, lat, lon)
+    build_seconds = time.perf_counter() - start
+
+    linear_sample = queries[:args.linear_queries]
+    for latitude, longitude in linear_sample:
+        assert index.within_radius(latitude, longitude, args.radius_km) == linear_radius(points, latitude, longitude, args.radius_km)
+        assert index.nearest(latitude, longitude, args.k) == linear_nearest(points, latitude, longitude, args.k)
+
+    print(f"profiles: {args.profiles:,}  index build: {build_seconds:.2f}s ({build_seconds / args.profiles * 1e6:.2f} us/insert)")
+    print(f"{'query':<22} {'index (ms)':>12} {'linear scan (ms)':>18}")
+    print(f"{f'radius {args.radius_km:g} km':<22} "
+          f"{time_queries(lambda la, lo: index.within_radius(la, lo, args.radius_km), queries):>12.4f} "
+          f"{time_queries(lambda la, lo: linear_radius(points, la, lo, args.radius_km), linear_sample):>18.1f}")
+    print(f"{f'{args.k}-nearest':<22} "
+          f"{time_queries(lambda la, lo: index.nearest(la, lo, args.k), queries):>12.4f} "
+          f"{time_queries(lambda la, lo: linear_nearest(points, la, lo, args.k), linear_sample):>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
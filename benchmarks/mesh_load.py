@@ -0,0 +1,263 @@
+"""
+Load generator and latency benchmark for the full LocalHive agent mesh.
+
+Runs the Porter, the DataManagerAgent and the four chat specialists in one
+uAgents Bureau together with:
+  - a stub geolocation agent that answers GeolocationRequests after a delay,
+  - a stub OpenAI-compatible LLM server (benchmarks/stub_llm_server.py),
+  - N simulated user agents.
+
+Each user says hello, onboards ("my name is ... and i live in ..."), then sends
+a mix of event, service, finance, venue and general (LLM fallback) queries one
+after another. For every intent path the report shows throughput and
+p50/p95/p99 latency to the Porter's first reply, and for delegated queries, to
+the specialist's forwarded answer.
+
+Run from the repository root:
+    python benchmarks/mesh_load.py --users 50 --queries-per-user 10
+
+Everything runs inside a temporary directory, so agent storage and caches
+start empty on every run.
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from uuid import uuid4
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "agents"))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from uagents import Agent, Bureau, Context, Protocol
+from uagents_core.contrib.protocols.chat import (
+    ChatAcknowledgement,
+    ChatMessage,
+    TextContent,
+    chat_protocol_spec,
+)
+from uagents.protocols.geolocation import GeolocationRequest, GeolocationResponse
+
+from stub_llm_server import StubLLMServer
+
+# Queries per intent path; each must route to that path with the Porter's intent table
+QUERIES = {
+    "event": ["i want to plan a community picnic", "help me organize a festival", "we are planning a cleanup event"],
+    "service": ["i need a gardener, can you help me find one", "i offer tutoring services", "is there a photographer service nearby"],
+    "finance": ["how do i get sponsors for a cleanup drive", "help me make a budget", "what finance options do we have"],
+    "venue": ["which venue is good for a picnic", "show me a map of parks", "any location for a sound system party"],
+    "fallback": ["what can you do", "how do i use localhive", "tell me about bhopal"],
+}
+DELEGATED_PATHS = {"event", "service", "finance", "venue"}
+LOCALITIES = ["Bhopal, India", "Arera Colony, Bhopal", "Kolar Road, Bhopal", "New Market, Bhopal", "Shahpura, Bhopal"]
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of `values`.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class LoadStats:
+    def __init__(self):
+        self.first_reply = defaultdict(list) # path -> [seconds]
+        self.final_answer = defaultdict(list) # path -> [seconds]
+        self.timeouts = defaultdict(int)
+        self.busy = defaultdict(int) # "busy, retry shortly" answers from admission control
+        self.started = None
+        self.finished = None
+
+    def report(self, users, llm_server):
+        elapsed = self.finished - self.started
+        total = sum(len(v) for v in self.first_reply.values())
+        print(f"\nusers: {users}  round trips: {total}  wall time: {elapsed:.2f}s  throughput: {total / elapsed:.1f} msg/s")
+        print(f"stub LLM: {llm_server.requests} requests, max {llm_server.max_in_flight} in flight, "
+              f"{llm_server.connections} connections")
+        header = f"{'path':<11} {'count':>6} {'timeouts':>8} {'busy':>6} {'msg/s':>7} | {'first reply p50/p95/p99 (ms)':>30} | {'final answer p50/p95/p99 (ms)':>31}"
+        print(header)
+        print("-" * len(header))
+        for path in ["greeting", "onboarding"] + list(QUERIES):
+            first = self.first_reply.get(path, [])
+            final = self.final_answer.get(path, [])
+            fmt = lambda values: "/".join(f"{percentile(values, p) * 1000:.0f}" for p in (50, 95, 99)) if values else "-"
+            print(f"{path:<11} {len(first):>6} {self.timeouts[path]:>8} {self.busy[path]:>6} {len(first) / elapsed:>7.1f} | {fmt(first):>30} | {fmt(final):>31}")
+
+
+def make_user(index, run_id, porter_address, busy_message, args, stats, done):
+    """
+    Builds a simulated user agent that runs its scenario once the Bureau starts.
+    """
+    user = Agent(name=f"LoadUser{index}", seed=f"localhive-load-{run_id}-{index}")
+    protocol = Protocol(spec=chat_protocol_spec)
+    inbox = asyncio.Queue()
+    rng = random.Random(index)
+
+    @protocol.on_message(ChatMessage)
+    async def on_reply(ctx: Context, sender: str, msg: ChatMessage):
+        text = "".join(item.text for item in msg.content if isinstance(item, TextContent))
+        inbox.put_nowait((time.perf_counter(), text))
+        await ctx.send(sender, ChatAcknowledgement(timestamp=datetime.utcnow(), acknowledged_msg_id=msg.msg_id))
+
+    @protocol.on_message(ChatAcknowledgement)
+    async def on_ack(ctx: Context, sender: str, msg: ChatAcknowledgement):
+        pass
+
+    user.include(protocol)
+
+    async def round_trip(ctx, path, text, is_final):
+        """
+        Sends `text` and waits until `is_final(replies)` holds, recording both latencies.
+        """
+        while not inbox.empty():
+            inbox.get_nowait()
+        sent_at = time.perf_counter()
+        await ctx.send(porter_address, ChatMessage(
+            timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=text)]
+        ))
+        replies = []
+        try:
+            while True:
+                received_at, reply = await asyncio.wait_for(inbox.get(), timeout=args.timeout)
+                if not replies:
+                    stats.first_reply[path].append(received_at - sent_at)
+                replies.append(reply)
+                if reply == busy_message:
+                    stats.busy[path] += 1
+                    return
+                if is_final(replies):
+                    stats.final_answer[path].append(received_at - sent_at)
+                    return
+        except asyncio.TimeoutError:
+            stats.timeouts[path] += 1
+
+    async def scenario(ctx: Context):
+        try:
+            await round_trip(ctx, "greeting", "hi", lambda replies: True)
+            locality = LOCALITIES[index % len(LOCALITIES)]
+            await round_trip(ctx, "onboarding", f"my name is load user {index} and i live in {locality}",
+                             lambda replies: "onboarded" in replies[-1])
+            for _ in range(args.queries_per_user):
+                path = rng.choice(list(QUERIES))
+                if path in DELEGATED_PATHS:
+                    # The Porter replies right away, then forwards the specialist's "(AgentName) ..." answer
+                    is_final = lambda replies: len(replies) >= 2 and any(r.startswith("(") for r in replies)
+                else:
+                    is_final = lambda replies: True
+                await round_trip(ctx, path, rng.choice(QUERIES[path]), is_final)
+        finally:
+            done.release()
+
+    @user.on_event("startup")
+    async def start(ctx: Context):
+        # Run in the background so the user agent can start receiving replies
+        asyncio.get_event_loop().create_task(scenario(ctx))
+
+    return user
+
+
+def make_geolocation_stub(latency):
+    geo = Agent(name="StubGeolocationAgent", seed=f"localhive-load-geo-{uuid4()}")
+
+    @geo.on_message(model=GeolocationRequest)
+    async def on_request(ctx: Context, sender: str, msg: GeolocationRequest):
+        if latency:
+            await asyncio.sleep(latency)
+        await ctx.send(sender, GeolocationResponse(latitude=23.2599, longitude=77.4126))
+
+    return geo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--queries-per-user", type=int, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--geo-latency-ms", type=float, default=200)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each reply")
+    parser.add_argument("--user-rate", type=float, default=0,
+                        help="per-user messages/s allowed by the Porter (default: unlimited, to measure raw latency)")
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="localhive-load-"))
+    loop = asyncio.get_event_loop()
+
+    llm_server = StubLLMServer(latency=args.llm_latency_ms / 1000)
+    llm_base_url = loop.run_until_complete(llm_server.start())
+
+    import porter_agent as porter
+    import data_manager
+    import event_ideation_planner_agent as event_planner
+    import local_resource_logistics_agent as local_resource
+    import local_service_exchange_agent as service_exchange
+    import sponsership_finance_agent as finance
+    from admission import RateLimiter
+    from llm_client import AsyncLLMClient, OpenAICompatibleBackend
+    from micro_batcher import LLMMicroBatcher
+
+    geo = make_geolocation_stub(args.geo_latency_ms / 1000)
+    porter.GEOLOCATION_AGENT_ADDRESS = geo.address
+    porter.DATA_MANAGER_AGENT_ADDRESS = data_manager.data_manager_agent.address
+    porter.EVENT_PLANNER_AGENT_ADDRESS = event_planner.event_planner_agent.address
+    porter.LOCAL_RESOURCE_AGENT_ADDRESS = local_resource.local_resource_agent.address
+    porter.SPONSORSHIP_FINANCE_AGENT_ADDRESS = finance.sponsorship_finance_agent.address
+    porter.LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS = service_exchange.local_service_exchange_agent.address
+    porter.llm_client = AsyncLLMClient(
+        OpenAICompatibleBackend(
+            base_url=llm_base_url,
+            api_key="stub",
+            model="asi1-mini",
+            max_connections=porter.LLM_MAX_CONNECTIONS,
+        ),
+        max_in_flight=porter.LLM_MAX_IN_FLIGHT,
+        timeout=porter.LLM_TIMEOUT_SECONDS,
+    )
+    porter.llm_batcher = LLMMicroBatcher(
+        porter.llm_client, window_seconds=porter.LLM_BATCH_WINDOW_SECONDS, max_batch_size=porter.LLM_MAX_BATCH_SIZE
+    )
+    if args.user_rate:
+        porter.user_rate_limiter = RateLimiter("user_messages", args.user_rate, porter.USER_BURST)
+    else:
+        porter.user_rate_limiter = RateLimiter("user_messages", 1e9, 1e9)
+
+    stats = LoadStats()
+    done = asyncio.Semaphore(0)
+    run_id = uuid4().hex[:8]
+    bureau = Bureau()
+    for agent in (
+        porter.porter_agent,
+        data_manager.data_manager_agent,
+        event_planner.event_planner_agent,
+        local_resource.local_resource_agent,
+        finance.sponsorship_finance_agent,
+        service_exchange.local_service_exchange_agent,
+        geo,
+    ):
+        bureau.add(agent)
+    for index in range(args.users):
+        bureau.add(make_user(index, run_id, porter.porter_agent.address, porter.BUSY_MESSAGE, args, stats, done))
+
+    async def run():
+        bureau_task = loop.create_task(bureau.run_async())
+        stats.started = time.perf_counter()
+        for _ in range(args.users):
+            await done.acquire()
+        stats.finished = time.perf_counter()
+        bureau_task.cancel()
+        await llm_server.close()
+
+    loop.run_until_complete(run())
+    stats.report(args.users, llm_server)
+
+
+if __name__ == "__main__":
+    main()
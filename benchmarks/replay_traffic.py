@@ -0,0 +1,300 @@
+"""
+Replays recorded Porter traffic against a local Porter, in real time, faster, or flat out.
+
+Record with PORTER_TRAFFIC_LOG set on the Porter (see agents/traffic_recorder.py),
+then feed the log back into the real Porter handlers, run in this process with an
+in-process stub LLM and outgoing messages captured instead of sent:
+  - user messages arrive at their recorded times divided by --speed (in order per
+    user); "max" sends each as soon as one of the --window slots is free,
+  - specialist answers are matched to the replayed Porter's own delegation for the
+    same user and specialist, so they are forwarded the way they were live,
+  - geolocation responses are matched to the replayed Porter's lookup of the same
+    locality. A lookup nothing answers within --geolocation-timeout seconds of
+    recorded time (e.g. a geocode cache hit when it was recorded) is answered with
+    default coordinates, so replayed users still finish onboarding (at "max", at once).
+An answer that comes due before the replayed Porter has asked for it is held
+until it does, and then handled right away.
+
+The report shows throughput, how far the replay fell behind schedule, and
+p50/p95/p99/max latency per record kind, from the moment a record was due to
+the moment its handler finished. The Porter's own timeouts (delegations, fan-out
+deadlines) still run in real time.
+
+Run from the repository root:
+    PORTER_TRAFFIC_LOG=$PWD/traffic.jsonl.gz python benchmarks/mesh_load.py --users 50
+    python benchmarks/replay_traffic.py traffic.jsonl.gz --speed 10
+Logs from a sharded Porter (one per shard) can be passed together; they are merged by time.
+"""
+import argparse
+import asyncio
+import heapq
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from uuid import uuid4
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "agents"))
+
+from uagents_core.contrib.protocols.chat import ChatMessage, MetadataContent, TextContent
+from uagents.protocols.geolocation import GeolocationRequest, GeolocationResponse
+
+from geocode_cache import normalize_locality
+from sharded_porter import KeyedSequencer
+from traffic_recorder import GEOLOCATION, MESSAGE, REPLY, read_traffic
+
+GEOLOCATION_ADDRESS = "agent1qreplay-geolocation"
+# Specialist name -> (Porter setting, address the replayed Porter delegates to)
+SPECIALISTS = {
+    "EventIdeationPlannerAgent": ("EVENT_PLANNER_AGENT_ADDRESS", "agent1qreplay-event"),
+    "LocalServiceExchangeAgent": ("LOCAL_SERVICE_EXCHANGE_AGENT_ADDRESS", "agent1qreplay-service"),
+    "SponsorshipFinanceAgent": ("SPONSORSHIP_FINANCE_AGENT_ADDRESS", "agent1qreplay-finance"),
+    "LocalResourceLogisticsAgent": ("LOCAL_RESOURCE_AGENT_ADDRESS", "agent1qreplay-resource"),
+}
+DEFAULT_COORDINATES = (23.2599, 77.4126) # Bhopal
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def configure_porter(porter, args):
+    """
+    Points the Porter at the replayer instead of real agents and answers the LLM fallback in-process.
+    """
+    from admission import RateLimiter
+    from llm_cache import LLMResponseCache
+    from llm_client import AsyncLLMClient, StubLLMBackend
+    from micro_batcher import LLMMicroBatcher
+
+    porter.GEOLOCATION_AGENT_ADDRESS = GEOLOCATION_ADDRESS
+    for setting, address in SPECIALISTS.values():
+        setattr(porter, setting, address)
+    porter.llm_client = AsyncLLMClient(StubLLMBackend(delay=args.llm_latency_ms / 1000))
+    porter.llm_batcher = LLMMicroBatcher(porter.llm_client)
+    porter.llm_response_cache = LLMResponseCache(path=None)
+    if not args.keep_rate_limit:
+        # Replaying faster than recorded would otherwise turn most messages into "busy" answers
+        porter.user_rate_limiter = RateLimiter("user_messages", 1e9, 1e9)
+
+
+class ReplayContext:
+    """
+    The part of uAgents' Context the Porter handlers use; sends go to the replayer.
+    """
+
+    def __init__(self, replay, session):
+        self._replay = replay
+        self.session = session
+        self.storage = replay.storage
+        self.logger = replay.logger
+
+    async def send(self, destination, message):
+        self._replay.on_send(self.session, destination, message)
+
+
+class Replay:
+    def __init__(self, porter, speed, window, geolocation_timeout):
+        self.porter = porter
+        self.speed = speed # None: as fast as possible
+        self.geolocation_timeout = geolocation_timeout
+        self.storage = {}
+        self.logger = logging.getLogger("ReplayedPorter")
+        self.logger.setLevel(logging.ERROR) # Per-message INFO/WARNING lines would dominate the run time
+        self._window = asyncio.Semaphore(window)
+        self._sequencer = KeyedSequencer()
+        self._tasks = set()
+        self._agents_by_address = {address: name for name, (_, address) in SPECIALISTS.items()}
+        # Requests the replayed Porter made that no record has answered yet, and records that
+        # came due before the Porter made their request (e.g. while it waited on the stub LLM)
+        self._delegations = defaultdict(deque) # (user, specialist) -> delegated msg ids
+        self._lookups = defaultdict(deque) # normalized locality -> sessions of lookups
+        self._held_replies = defaultdict(deque) # (user, specialist) -> reply records
+        self._held_geolocations = defaultdict(deque) # normalized locality -> geolocation records
+        self.latencies = defaultdict(list) # record kind -> seconds from due to handled
+        self.lag = [] # seconds each record was dispatched behind schedule
+        self.sent = Counter()
+        self.synthesized = 0
+        self.errors = 0
+
+    # --- Porter output ---
+
+    def on_send(self, session, destination, message):
+        self.sent[type(message).__name__] += 1
+        if isinstance(message, GeolocationRequest):
+            locality = normalize_locality(message.location_name)
+            held = self._held_geolocations.get(locality)
+            if held:
+                record = held.popleft()
+                self._start(GEOLOCATION, self._geolocation(session, record["latitude"], record["longitude"]), time.perf_counter(), slot=False)
+                return
+            self._lookups[locality].append(session)
+            delay = self.geolocation_timeout / self.speed if self.speed else 0.0
+            asyncio.get_running_loop().call_later(delay, self._answer_unmatched_lookup, locality, session)
+        elif destination in self._agents_by_address and isinstance(message, ChatMessage):
+            delegation = self.porter.pending_delegations.get(str(message.msg_id))
+            if delegation is None:
+                return
+            key = (delegation["user"], delegation["agent"])
+            held = self._held_replies.get(key)
+            if held:
+                self._start(REPLY, self._reply(held.popleft(), str(message.msg_id)), time.perf_counter(), slot=False)
+            else:
+                self._delegations[key].append(str(message.msg_id))
+
+    def _answer_unmatched_lookup(self, locality, session):
+        lookups = self._lookups.get(locality)
+        if lookups and session in lookups:
+            lookups.remove(session)
+            self.synthesized += 1
+            self._start(GEOLOCATION, self._geolocation(session, *DEFAULT_COORDINATES), time.perf_counter(), slot=False)
+
+    # --- Replaying records ---
+
+    async def run(self, records):
+        started = time.perf_counter()
+        first = None
+        count = 0
+        for record in records:
+            if first is None:
+                first = record["t"]
+            due = started + (record["t"] - first) / self.speed if self.speed else time.perf_counter()
+            if self.speed and due > time.perf_counter():
+                await asyncio.sleep(due - time.perf_counter())
+            await self._window.acquire()
+            self.lag.append(max(0.0, time.perf_counter() - due))
+            self._dispatch(record, due)
+            count += 1
+            if not self.speed:
+                await asyncio.sleep(0) # Let handlers start, so replies find their delegations
+        await self._sequencer.drain()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        return count, time.perf_counter() - started
+
+    def _dispatch(self, record, due):
+        kind = record["kind"]
+        if kind == MESSAGE:
+            sender = record["from"]
+            message = ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[TextContent(type="text", text=record["text"])])
+            handled = self.porter.handle_user_message(ReplayContext(self, uuid4()), sender, message)
+            self._sequencer.submit(sender, self._timed(MESSAGE, handled, due))
+        elif kind == REPLY:
+            key = (record["user"], record["from"])
+            delegations = self._delegations.get(key)
+            if record["from"] is None:
+                # Late or orphaned when recorded; the Porter drops it again
+                self._start(REPLY, self._reply(record, str(uuid4())), due)
+            elif delegations:
+                self._start(REPLY, self._reply(record, delegations.popleft()), due)
+            else:
+                self._held_replies[key].append(record)
+                self._window.release()
+        elif kind == GEOLOCATION:
+            lookups = self._lookups.get(record["locality"])
+            if lookups:
+                self._start(GEOLOCATION, self._geolocation(lookups.popleft(), record["latitude"], record["longitude"]), due)
+            else:
+                self._held_geolocations[record["locality"]].append(record)
+                self._window.release()
+        else:
+            self._window.release()
+
+    def unmatched(self):
+        """
+        Returns (replies, geolocation responses) whose request the replayed Porter never made.
+        """
+        return (sum(len(held) for held in self._held_replies.values()),
+                sum(len(held) for held in self._held_geolocations.values()))
+
+    def _reply(self, record, in_reply_to):
+        agent = record["from"] if record["from"] in SPECIALISTS else "EventIdeationPlannerAgent"
+        message = ChatMessage(timestamp=datetime.utcnow(), msg_id=uuid4(), content=[
+            TextContent(type="text", text=record["text"]),
+            MetadataContent(type="metadata", metadata={"in_reply_to": in_reply_to}),
+        ])
+        return self.porter.handle_user_message(ReplayContext(self, uuid4()), SPECIALISTS[agent][1], message)
+
+    def _geolocation(self, session, latitude, longitude):
+        message = GeolocationResponse(latitude=latitude, longitude=longitude)
+        return self.porter.handle_geolocation_response(ReplayContext(self, session), GEOLOCATION_ADDRESS, message)
+
+    def _start(self, kind, handled, due, slot=True):
+        task = asyncio.get_running_loop().create_task(self._timed(kind, handled, due, slot))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _timed(self, kind, handled, due, slot=True):
+        try:
+            await handled
+        except Exception as e:
+            self.errors += 1
+            self.logger.exception("Handler failed: %s", e)
+        finally:
+            self.latencies[kind].append(time.perf_counter() - due)
+            if slot:
+                self._window.release()
+
+
+def merged_records(paths):
+    """
+    Streams the records of every log, merged by time.
+    """
+    return heapq.merge(*(read_traffic(path) for path in paths), key=lambda record: record["t"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", help="traffic logs recorded with PORTER_TRAFFIC_LOG")
+    parser.add_argument("--speed", default="1", help="replay speed: 1 (as recorded), 10, ... or max")
+    parser.add_argument("--window", type=int, default=1000, help="records being handled at once")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="stub LLM answer delay")
+    parser.add_argument("--geolocation-timeout", type=float, default=5.0,
+                        help="recorded seconds to wait for a matching geolocation response")
+    parser.add_argument("--keep-rate-limit", action="store_true", help="keep the Porter's per-user rate limit")
+    args = parser.parse_args()
+    speed = None if args.speed == "max" else float(args.speed)
+
+    paths = [os.path.abspath(path) for path in args.logs]
+    # The replayed Porter keeps its sessions and caches in a scratch directory and records nothing
+    os.environ.pop("PORTER_TRAFFIC_LOG", None)
+    os.environ.pop("PORTER_SESSION_STORE", None)
+    os.chdir(tempfile.mkdtemp(prefix="localhive-replay-"))
+    import porter_agent as porter
+    configure_porter(porter, args)
+
+    replay = None
+
+    async def run():
+        nonlocal replay
+        replay = Replay(porter, speed, args.window, args.geolocation_timeout)
+        return await replay.run(merged_records(paths))
+
+    count, elapsed = asyncio.run(run())
+    porter.session_store.close()
+
+    print(f"records: {count:,}  speed: {args.speed}  wall time: {elapsed:.2f} s  throughput: {count / elapsed:,.0f} records/s")
+    if speed:
+        print(f"behind schedule: p50 {percentile(replay.lag, 50) * 1000:.1f} ms  p99 {percentile(replay.lag, 99) * 1000:.1f} ms  "
+              f"max {max(replay.lag) * 1000:.1f} ms")
+    print(f"{'kind':<12} {'count':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind in (MESSAGE, REPLY, GEOLOCATION):
+        latencies = replay.latencies.get(kind)
+        if latencies:
+            print(f"{kind:<12} {len(latencies):>8,} {percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 95) * 1000:>8.2f} "
+                  f"{percentile(latencies, 99) * 1000:>8.2f} {max(latencies) * 1000:>8.2f}")
+    print("porter delegations: " + ", ".join(f"{outcome} {count}" for outcome, count in porter.delegation_stats.items()))
+    print("porter sent: " + ", ".join(f"{name} {count}" for name, count in sorted(replay.sent.items())))
+    unmatched_replies, unmatched_geolocations = replay.unmatched()
+    print(f"unmatched replies: {unmatched_replies}  unmatched geolocations: {unmatched_geolocations}  "
+          f"lookups answered with default coordinates: {replay.synthesized}  handler errors: {replay.errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Minimal OpenAI-compatible chat-completions server for benchmarks and local testing.
+
+Answers POST /v1/chat/completions with a canned reply after a configurable
+delay, over keep-alive HTTP/1.1 connections, so the Porter's real LLM client
+(connection pool, in-flight limit, timeouts) can be exercised without ASI:One.
+POST /v1/completions also accepts a list of prompts and answers all of them after
+the same delay, like a server that batches on the GPU.
+
+Use it from a benchmark:
+    server = StubLLMServer(latency=0.3)
+    base_url = await server.start()
+
+or run it standalone and point the Porter at it:
+    python benchmarks/stub_llm_server.py --port 8080 --latency-ms 300
+    ASI_ONE_BASE_URL=http://127.0.0.1:8080/v1 python agents/porter_agent.py
+"""
+import argparse
+import asyncio
+import json
+import time
+
+
+class StubLLMServer:
+    """
+    Serves canned chat completions and counts the requests it sees.
+    """
+
+    def __init__(self, reply="This is a stub answer from the LocalHive test LLM.", latency=0.0, host="127.0.0.1", port=0):
+        self.reply = reply
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.connections = 0
+        self._server = None
+
+    async def start(self):
+        """
+        Starts listening and returns the base URL to hand to an OpenAI client.
+        """
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self._respond(request_line.decode("latin-1").split(), body)
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line, body):
+        if len(request_line) < 2 or request_line[0] != "POST":
+            return "404 Not Found", {"error": {"message": "not found"}}
+        if request_line[1].endswith("/chat/completions"):
+            chat = True
+        elif request_line[1].endswith("/completions"):
+            chat = False
+        else:
+            return "404 Not Found", {"error": {"message": "not found"}}
+        request = json.loads(body or b"{}")
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if not chat:
+            prompts = request.get("prompt", "")
+            prompts = prompts if isinstance(prompts, list) else [prompts]
+            return "200 OK", {
+                "id": f"cmpl-stub-{self.requests}",
+                "object": "text_completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [
+                    {"index": index, "text": " " + self.reply, "finish_reason": "stop", "logprobs": None}
+                    for index in range(len(prompts))
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+        return "200 OK", {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+
+async def _serve_forever(args):
+    server = StubLLMServer(latency=args.latency_ms / 1000, host=args.host, port=args.port)
+    base_url = await server.start()
+    print(f"Stub LLM listening on {base_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    try:
+        asyncio.run(_serve_forever(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
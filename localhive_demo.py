@@ -1,10 +1,26 @@
 import streamlit as st
 import re
-from datetime import datetime
+import statistics
+import sys
+import time
 import os
+from collections import deque
+from datetime import datetime
 from dotenv import load_dotenv
 import google.generativeai as genai # Import Google Generative AI library
 
+# Shared helpers live next to the agents
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents"))
+from intent_router import PORTER_INTENTS, IntentRouter
+try:
+    from intent_classifier import PORTER_INTENT_EXAMPLES, IntentClassifier
+except ImportError: # NumPy is not installed; route by keywords only
+    IntentClassifier = None
+from llm_cache import LLMResponseCache
+from prompt_builder import ConversationHistory, PromptBuilder
+
+rerun_started = time.perf_counter()
+
 # --- Configuration ---
 # Hardcoded responses for onboarding and system prompts for LLM
 HARDCODED_RESPONSES = {
@@ -17,31 +33,103 @@ HARDCODED_RESPONSES = {
     "local_resource_system_prompt": "You are a local resource and logistics expert for Bhopal, Madhya Pradesh, India. Given a user's request, suggest relevant local venues, equipment, or service providers. Provide realistic, concise suggestions based on common local needs.",
     "sponsorship_finance_system_prompt": "You are a finance and sponsorship advisor for community projects in Bhopal, Madhya Pradesh, India. Given a user's request, provide concise advice on budgeting, fundraising, or securing local sponsorships. Suggest common approaches.",
     "local_service_exchange_system_prompt": "You are a facilitator for a local peer-to-peer service exchange in Bhopal, Madhya Pradesh, India. Given a user's request to offer or find a service, provide concise guidance on how to do so, or suggest common services available/needed in a community. Do not actually register or find real services, just explain the process.",
-    "general_llm_fallback_system_prompt": "You are a helpful assistant for LocalHive, designed for local event planning and service exchange in communities. Your current location is Bhopal, Madhya Pradesh, India. The current time is {current_time_str}. If the user asks about something outside these domains, provide a polite and general helpful response, or suggest how they can use LocalHive. Keep responses concise and helpful."
+    "general_llm_fallback_system_prompt": "You are a helpful assistant for LocalHive, designed for local event planning and service exchange in communities. Your current location is Bhopal, Madhya Pradesh, India. If the user asks about something outside these domains, provide a polite and general helpful response, or suggest how they can use LocalHive. Keep responses concise and helpful."
 }
 
 # Simulated Geolocation for Bhopal, India
 SIMULATED_LATITUDE = 23.2599
 SIMULATED_LONGITUDE = 77.4126
 
+# LLM response cache (set LLM_CACHE_PATH in .env to persist it across restarts). The demo
+# has no maintenance loop to commit batched writes, so each answer is committed as it is
+# cached; at chat speed that costs nothing.
+LLM_CACHE_MAX_ENTRIES = 1024
+LLM_CACHE_TTL_SECONDS = 3600
+LLM_CACHE_COMMIT_BATCH_SIZE = 1
+
+# Chat history drawn on each rerun: the latest CHAT_WINDOW_MESSAGES, plus CHAT_PAGE_MESSAGES
+# more per "Show earlier messages" click, so a rerun costs the same however long the chat is
+CHAT_WINDOW_MESSAGES = 20
+CHAT_PAGE_MESSAGES = 50
+RERUN_TIMINGS_KEPT = 20 # Reruns the sidebar median covers
+
 # --- Gemini API Configuration ---
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+@st.cache_resource
+def get_gemini_api_key():
+    """
+    Reads .env once per server process (restart the app after editing it).
+    """
+    load_dotenv()
+    return os.getenv("GEMINI_API_KEY")
+
+@st.cache_resource
+def get_gemini_model(api_key):
+    """
+    Configures the Gemini client and builds the model once per server process, not on every rerun.
+    """
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-2.0-flash')
+
+GEMINI_API_KEY = get_gemini_api_key()
 
 # Configure the Gemini API
 if GEMINI_API_KEY == "YOUR_GEMINI_API_KEY" or not GEMINI_API_KEY:
     st.error("Please set your Google Gemini API Key in the `GEMINI_API_KEY` variable.")
     st.stop() # Stop the app if API key is not set
 else:
-    genai.configure(api_key=GEMINI_API_KEY)
-    # Initialize the Gemini model
+    # Initialize the Gemini model (a failure isn't cached, so the next rerun tries again)
     try:
-        gemini_model = genai.GenerativeModel('gemini-2.0-flash') # Using gemini-pro for general chat
+        gemini_model = get_gemini_model(GEMINI_API_KEY)
     except Exception as e:
         st.error(f"Failed to initialize Gemini model: {e}. Check your API key and network connection.")
         st.stop()
 
+@st.cache_resource
+def get_llm_response_cache():
+    """
+    One response cache per server process, shared by all sessions and reruns.
+    """
+    return LLMResponseCache(
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS,
+        path=os.getenv("LLM_CACHE_PATH"),
+        commit_batch_size=LLM_CACHE_COMMIT_BATCH_SIZE,
+    )
+
+llm_response_cache = get_llm_response_cache()
+
+@st.cache_resource
+def get_intent_router():
+    """
+    Compiles the Porter's intent table once per server process.
+    """
+    return IntentRouter(PORTER_INTENTS)
+
+intent_router = get_intent_router()
+
+@st.cache_resource
+def get_prompt_builders():
+    """
+    One PromptBuilder per system prompt, so each keeps a static prefix for prompt caching.
+    """
+    return {
+        key: PromptBuilder(HARDCODED_RESPONSES[key], time_zone_label="IST")
+        for key in HARDCODED_RESPONSES if key.endswith("_system_prompt")
+    }
+
+prompt_builders = get_prompt_builders()
+
+@st.cache_resource
+def get_intent_classifier():
+    """
+    Builds (or loads the cached) intent centroids once per server process.
+    """
+    if IntentClassifier is None:
+        return None
+    return IntentClassifier(PORTER_INTENT_EXAMPLES, cache_path=os.getenv("INTENT_CENTROIDS_PATH"))
+
+intent_classifier = get_intent_classifier()
 
 # --- Streamlit Page Configuration ---
 st.set_page_config(
@@ -59,12 +147,35 @@ if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
     st.session_state.onboarding_step = 0  # 0: not started, 1: asked name/locality, 2: geolocation sent, 3: onboarding complete
     st.session_state.user_data = {"name": None, "locality": None, "latitude": None, "longitude": None}
+if "stream_responses" not in st.session_state:
+    st.session_state.stream_responses = True # Render LLM tokens as they arrive
+    st.session_state.last_ttft_ms = None # Time to first token of the last LLM response
+    st.session_state.last_generation_ms = None # Time to the full last LLM response
+if "llm_history" not in st.session_state:
+    st.session_state.llm_history = ConversationHistory() # Recent turns sent along with each LLM call
+if "chat_window" not in st.session_state:
+    st.session_state.chat_window = CHAT_WINDOW_MESSAGES # Latest messages drawn on each rerun
+    st.session_state.rerun_timings = deque(maxlen=RERUN_TIMINGS_KEPT) # Total ms of recent reruns
+
+setup_done = time.perf_counter()
 
 # --- Chat Display ---
-for message in st.session_state.chat_history:
+def show_earlier_messages():
+    st.session_state.chat_window += CHAT_PAGE_MESSAGES
+
+# Only the latest messages are drawn; older ones stay collapsed until asked for
+hidden_messages = max(0, len(st.session_state.chat_history) - st.session_state.chat_window)
+if hidden_messages:
+    st.button(
+        f"Show {min(hidden_messages, CHAT_PAGE_MESSAGES)} earlier messages ({hidden_messages} hidden)",
+        on_click=show_earlier_messages,
+    )
+for message in st.session_state.chat_history[hidden_messages:]:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
+history_done = time.perf_counter()
+
 # --- Porter Agent Logic (Simulated) ---
 def simulate_porter_response(user_input):
     current_step = st.session_state.onboarding_step
@@ -122,65 +233,136 @@ def simulate_porter_response(user_input):
     elif current_step == 3:
         # Onboarding complete, delegate based on keywords and use Gemini for dynamic responses
         user_input_lower = user_input.lower()
-        system_prompt_to_use = ""
+        prompt_key = ""
 
-        if "event" in user_input_lower or "organize" in user_input_lower or "plan" in user_input_lower:
+        intent = intent_router.route(user_input_lower)
+        if intent is None and intent_classifier is not None:
+            intent, _ = intent_classifier.classify(user_input_lower) # Paraphrases with no keyword
+        if intent == "event":
             agent_role = "EventPlannerAgent"
-            system_prompt_to_use = HARDCODED_RESPONSES["event_planner_system_prompt"]
-        elif "service" in user_input_lower or "help" in user_input_lower or "find" in user_input_lower:
+            prompt_key = "event_planner_system_prompt"
+        elif intent == "service":
             agent_role = "LocalServiceExchangeAgent"
-            system_prompt_to_use = HARDCODED_RESPONSES["local_service_exchange_system_prompt"]
-        elif "budget" in user_input_lower or "sponsor" in user_input_lower or "finance" in user_input_lower:
+            prompt_key = "local_service_exchange_system_prompt"
+        elif intent == "finance":
             agent_role = "SponsorshipFinanceAgent"
-            system_prompt_to_use = HARDCODED_RESPONSES["sponsorship_finance_system_prompt"]
-        elif "location" in user_input_lower or "venue" in user_input_lower or "map" in user_input_lower:
+            prompt_key = "sponsorship_finance_system_prompt"
+        elif intent == "venue":
             agent_role = "LocalResourceAgent"
-            system_prompt_to_use = HARDCODED_RESPONSES["local_resource_system_prompt"]
+            prompt_key = "local_resource_system_prompt"
         else:
             # General LLM Fallback
             agent_role = "PorterAgent (Gemini LLM)"
-            current_time_str = datetime.now().strftime('%A, %B %d, %Y at %I:%M:%S %p IST')
-            system_prompt_to_use = HARDCODED_RESPONSES["general_llm_fallback_system_prompt"].format(current_time_str=current_time_str)
-
-        try:
-            # Use st.spinner to show a loading indicator while waiting for LLM response
-            with st.spinner(f"Connecting to {agent_role}'s AI brain..."):
-                response = gemini_model.generate_content(
-                    contents=[
-                        {"role": "user", "parts": [system_prompt_to_use]},
-                        {"role": "user", "parts": [user_input]}
-                    ]
-                )
-                response_text = response.text
-        except Exception as e:
-            response_text = f"I'm having trouble connecting to my AI brain right now. Error: {e}"
-            st.error(f"Gemini API Error: {e}")
+            prompt_key = "general_llm_fallback_system_prompt"
+
+        # Static prompt, then recent turns, then the current time and locality. The cache key
+        # covers the prompt and those facts; follow-ups (non-empty history) bypass the cache.
+        # Only answers that arrived in full are cached and added to the history.
+        prompt_builder = prompt_builders[prompt_key]
+        history = st.session_state.llm_history
+        now = datetime.now()
+        locality = st.session_state.user_data["locality"]
+        contents = gemini_contents(prompt_builder.build(user_input, history, now, user_locality=locality))
+        cache_prompt_key = prompt_builder.cache_key(history, now, user_locality=locality)
+        cached_response = llm_response_cache.get_response(cache_prompt_key, user_input) if cache_prompt_key is not None else None
+        if cached_response is not None:
+            response_text = cached_response
+            history.add_exchange(user_input, response_text)
+        elif st.session_state.stream_responses:
+            # Rendered token by token by the caller
+            response_text = stream_gemini_response(contents, cache_prompt_key, user_input)
+        else:
+            try:
+                # Use st.spinner to show a loading indicator while waiting for LLM response
+                with st.spinner(f"Connecting to {agent_role}'s AI brain..."):
+                    started = time.perf_counter()
+                    response = gemini_model.generate_content(contents=contents)
+                    response_text = response.text
+                    # Without streaming the first token arrives with the last one
+                    st.session_state.last_ttft_ms = st.session_state.last_generation_ms = (time.perf_counter() - started) * 1000
+                if cache_prompt_key is not None:
+                    llm_response_cache.set_response(cache_prompt_key, user_input, response_text)
+                history.add_exchange(user_input, response_text)
+            except Exception as e:
+                response_text = f"I'm having trouble connecting to my AI brain right now. Error: {e}"
+                st.error(f"Gemini API Error: {e}")
 
 
     return response_text, agent_role
 
+def gemini_contents(messages):
+    """
+    Converts chat messages to Gemini contents (system text goes in as user parts, as before).
+    """
+    return [{"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]} for m in messages]
+
+def stream_gemini_response(contents, cache_prompt_key, user_input):
+    """
+    Yields Gemini's answer chunk by chunk, recording time to first token.
+    The full answer is cached and added to the history once the stream completes;
+    a stream that fails partway leaves both untouched.
+    """
+    started = time.perf_counter()
+    st.session_state.last_ttft_ms = None
+    response = gemini_model.generate_content(contents=contents, stream=True)
+    response_text = ""
+    for chunk in response:
+        if st.session_state.last_ttft_ms is None:
+            st.session_state.last_ttft_ms = (time.perf_counter() - started) * 1000
+        response_text += chunk.text
+        yield chunk.text
+    st.session_state.last_generation_ms = (time.perf_counter() - started) * 1000
+    if cache_prompt_key is not None:
+        llm_response_cache.set_response(cache_prompt_key, user_input, response_text)
+    st.session_state.llm_history.add_exchange(user_input, response_text)
+
+def render_streamed_response(agent_name, chunks):
+    """
+    Renders streamed chunks into the current chat message as they arrive and returns the full text.
+    """
+    placeholder = st.empty()
+    response_text = ""
+    try:
+        for chunk in chunks:
+            response_text += chunk
+            placeholder.markdown(f"**({agent_name}):** {response_text}▌")
+    except Exception as e:
+        response_text += f"\n\nI'm having trouble connecting to my AI brain right now. Error: {e}"
+        st.error(f"Gemini API Error: {e}")
+    placeholder.markdown(f"**({agent_name}):** {response_text}")
+    return response_text
+
 # --- Chat Input ---
 user_input = st.chat_input("Type your message here...")
 
 if user_input:
-    # Add user message to chat history
+    # Add user message to chat history, and fold the history back to the latest messages
     st.session_state.chat_history.append({"role": "user", "content": user_input})
+    st.session_state.chat_window = CHAT_WINDOW_MESSAGES
     with st.chat_message("user"):
         st.markdown(user_input)
 
     # Simulate PorterAgent's response
     porter_response, agent_name = simulate_porter_response(user_input)
-    
-    # Add agent's response to chat history
-    st.session_state.chat_history.append({"role": "assistant", "content": f"**({agent_name}):** {porter_response}"})
+
     with st.chat_message("assistant"):
-        st.markdown(f"**({agent_name}):** {porter_response}")
+        if isinstance(porter_response, str):
+            st.markdown(f"**({agent_name}):** {porter_response}")
+        else:
+            porter_response = render_streamed_response(agent_name, porter_response)
+
+    # Add agent's final response to chat history
+    st.session_state.chat_history.append({"role": "assistant", "content": f"**({agent_name}):** {porter_response}"})
+
+response_done = time.perf_counter()
 
 # --- Reset Button ---
 if st.button("Reset Chat"):
     st.session_state.chat_history = []
     st.session_state.onboarding_step = 0
     st.session_state.user_data = {"name": None, "locality": None, "latitude": None, "longitude": None}
+    st.session_state.llm_history = ConversationHistory()
+    st.session_state.chat_window = CHAT_WINDOW_MESSAGES
     st.experimental_rerun()
 
 # --- Display Current State (for debugging/demo explanation) ---
@@ -188,3 +370,25 @@ st.sidebar.subheader("Demo State (for explaination)")
 st.sidebar.write(f"**Onboarding Step:** {st.session_state.onboarding_step}")
 st.sidebar.write(f"**User Data:**")
 st.sidebar.json(st.session_state.user_data)
+st.sidebar.checkbox("Stream responses", key="stream_responses")
+st.sidebar.write(f"**LLM Latency:**")
+st.sidebar.json({
+    "time_to_first_token_ms": round(st.session_state.last_ttft_ms, 1) if st.session_state.last_ttft_ms is not None else None,
+    "full_response_ms": round(st.session_state.last_generation_ms, 1) if st.session_state.last_generation_ms is not None else None,
+})
+st.sidebar.write(f"**LLM Cache:**")
+st.sidebar.json(llm_response_cache.stats())
+
+# Everything above the sidebar; response_ms includes waiting for the LLM
+rerun_ms = (time.perf_counter() - rerun_started) * 1000
+st.session_state.rerun_timings.append(rerun_ms)
+st.sidebar.write(f"**Rerun Timings:**")
+st.sidebar.json({
+    "setup_ms": round((setup_done - rerun_started) * 1000, 1),
+    "history_ms": round((history_done - setup_done) * 1000, 1),
+    "response_ms": round((response_done - history_done) * 1000, 1),
+    "total_ms": round(rerun_ms, 1),
+    "messages_drawn": len(st.session_state.chat_history) - hidden_messages,
+    "messages_in_chat": len(st.session_state.chat_history),
+    "recent_median_total_ms": round(statistics.median(st.session_state.rerun_timings), 1),
+})